@@ -59,6 +59,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'immobilier.instrumentation.RequetesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -71,7 +72,8 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, reporting each rendering to immobilier.instrumentation.
+        'BACKEND': 'immobilier.instrumentation.TemplatesInstrumentes',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -144,9 +146,39 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+# Page CSS lives in immobilier/assets/css and is served as bundles built here
+# (see immobilier.assets); collectstatic hashes and precompresses them.
+ASSETS_BUILD_DIR = BASE_DIR / 'cache' / 'assets'
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    'immobilier.assets.BundlesFinder',
+]
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'immobilier.assets.StockageStatique'},
+}
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = '/connexion/'
 LOGIN_REDIRECT_URL = '/'
-LOGOUT_REDIRECT_URL = '/connexion/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/connexion/'
+
+# Rendered contract PDFs (content-addressed cache, see immobilier.contrats_pdf)
+CONTRATS_PDF_CACHE_DIR = BASE_DIR / 'cache' / 'contrats_pdf'
+CONTRATS_PDF_PRERENDU = os.getenv('CONTRATS_PDF_PRERENDU', 'False') == 'True'
+# Render processes shared by the ZIP exports of each web worker.
+CONTRATS_PDF_WORKERS = int(os.getenv('CONTRATS_PDF_WORKERS', '2'))
+
+# Chunked photo uploads in progress (see immobilier.televersements). Keep it
+# on the same disk as MEDIA_ROOT so finished files are renamed, not copied.
+TELEVERSEMENTS_DIR = BASE_DIR / 'cache' / 'televersements'
+TELEVERSEMENTS_TAILLE_MAX = int(os.getenv('TELEVERSEMENTS_TAILLE_MAX', str(20 * 1024 * 1024)))
+
+# Per-view SQL budgets and N+1 detection (see immobilier.instrumentation):
+# violations are logged as warnings, or raise when REQUETES_STRICT is on (the
+# test cases that drive views turn it on with override_settings).
+REQUETES_STRICT = os.getenv('REQUETES_STRICT', 'False') == 'True'
+REQUETES_SEUIL_REPETITIONS = int(os.getenv('REQUETES_SEUIL_REPETITIONS', '5'))
@@ -15,12 +15,16 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from immobilier.assets import servir_statique
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Collected files; runserver serves them itself while DEBUG is on.
+    re_path(rf'^{settings.STATIC_URL.strip("/")}/(?P<chemin>.+)$', servir_statique),
     path('', include('immobilier.urls')),
 ]
 
@@ -1,28 +1,74 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from .imports import ImportFichierForm, importer
+from .instrumentation import budget_requetes
 from .models import BienImmobilier, BienImage, ContratLocation, Proprietaire
 
 
+class ImportAdminMixin:
+	""""Importer" button on the change list, backed by immobilier.imports."""
+
+	type_import = None
+	change_list_template = "admin/immobilier/change_list_import.html"
+
+	def get_urls(self):
+		info = self.model._meta.app_label, self.model._meta.model_name
+		vue = budget_requetes(None, repetitions=False)(self.admin_site.admin_view(self.importer_vue))
+		return [path("importer/", vue, name="%s_%s_importer" % info)] + super().get_urls()
+
+	def importer_vue(self, request):
+		if not self.has_add_permission(request):
+			raise PermissionDenied
+		form = ImportFichierForm(request.POST or None, request.FILES or None, type_import=self.type_import)
+		if request.method == "POST" and form.is_valid():
+			fichier = form.cleaned_data["fichier"]
+			fichier.seek(0)
+			rapport = importer(self.type_import, fichier.file, format=form.cleaned_data["format"])
+			messages.success(request, f"{rapport.importees}/{rapport.lignes} ligne(s) importée(s).")
+			for ligne, message in rapport.erreurs[:20]:
+				messages.warning(request, f"Ligne {ligne} : {message}")
+			if rapport.nb_erreurs > 20:
+				messages.warning(request, f"… et {rapport.nb_erreurs - 20} autre(s) erreur(s).")
+			return redirect("admin:%s_%s_changelist" % (self.model._meta.app_label, self.model._meta.model_name))
+		context = {
+			**self.admin_site.each_context(request),
+			"opts": self.model._meta,
+			"form": form,
+			"title": f"Importer des {self.model._meta.verbose_name_plural}",
+		}
+		return TemplateResponse(request, "admin/immobilier/importer.html", context)
+
+
 @admin.register(Proprietaire)
-class ProprietaireAdmin(admin.ModelAdmin):
+class ProprietaireAdmin(ImportAdminMixin, admin.ModelAdmin):
+	type_import = "proprietaires"
 	list_display = ("nom_complet", "email", "telephone")
 	search_fields = ("nom_complet", "email", "telephone")
 
 
 @admin.register(BienImmobilier)
-class BienImmobilierAdmin(admin.ModelAdmin):
+class BienImmobilierAdmin(ImportAdminMixin, admin.ModelAdmin):
+	type_import = "biens"
 	list_display = ("titre", "type_bien", "ville", "loyer_mensuel", "disponible", "proprietaire")
 	list_filter = ("type_bien", "ville", "disponible")
 	search_fields = ("titre", "adresse", "ville")
 
 
 @admin.register(ContratLocation)
-class ContratLocationAdmin(admin.ModelAdmin):
+class ContratLocationAdmin(ImportAdminMixin, admin.ModelAdmin):
+	type_import = "contrats"
 	list_display = ("bien", "locataire_nom", "date_debut", "date_fin", "actif")
 	list_filter = ("actif", "date_debut", "date_fin")
 	search_fields = ("locataire_nom", "bien__titre")
+	list_select_related = ("bien",)
 
 
 @admin.register(BienImage)
-class BienImageAdmin(admin.ModelAdmin):
+class BienImageAdmin(ImportAdminMixin, admin.ModelAdmin):
+	type_import = "images"
 	list_display = ("bien", "cree_le")
+	list_select_related = ("bien",)
 	search_fields = ("bien__titre",)
@@ -0,0 +1,272 @@
+"""Read-only JSON API over the biens, their images and the owner summaries.
+
+``fields=titre,ville,images`` picks the representation: scalar fields map to an
+``.only()`` projection, ``proprietaire`` adds a ``select_related`` limited to
+the owner's name and ``images`` a projected prefetch, so the database reads no
+more than the client asked for.
+
+Conditional requests are answered from a watermark before any payload is
+built: for the list, the ``(id, modifie_le)`` pairs of the requested page (the
+same keyset scan, on two columns); for a bien, its ``modifie_le``. The list only
+sends an ``ETag``: a deleted row changes the page without bumping any
+timestamp, which ``If-Modified-Since`` could not see. Responses are gzipped
+when the client accepts it.
+"""
+import hashlib
+from functools import wraps
+
+from django import forms
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_safe
+
+from .filtres import filtrer_biens
+from .instrumentation import budget_requetes
+from .models import BienImage, BienImmobilier, Proprietaire
+from .pagination import paginer_keyset
+from .stats import cle_proprietaire, lire_stats
+from .thumbnails import RENDITIONS
+
+
+ORDRE_BIENS = ["-cree_le", "-id"]
+LIMITE_DEFAUT = 20
+LIMITE_MAX = 100
+
+CHAMPS_SCALAIRES = (
+    "id",
+    "titre",
+    "adresse",
+    "ville",
+    "superficie_m2",
+    "loyer_mensuel",
+    "type_bien",
+    "disponible",
+    "cree_le",
+    "modifie_le",
+)
+CHAMPS_BIEN = CHAMPS_SCALAIRES + ("proprietaire", "images")
+# Images are opt-in on the list: most list clients only need the cover fields.
+CHAMPS_LISTE_DEFAUT = CHAMPS_SCALAIRES + ("proprietaire",)
+CHAMPS_DETAIL_DEFAUT = CHAMPS_BIEN
+
+
+class ErreurRequete(Exception):
+    def __init__(self, erreurs):
+        super().__init__(erreurs)
+        self.erreurs = erreurs
+
+
+def _erreur(statut, erreurs):
+    return JsonResponse({"erreurs": erreurs}, status=statut, json_dumps_params={"ensure_ascii": False})
+
+
+def api_vue(budget):
+    """GET/HEAD only, 401 JSON instead of the login redirect, query budget, gzip."""
+    def decorateur(vue):
+        @wraps(vue)
+        def _vue(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return _erreur(401, {"__all__": ["Authentification requise."]})
+            try:
+                return vue(request, *args, **kwargs)
+            except ErreurRequete as exc:
+                return _erreur(400, exc.erreurs)
+
+        return gzip_page(require_safe(budget_requetes(budget)(_vue)))
+
+    return decorateur
+
+
+def _json(donnees, etag=None, last_modified=None):
+    response = JsonResponse(donnees, encoder=DjangoJSONEncoder, json_dumps_params={"ensure_ascii": False})
+    return _entetes(response, etag, last_modified)
+
+
+def _entetes(response, etag=None, last_modified=None):
+    if etag:
+        response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _etag(*parties):
+    empreinte = hashlib.blake2b(repr(parties).encode(), digest_size=16).hexdigest()
+    return quote_etag(empreinte)
+
+
+def _non_modifie(request, etag, last_modified=None):
+    """The 304 (or 412) response if the client's copy is current, else None."""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    return _entetes(response, etag, last_modified) if response is not None else None
+
+
+def champs_demandes(request, defaut):
+    """Parse ``fields=`` (comma separated); unknown names are a 400."""
+    valeur = request.GET.get("fields")
+    if not valeur:
+        return tuple(defaut)
+    champs = tuple(dict.fromkeys(nom.strip() for nom in valeur.split(",") if nom.strip()))
+    inconnus = [nom for nom in champs if nom not in CHAMPS_BIEN]
+    if inconnus or not champs:
+        raise ErreurRequete({"fields": [f"Champ inconnu : {nom}." for nom in inconnus] or ["Aucun champ."]})
+    return champs
+
+
+def projection(queryset, champs):
+    """Restrict ``queryset`` to what serialiser_bien needs for ``champs``."""
+    colonnes = ["id", "cree_le"] + [nom for nom in champs if nom in CHAMPS_SCALAIRES]
+    if "proprietaire" in champs:
+        queryset = queryset.select_related("proprietaire")
+        colonnes += ["proprietaire", "proprietaire__nom_complet"]
+    if "images" in champs:
+        queryset = queryset.prefetch_related(
+            Prefetch("images", queryset=BienImage.objects.only("id", "bien_id", "image", "renditions"))
+        )
+    return queryset.only(*dict.fromkeys(colonnes))
+
+
+def _url(chemin):
+    return f"{settings.MEDIA_URL}{chemin}"
+
+
+def serialiser_image(image):
+    renditions = image.renditions or {}
+    return {
+        "id": image.pk,
+        "url": image.image.url,
+        "renditions": {
+            nom: {**renditions[nom], "jpg": _url(renditions[nom]["jpg"]), "webp": _url(renditions[nom]["webp"])}
+            for nom in RENDITIONS
+            if nom in renditions
+        },
+    }
+
+
+def serialiser_bien(bien, champs):
+    donnees = {}
+    for nom in champs:
+        if nom == "proprietaire":
+            donnees[nom] = {"id": bien.proprietaire_id, "nom_complet": bien.proprietaire.nom_complet}
+        elif nom == "images":
+            donnees[nom] = [serialiser_image(image) for image in bien.images.all()]
+        else:
+            donnees[nom] = getattr(bien, nom)
+    return donnees
+
+
+class FiltresBiensForm(forms.Form):
+    q = forms.CharField(required=False)
+    ville = forms.ChoiceField(choices=BienImmobilier.VILLE_CHOICES, required=False)
+    type_bien = forms.ChoiceField(choices=BienImmobilier.TYPE_BIEN_CHOICES, required=False)
+    loyer_min = forms.DecimalField(min_value=0, required=False)
+    loyer_max = forms.DecimalField(min_value=0, required=False)
+    disponible = forms.TypedChoiceField(
+        choices=[("1", "oui"), ("0", "non")], coerce=lambda valeur: valeur == "1", empty_value=None, required=False
+    )
+    limit = forms.IntegerField(min_value=1, max_value=LIMITE_MAX, required=False)
+
+    def filtrer(self, biens):
+        donnees = self.cleaned_data
+        biens = filtrer_biens(biens, donnees)
+        for champ in ("ville", "type_bien"):
+            if donnees[champ]:
+                biens = biens.filter(**{champ: donnees[champ]})
+        if donnees["loyer_min"] is not None:
+            biens = biens.filter(loyer_mensuel__gte=donnees["loyer_min"])
+        if donnees["loyer_max"] is not None:
+            biens = biens.filter(loyer_mensuel__lte=donnees["loyer_max"])
+        if donnees["disponible"] is not None:
+            biens = biens.filter(disponible=donnees["disponible"])
+        return biens
+
+
+def _lien(request, curseur):
+    if not curseur:
+        return None
+    params = request.GET.copy()
+    params["cursor"] = curseur
+    return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+
+@api_vue(budget=5)
+def biens_liste(request):
+    """``GET api/biens/?ville=&type_bien=&loyer_min=&loyer_max=&disponible=&q=&fields=&limit=&cursor=``"""
+    filtres = FiltresBiensForm(request.GET)
+    if not filtres.is_valid():
+        raise ErreurRequete(filtres.errors)
+    champs = champs_demandes(request, CHAMPS_LISTE_DEFAUT)
+
+    # Watermark: the page itself, read on the keyset index with two extra columns.
+    page = paginer_keyset(
+        filtres.filtrer(BienImmobilier.objects.only("id", "cree_le", "modifie_le")),
+        ORDRE_BIENS,
+        curseur=request.GET.get("cursor"),
+        per_page=filtres.cleaned_data["limit"] or LIMITE_DEFAUT,
+    )
+    etag = _etag(
+        request.GET.urlencode(),
+        [(bien.pk, bien.modifie_le.isoformat()) for bien in page],
+        page.has_next,
+        page.has_previous,
+    )
+    non_modifie = _non_modifie(request, etag)
+    if non_modifie is not None:
+        return non_modifie
+
+    ids = [bien.pk for bien in page]
+    biens = projection(BienImmobilier.objects.filter(pk__in=ids), champs).in_bulk(ids) if ids else {}
+    return _json(
+        {
+            "results": [serialiser_bien(biens[pk], champs) for pk in ids if pk in biens],
+            "next": _lien(request, page.next_cursor),
+            "previous": _lien(request, page.previous_cursor),
+        },
+        etag=etag,
+    )
+
+
+@api_vue(budget=5)
+def biens_detail(request, pk):
+    champs = champs_demandes(request, CHAMPS_DETAIL_DEFAUT)
+    modifie_le = BienImmobilier.objects.filter(pk=pk).values_list("modifie_le", flat=True).first()
+    if modifie_le is None:
+        return _erreur(404, {"__all__": ["Bien introuvable."]})
+    etag = _etag(pk, modifie_le.isoformat(), champs)
+    non_modifie = _non_modifie(request, etag, modifie_le)
+    if non_modifie is not None:
+        return non_modifie
+
+    bien = get_object_or_404(projection(BienImmobilier.objects.all(), champs), pk=pk)
+    return _json(serialiser_bien(bien, champs), etag=etag, last_modified=modifie_le)
+
+
+@api_vue(budget=4)
+def proprietaires_resume(request, pk):
+    """Owner name and counters, from the DashboardStats snapshot."""
+    proprietaire = Proprietaire.objects.only("id", "nom_complet").filter(pk=pk).first()
+    if proprietaire is None:
+        return _erreur(404, {"__all__": ["Propriétaire introuvable."]})
+    stats = lire_stats(cle_proprietaire(pk))
+    donnees = {
+        "id": proprietaire.pk,
+        "nom_complet": proprietaire.nom_complet,
+        "nb_biens": stats.nb_biens,
+        "nb_biens_disponibles": stats.nb_biens_disponibles,
+        "nb_contrats": stats.nb_contrats,
+        "nb_contrats_actifs": stats.nb_contrats_actifs,
+    }
+    # Two primary-key reads: hashing the payload itself is the cheap watermark here.
+    etag = _etag(sorted(donnees.items()))
+    return _non_modifie(request, etag) or _json(donnees, etag=etag)
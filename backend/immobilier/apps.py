@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ImmobilierConfig(AppConfig):
     name = 'immobilier'
+
+    def ready(self):
+        # Import signal handlers to ensure they're registered
+        import immobilier.signals  # noqa: F401
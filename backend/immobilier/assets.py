@@ -0,0 +1,208 @@
+"""CSS bundles built from ``immobilier/assets/css`` and served with far-future caching.
+
+The sources are the page stylesheets formerly inlined in the templates. The
+build splits them into rules, hoists the rules shared verbatim by several pages
+(and defined nowhere else differently) into the ``commun`` bundle, minifies the
+rest and writes one bundle per page under ``ASSETS_BUILD_DIR``.
+
+``BundlesFinder`` exposes the bundles to ``runserver`` and ``collectstatic``,
+rebuilding them when a source changed. ``StockageStatique`` then gives them
+content-hashed names and writes ``.gz`` (and ``.br`` when the ``brotli``
+package is installed) variants next to them, which ``servir_statique`` picks
+according to ``Accept-Encoding``, with an immutable Cache-Control for hashed
+names.
+"""
+import gzip
+import mimetypes
+import re
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import BaseFinder
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+
+from .instrumentation import budget_requetes
+
+try:
+    import brotli
+except ImportError:  # optional: gzip variants only
+    brotli = None
+
+
+SOURCES = Path(__file__).resolve().parent / "assets" / "css"
+PREFIXE = "immobilier/css"
+COMMUN = "commun"
+
+# bundle -> sources, in cascade order
+BUNDLES = {
+    "base": ["base.css"],
+    "dashboard": ["dashboard.css"],
+    "biens_liste": ["biens_liste.css", "pagination.css"],
+    "biens_detail": ["biens_detail.css"],
+    "biens_form": ["biens_form.css"],
+    "proprietaires_liste": ["proprietaires_liste.css", "pagination.css"],
+    "proprietaires_form": ["proprietaires_form.css"],
+    "proprietaires_confirm_delete": ["proprietaires_confirm_delete.css"],
+    "contrats_liste": ["contrats_liste.css", "pagination.css"],
+    "contrats_form": ["contrats_form.css"],
+    "contrats_confirm_delete": ["contrats_confirm_delete.css"],
+    "login": ["login.css"],
+    "home": ["home.css"],
+}
+# Pages that do not load ``commun`` after ``base`` (standalone or the base itself).
+AUTONOMES = {"base", "login", "home"}
+
+EXTENSIONS_COMPRESSEES = (".css", ".js", ".svg", ".json")
+CACHE_IMMUABLE = "public, max-age=31536000, immutable"
+
+
+def regles(css):
+    """Top-level rules (an ``@media`` block counts as one), whitespace-normalised."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    resultat, profondeur, debut = [], 0, 0
+    for position, caractere in enumerate(css):
+        if caractere == "{":
+            profondeur += 1
+        elif caractere == "}":
+            profondeur -= 1
+            if profondeur == 0:
+                resultat.append(re.sub(r"\s+", " ", css[debut : position + 1]).strip())
+                debut = position + 1
+    return resultat
+
+
+def _selecteur(regle):
+    return regle.split("{", 1)[0].strip()
+
+
+def minifier(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    # Not around ":" in general: "a :hover" and "a:hover" are different selectors.
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def composer_bundles(sources=SOURCES, bundles=BUNDLES):
+    """``{bundle: css}``, with the shared rules moved to ``COMMUN``."""
+    contenus = {}
+    for nom, fichiers in bundles.items():
+        liste = [r for fichier in fichiers for r in regles((Path(sources) / fichier).read_text("utf-8"))]
+        # A repeated rule keeps its last position, the one that decided the cascade.
+        contenus[nom] = list(reversed(dict.fromkeys(reversed(liste))))
+
+    pages = [nom for nom in contenus if nom not in AUTONOMES]
+    occurrences = Counter(r for nom in pages for r in contenus[nom])
+    definitions = {}
+    for nom in contenus:
+        for r in contenus[nom]:
+            definitions.setdefault(_selecteur(r), set()).add(r)
+    # Hoisting a rule ahead of the page rules is only safe if no page gives its selector another meaning.
+    partagees = [r for r, n in occurrences.items() if n > 1 and len(definitions[_selecteur(r)]) == 1]
+
+    resultat = {COMMUN: minifier("".join(partagees))}
+    partagees = set(partagees)
+    for nom, liste in contenus.items():
+        propres = liste if nom in AUTONOMES else [r for r in liste if r not in partagees]
+        resultat[nom] = minifier("".join(propres))
+    return resultat
+
+
+def construire(destination=None, forcer=False):
+    """Write the bundles if a source is newer than them; returns their paths relative to ``destination``."""
+    destination = Path(destination or settings.ASSETS_BUILD_DIR)
+    chemins = [f"{PREFIXE}/{nom}.css" for nom in (COMMUN, *BUNDLES)]
+    sorties = [destination / chemin for chemin in chemins]
+    if not forcer and all(sortie.exists() for sortie in sorties):
+        plus_recente = max(source.stat().st_mtime for source in SOURCES.glob("*.css"))
+        if min(sortie.stat().st_mtime for sortie in sorties) >= plus_recente:
+            return chemins
+
+    (destination / PREFIXE).mkdir(parents=True, exist_ok=True)
+    for nom, css in composer_bundles().items():
+        (destination / PREFIXE / f"{nom}.css").write_text(css + "\n", "utf-8")
+    return chemins
+
+
+class BundlesFinder(BaseFinder):
+    """Staticfiles finder for the built bundles."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.storage = FileSystemStorage(location=settings.ASSETS_BUILD_DIR)
+
+    def find(self, path, find_all=False, **kwargs):
+        if path in construire():
+            trouve = self.storage.path(path)
+            return [trouve] if find_all else trouve
+        return []
+
+    def list(self, ignore_patterns):
+        for chemin in construire():
+            yield chemin, self.storage
+
+
+class StockageStatique(ManifestStaticFilesStorage):
+    """Hashed names plus precompressed variants of the text assets."""
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Not collected yet (tests, DEBUG=False without collectstatic): the finders still serve it.
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        traites = set()
+        for nom, nom_hache, traite in super().post_process(paths, dry_run=dry_run, **options):
+            if isinstance(nom_hache, str):
+                traites.add(nom_hache)
+            yield nom, nom_hache, traite
+        if not dry_run:
+            for nom_hache in sorted(traites):
+                if nom_hache.endswith(EXTENSIONS_COMPRESSEES):
+                    self._compresser(nom_hache)
+
+    def _compresser(self, nom):
+        chemin = Path(self.path(nom))
+        contenu = chemin.read_bytes()
+        with gzip.GzipFile(chemin.with_name(chemin.name + ".gz"), "wb", compresslevel=9, mtime=0) as sortie:
+            sortie.write(contenu)
+        if brotli is not None:
+            chemin.with_name(chemin.name + ".br").write_bytes(brotli.compress(contenu))
+
+
+@budget_requetes(0)
+def servir_statique(request, chemin):
+    """Serve a collected file, precompressed if possible; hashed names are cached for a year."""
+    try:
+        fichier = Path(safe_join(settings.STATIC_ROOT, chemin))
+    except SuspiciousFileOperation:
+        raise Http404
+    if not fichier.is_file():
+        raise Http404
+
+    acceptes = {e.split(";")[0].strip() for e in request.headers.get("Accept-Encoding", "").split(",")}
+    encodage, servi = None, fichier
+    for nom, extension in (("br", ".br"), ("gzip", ".gz")):
+        variante = fichier.with_name(fichier.name + extension)
+        if nom in acceptes and variante.is_file():
+            encodage, servi = nom, variante
+            break
+
+    type_contenu = mimetypes.guess_type(fichier.name)[0] or "application/octet-stream"
+    if type_contenu.startswith("text/") or type_contenu.endswith(("javascript", "json")):
+        type_contenu += "; charset=utf-8"
+    response = FileResponse(open(servi, "rb"), content_type=type_contenu, filename=fichier.name)
+    if encodage:
+        response["Content-Encoding"] = encodage
+    response["Vary"] = "Accept-Encoding"
+    hache = chemin in getattr(staticfiles_storage, "hashed_files", {}).values()
+    response["Cache-Control"] = CACHE_IMMUABLE if hache else "public, no-cache"
+    return response
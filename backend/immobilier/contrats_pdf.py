@@ -0,0 +1,148 @@
+"""Contract PDF rendering with a content-addressed disk cache.
+
+A rendered PDF is stored as ``<empreinte>.pdf`` where the fingerprint hashes
+every contract, bien and owner field printed on the document. Editing any of
+them changes the fingerprint, so stale files are simply never looked up again
+(``purger_cache_pdf`` removes them). The fingerprint doubles as the ETag.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout below changes so cached files are re-rendered.
+GABARIT_VERSION = 1
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="contrats-pdf")
+
+
+def dossier_cache():
+    return Path(getattr(settings, "CONTRATS_PDF_CACHE_DIR", Path(settings.BASE_DIR) / "cache" / "contrats_pdf"))
+
+
+def donnees_contrat(contrat):
+    """Every value printed on the PDF, as plain data that can be sent to a worker process."""
+    bien = contrat.bien
+    return {
+        "pk": contrat.pk,
+        "locataire_nom": contrat.locataire_nom,
+        "date_debut": contrat.date_debut,
+        "date_fin": contrat.date_fin,
+        "caution": contrat.caution,
+        "actif": contrat.actif,
+        "bien_titre": bien.titre,
+        "bien_adresse": bien.adresse,
+        "bien_ville": bien.ville,
+        "loyer_mensuel": bien.loyer_mensuel,
+        "proprietaire_nom": bien.proprietaire.nom_complet,
+    }
+
+
+def empreinte_donnees(donnees):
+    valeurs = [GABARIT_VERSION, *(donnees[cle] for cle in sorted(donnees))]
+    return hashlib.sha256("\x1f".join(str(v) for v in valeurs).encode("utf-8")).hexdigest()
+
+
+def empreinte_contrat(contrat):
+    return empreinte_donnees(donnees_contrat(contrat))
+
+
+def dessiner_contrat(d, fichier):
+    p = canvas.Canvas(fichier, pagesize=A4)
+    width, height = A4
+
+    # Titre
+    p.setFont("Helvetica-Bold", 20)
+    p.drawString(200, height - 80, "CONTRAT DE LOCATION")
+
+    # Ligne de séparation
+    p.line(50, height - 95, width - 50, height - 95)
+
+    # Infos contrat
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, height - 130, "Informations du contrat")
+
+    p.setFont("Helvetica", 11)
+    p.drawString(50, height - 155, f"Locataire : {d['locataire_nom']}")
+    p.drawString(50, height - 175, f"Bien : {d['bien_titre']}")
+    p.drawString(50, height - 195, f"Adresse : {d['bien_adresse']}, {d['bien_ville']}")
+    p.drawString(50, height - 215, f"Propriétaire : {d['proprietaire_nom']}")
+    p.drawString(50, height - 235, f"Loyer mensuel : {d['loyer_mensuel']} FCFA")
+    p.drawString(50, height - 255, f"Caution : {d['caution']} FCFA")
+    p.drawString(50, height - 275, f"Date début : {d['date_debut']}")
+    p.drawString(50, height - 295, f"Date fin : {d['date_fin']}")
+    p.drawString(50, height - 315, f"Statut : {'Actif' if d['actif'] else 'Inactif'}")
+
+    # Ligne de séparation
+    p.line(50, height - 335, width - 50, height - 335)
+
+    # Signatures
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, height - 370, "Signatures")
+    p.setFont("Helvetica", 11)
+
+    p.drawString(50, height - 420, f" Propriétaire : {d['proprietaire_nom']}")
+
+    p.drawString(300, height - 420, f"Locataire : {d['locataire_nom']}")
+
+    p.showPage()
+    p.save()
+
+
+def rendre_en_cache(donnees, dossier, empreinte=None):
+    """Path of the cached PDF for ``donnees``, rendering it first on a miss.
+
+    Needs no Django setup, so it can run in a ProcessPoolExecutor worker.
+    """
+    empreinte = empreinte or empreinte_donnees(donnees)
+    dossier = Path(dossier)
+    chemin = dossier / f"{empreinte}.pdf"
+    if chemin.exists():
+        os.utime(chemin)  # keeps recently served files out of purger_cache_pdf
+        return chemin
+
+    dossier.mkdir(parents=True, exist_ok=True)
+    # Render to a temporary file and rename so readers never see a partial PDF.
+    descripteur, temporaire = tempfile.mkstemp(dir=dossier, suffix=".tmp")
+    try:
+        with os.fdopen(descripteur, "wb") as fichier:
+            dessiner_contrat(donnees, fichier)
+        os.replace(temporaire, chemin)
+    except BaseException:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+        raise
+    return chemin
+
+
+def pdf_contrat(contrat, empreinte=None):
+    return rendre_en_cache(donnees_contrat(contrat), dossier_cache(), empreinte)
+
+
+def _prerendre(contrat_id):
+    from .models import ContratLocation
+
+    try:
+        contrat = ContratLocation.objects.select_related("bien", "bien__proprietaire").filter(pk=contrat_id).first()
+        if contrat:
+            pdf_contrat(contrat)
+    except Exception:
+        logger.exception("Échec du pré-rendu du contrat %s", contrat_id)
+    finally:
+        close_old_connections()
+
+
+def planifier_prerendu(contrat_id):
+    """Render the PDF in the background after commit, when CONTRATS_PDF_PRERENDU is on."""
+    if getattr(settings, "CONTRATS_PDF_PRERENDU", False):
+        transaction.on_commit(lambda: _executor.submit(_prerendre, contrat_id))
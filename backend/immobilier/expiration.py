@@ -0,0 +1,48 @@
+"""Deactivate leases whose ``date_fin`` has passed, in set-based UPDATEs.
+
+Signals do not fire for ``QuerySet.update``, so the DashboardStats deltas are
+computed from grouped counts beforehand and applied in the same transaction.
+"""
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from .models import BienImmobilier, ContratLocation
+from .stats import appliquer_deltas, contributions_bien, contributions_contrat, difference
+
+
+def contrats_expires(date_reference, using="default"):
+    return ContratLocation.objects.using(using).filter(actif=True, date_fin__lt=date_reference)
+
+
+def biens_a_liberer(date_reference, using="default"):
+    """Unavailable biens whose active contracts are all expired (and there is at least one)."""
+    actifs = ContratLocation.objects.using(using).filter(bien=OuterRef("pk"), actif=True)
+    return BienImmobilier.objects.using(using).filter(
+        Exists(actifs.filter(date_fin__lt=date_reference)),
+        ~Exists(actifs.filter(date_fin__gte=date_reference)),
+        disponible=False,
+    )
+
+
+def expirer_contrats(date_reference=None, dry_run=False, using="default"):
+    """Returns ``(nb_contrats_desactives, nb_biens_liberes)``."""
+    date_reference = date_reference or timezone.localdate()
+    contrats = contrats_expires(date_reference, using)
+    biens = biens_a_liberer(date_reference, using)
+
+    with transaction.atomic(using=using):
+        par_proprietaire = contrats.order_by().values("bien__proprietaire_id").annotate(n=Count("id"))
+        par_ville = biens.order_by().values("proprietaire_id", "ville").annotate(n=Count("id"))
+        ancien = [contributions_contrat(row["bien__proprietaire_id"], True, 0, row["n"]) for row in par_proprietaire]
+        ancien += [contributions_bien(row["proprietaire_id"], row["ville"], False, row["n"]) for row in par_ville]
+        nouveau = [contributions_bien(row["proprietaire_id"], row["ville"], True, row["n"]) for row in par_ville]
+        if dry_run:
+            return sum(row["n"] for row in par_proprietaire), sum(row["n"] for row in par_ville)
+
+        # Biens first: the selection relies on the contracts still being active.
+        nb_biens = biens.update(disponible=True, modifie_le=Now())
+        nb_contrats = contrats.update(actif=False)
+        appliquer_deltas(difference(nouveau, ancien), using=using)
+    return nb_contrats, nb_biens
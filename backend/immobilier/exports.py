@@ -0,0 +1,297 @@
+"""Bulk exports streamed to the client.
+
+``flux_zip_contrats`` renders contract PDFs in a process pool (through the
+content-addressed cache of ``contrats_pdf``) and writes them into a ZIP that is
+yielded chunk by chunk, so memory stays bounded by the in-flight window rather
+than by the number of contracts. Web requests share one pool of
+``CONTRATS_PDF_WORKERS`` processes per worker, created on first use, so
+concurrent exports queue for it instead of each forking a pool of their own.
+
+``lignes_export`` reads a list view's queryset as tuples with
+``values_list(...).iterator()`` (a server-side cursor on PostgreSQL) and maps
+choice values to their labels from in-memory dicts; ``flux_csv`` and
+``flux_xlsx`` turn those rows into bytes as they arrive.
+"""
+import csv
+import re
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.utils import timezone
+
+from .contrats_pdf import donnees_contrat, dossier_cache, rendre_en_cache
+from .models import BienImmobilier
+
+
+class _FluxSortie:
+    """Write-only, unseekable file object collecting what ZipFile writes."""
+
+    def __init__(self):
+        self._morceaux = []
+        self._position = 0
+
+    def write(self, donnees):
+        self._morceaux.append(bytes(donnees))
+        self._position += len(donnees)
+        return len(donnees)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        morceaux, self._morceaux = self._morceaux, []
+        return b"".join(morceaux)
+
+
+def nom_fichier_contrat(donnees):
+    return f"contrat_{donnees['pk']}.pdf"
+
+
+def _workers_partages():
+    return getattr(settings, "CONTRATS_PDF_WORKERS", 2)
+
+
+_pool = None
+_pool_verrou = threading.Lock()
+
+
+def pool_partage():
+    """The process pool shared by the exports of this process."""
+    global _pool
+    with _pool_verrou:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_workers_partages())
+        return _pool
+
+
+def _abandonner_pool(pool):
+    global _pool
+    with _pool_verrou:
+        if _pool is pool:
+            _pool = None
+
+
+def flux_zip_contrats(contrats, workers=None, fenetre=None, chunk_size=200):
+    """Yield the bytes of a ZIP holding one PDF per contract of ``contrats``.
+
+    Renders run in the shared pool, or in a pool of ``workers`` processes of
+    its own (management command). At most ``fenetre`` renders are in flight;
+    entries are written in queryset order.
+    """
+    pool = ProcessPoolExecutor(max_workers=workers) if workers else pool_partage()
+    fenetre = fenetre or (workers or _workers_partages()) * 4
+    dossier = str(dossier_cache())
+    contrats = contrats.select_related("bien", "bien__proprietaire")
+
+    sortie = _FluxSortie()
+    en_cours = deque()
+    try:
+        # PDFs barely compress; storing them keeps the CPU for rendering.
+        with zipfile.ZipFile(sortie, mode="w", compression=zipfile.ZIP_STORED) as archive:
+
+            def ecrire_premier():
+                donnees, future = en_cours.popleft()
+                archive.write(future.result(), arcname=nom_fichier_contrat(donnees))
+                return sortie.vider()
+
+            for contrat in contrats.iterator(chunk_size=chunk_size):
+                donnees = donnees_contrat(contrat)
+                en_cours.append((donnees, pool.submit(rendre_en_cache, donnees, dossier)))
+                if len(en_cours) >= fenetre:
+                    yield ecrire_premier()
+            while en_cours:
+                yield ecrire_premier()
+        yield sortie.vider()
+    except BrokenProcessPool:
+        # A render process died: the next export starts a fresh pool.
+        _abandonner_pool(pool)
+        raise
+    finally:
+        if workers:
+            pool.shutdown(wait=True, cancel_futures=True)
+        else:
+            # Client gone: free the shared pool from this export's queued renders.
+            for _, future in en_cours:
+                future.cancel()
+
+
+OUI_NON = {True: "Oui", False: "Non"}
+VILLES = dict(BienImmobilier.VILLE_CHOICES)
+TYPES_BIEN = dict(BienImmobilier.TYPE_BIEN_CHOICES)
+
+# (header, values_list path, labels or None)
+COLONNES_BIENS = [
+    ("ID", "id", None),
+    ("Titre", "titre", None),
+    ("Adresse", "adresse", None),
+    ("Ville", "ville", VILLES),
+    ("Superficie (m²)", "superficie_m2", None),
+    ("Loyer mensuel", "loyer_mensuel", None),
+    ("Type", "type_bien", TYPES_BIEN),
+    ("Disponible", "disponible", OUI_NON),
+    ("Propriétaire", "proprietaire__nom_complet", None),
+    ("Créé le", "cree_le", None),
+]
+COLONNES_CONTRATS = [
+    ("ID", "id", None),
+    ("Locataire", "locataire_nom", None),
+    ("Bien", "bien__titre", None),
+    ("Ville", "bien__ville", VILLES),
+    ("Type", "bien__type_bien", TYPES_BIEN),
+    ("Propriétaire", "bien__proprietaire__nom_complet", None),
+    ("Début", "date_debut", None),
+    ("Fin", "date_fin", None),
+    ("Loyer mensuel", "bien__loyer_mensuel", None),
+    ("Caution", "caution", None),
+    ("Actif", "actif", OUI_NON),
+]
+COLONNES_PROPRIETAIRES = [
+    ("ID", "id", None),
+    ("Nom complet", "nom_complet", None),
+    ("Email", "email", None),
+    ("Téléphone", "telephone", None),
+    ("Biens", "nb_biens", None),
+    ("Biens disponibles", "nb_biens_disponibles", None),
+]
+
+
+def lignes_export(queryset, colonnes, chunk_size=2000):
+    """Yield the header, then one list per row; labels come from dicts, not lookups."""
+    yield [entete for entete, _, _ in colonnes]
+    libelles = [libelle for _, _, libelle in colonnes]
+    for valeurs in queryset.values_list(*[champ for _, champ, _ in colonnes]).iterator(chunk_size=chunk_size):
+        yield [libelle.get(v, v) if libelle else v for v, libelle in zip(valeurs, libelles)]
+
+
+class _Echo:
+    def write(self, valeur):
+        return valeur
+
+
+# Text a spreadsheet would evaluate as a formula when the CSV is opened (CSV injection).
+_DEBUTS_FORMULE = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _texte_csv(valeur):
+    if isinstance(valeur, datetime):
+        return timezone.localtime(valeur).strftime("%Y-%m-%d %H:%M") if timezone.is_aware(valeur) else valeur
+    if isinstance(valeur, str) and valeur.startswith(_DEBUTS_FORMULE):
+        return "'" + valeur
+    return valeur
+
+
+def flux_csv(lignes, taille_morceau=64 * 1024):
+    """CSV text (with a BOM so Excel detects UTF-8), yielded in pieces of about ``taille_morceau``."""
+    # ";" is the list separator of French-locale Excel.
+    writer = csv.writer(_Echo(), delimiter=";")
+    morceau = ["\ufeff"]
+    taille = 0
+    for ligne in lignes:
+        texte = writer.writerow([_texte_csv(v) for v in ligne])
+        morceau.append(texte)
+        taille += len(texte)
+        if taille >= taille_morceau:
+            yield "".join(morceau)
+            morceau, taille = [], 0
+    yield "".join(morceau)
+
+
+_XLSX_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_XLSX_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_XLSX_PKG = "http://schemas.openxmlformats.org/package/2006"
+_XLSX_CT = "application/vnd.openxmlformats-officedocument.spreadsheetml"
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+# Cell styles (cellXfs indexes): 1 date, 2 date and time, 3 bold header.
+_XLSX_STYLES = (
+    f'{_XML}<styleSheet xmlns="{_XLSX_NS}">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    "</styleSheet>"
+)
+_EPOQUE_EXCEL = datetime(1899, 12, 30)
+# Characters XML 1.0 does not allow: a single one makes the whole sheet unreadable.
+_XML_INTERDITS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+
+def _fichiers_xlsx(feuille):
+    return {
+        "[Content_Types].xml": (
+            f'{_XML}<Types xmlns="{_XLSX_PKG}/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            f'<Override PartName="/xl/workbook.xml" ContentType="{_XLSX_CT}.sheet.main+xml"/>'
+            f'<Override PartName="/xl/worksheets/sheet1.xml" ContentType="{_XLSX_CT}.worksheet+xml"/>'
+            f'<Override PartName="/xl/styles.xml" ContentType="{_XLSX_CT}.styles+xml"/>'
+            "</Types>"
+        ),
+        "_rels/.rels": (
+            f'{_XML}<Relationships xmlns="{_XLSX_PKG}/relationships">'
+            f'<Relationship Id="rId1" Type="{_XLSX_REL}/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>"
+        ),
+        "xl/workbook.xml": (
+            f'{_XML}<workbook xmlns="{_XLSX_NS}" xmlns:r="{_XLSX_REL}">'
+            f'<sheets><sheet name="{escape(feuille[:31])}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            f'{_XML}<Relationships xmlns="{_XLSX_PKG}/relationships">'
+            f'<Relationship Id="rId1" Type="{_XLSX_REL}/worksheet" Target="worksheets/sheet1.xml"/>'
+            f'<Relationship Id="rId2" Type="{_XLSX_REL}/styles" Target="styles.xml"/>'
+            "</Relationships>"
+        ),
+        "xl/styles.xml": _XLSX_STYLES,
+    }
+
+
+def _cellule_xlsx(valeur, style=0):
+    if valeur is None or valeur == "":
+        return "<c/>"
+    if isinstance(valeur, datetime):
+        if timezone.is_aware(valeur):
+            valeur = timezone.make_naive(valeur)
+        return f'<c s="2"><v>{(valeur - _EPOQUE_EXCEL).total_seconds() / 86400:.6f}</v></c>'
+    if isinstance(valeur, date):
+        return f'<c s="1"><v>{(valeur - _EPOQUE_EXCEL.date()).days}</v></c>'
+    if isinstance(valeur, (int, float, Decimal)) and not isinstance(valeur, bool):
+        return f"<c><v>{valeur}</v></c>"
+    attribut = f' s="{style}"' if style else ""
+    return f'<c t="inlineStr"{attribut}><is><t xml:space="preserve">{escape(_XML_INTERDITS.sub("", str(valeur)))}</t></is></c>'
+
+
+def flux_xlsx(lignes, feuille="Export", lignes_par_morceau=500):
+    """A one-sheet XLSX workbook, written row by row into a streamed ZIP (no spreadsheet library)."""
+    sortie = _FluxSortie()
+    with zipfile.ZipFile(sortie, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for nom, contenu in _fichiers_xlsx(feuille).items():
+            archive.writestr(nom, contenu)
+        yield sortie.vider()
+        with archive.open("xl/worksheets/sheet1.xml", mode="w", force_zip64=True) as xml:
+            xml.write(f'{_XML}<worksheet xmlns="{_XLSX_NS}"><sheetData>'.encode())
+            tampon = []
+            for numero, ligne in enumerate(lignes):
+                style = 3 if numero == 0 else 0
+                tampon.append("<row>" + "".join(_cellule_xlsx(v, style) for v in ligne) + "</row>")
+                if len(tampon) >= lignes_par_morceau:
+                    xml.write("".join(tampon).encode())
+                    tampon = []
+                    yield sortie.vider()
+            xml.write(("".join(tampon) + "</sheetData></worksheet>").encode())
+    yield sortie.vider()
@@ -0,0 +1,50 @@
+"""Filters shared by the list views and their bulk exports."""
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+
+def _date(valeur):
+    try:
+        return parse_date(valeur or "")
+    except ValueError:
+        return None
+
+
+def filtrer_biens(biens, params):
+    """Apply the ``biens_liste`` search ``q`` (titre or ville)."""
+    recherche = (params.get("q") or "").strip()
+    if recherche:
+        biens = biens.filter(Q(titre__icontains=recherche) | Q(ville__icontains=recherche))
+    return biens
+
+
+def filtrer_proprietaires(proprietaires, params):
+    """Apply the ``proprietaires_liste`` search ``q`` (nom, email or téléphone)."""
+    recherche = (params.get("q") or "").strip()
+    if recherche:
+        proprietaires = proprietaires.filter(
+            Q(nom_complet__icontains=recherche)
+            | Q(email__icontains=recherche)
+            | Q(telephone__icontains=recherche)
+        )
+    return proprietaires
+
+
+def filtrer_contrats(contrats, params):
+    """Apply the ``contrats_liste`` filters: ``q``, ``actif`` ("1"/"0"), ``du`` / ``au`` on date_debut."""
+    recherche = (params.get("q") or "").strip()
+    if recherche:
+        contrats = contrats.filter(
+            Q(locataire_nom__icontains=recherche)
+            | Q(bien__titre__icontains=recherche)
+            | Q(bien__proprietaire__nom_complet__icontains=recherche)
+        )
+    actif = params.get("actif")
+    if actif in ("1", "0"):
+        contrats = contrats.filter(actif=actif == "1")
+    du, au = _date(params.get("du")), _date(params.get("au"))
+    if du:
+        contrats = contrats.filter(date_debut__gte=du)
+    if au:
+        contrats = contrats.filter(date_debut__lte=au)
+    return contrats
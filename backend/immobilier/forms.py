@@ -1,26 +1,22 @@
 from django import forms
+from django.core.exceptions import ValidationError
 from django.db.models import Q
 from .models import BienImmobilier, ContratLocation, Proprietaire
+from .televersements import charger
 
 
-class MultipleFileInput(forms.ClearableFileInput):
-    allow_multiple_selected = True
+class TeleversementsField(forms.Field):
+    """Ids of finished chunked uploads (see immobilier.televersements), as hidden inputs."""
 
+    widget = forms.MultipleHiddenInput
 
-class MultipleFileField(forms.FileField):
-    def __init__(self, *args, **kwargs):
-        kwargs.setdefault("widget", MultipleFileInput())
-        super().__init__(*args, **kwargs)
-
-    def clean(self, data, initial=None):
-        single_file_clean = super().clean
-        if isinstance(data, (list, tuple)):
-            return [single_file_clean(item, initial) for item in data]
-        return single_file_clean(data, initial)
+    def to_python(self, value):
+        return list(dict.fromkeys(value or []))
 
 
 class BienImmobilierForm(forms.ModelForm):
-    images = MultipleFileField(required=False, label="Images du bien")
+    # Photos are uploaded beforehand, in chunks; the form only carries their ids.
+    televersements = TeleversementsField(required=False, label="Images du bien")
 
     class Meta:
         model = BienImmobilier
@@ -35,6 +31,25 @@ class BienImmobilierForm(forms.ModelForm):
             "disponible",
         ]
 
+    def __init__(self, *args, utilisateur=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.utilisateur = utilisateur
+
+    def clean_televersements(self):
+        televersements = []
+        for ident in self.cleaned_data["televersements"]:
+            televersement = charger(getattr(self.utilisateur, "pk", None), ident)
+            if televersement is None or not televersement.termine:
+                raise ValidationError("Une image n'a pas fini d'être téléversée ; réessayez.")
+            televersements.append(televersement)
+        return televersements
+
+
+class TeleversementForm(forms.Form):
+    nom = forms.CharField(max_length=255)
+    taille = forms.IntegerField(min_value=1)
+    empreinte = forms.RegexField(r"^[0-9a-fA-F]{64}$", error_messages={"invalid": "Empreinte SHA-256 attendue."})
+
 
 class ProprietaireForm(forms.ModelForm):
     class Meta:
@@ -67,6 +82,9 @@ class ContratLocationForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # The choice field already loaded the bien; contrat_actif_unique would
+        # cost a query and the database enforces it on save, see views._enregistrer_contrat.
+        self.instance.contraintes_en_base = frozenset({"bien"})
         self.fields["bien"].queryset = BienImmobilier.objects.none()
 
         selected_owner_id = self.data.get("proprietaire") or self.initial.get("proprietaire")
@@ -77,10 +95,11 @@ class ContratLocationForm(forms.ModelForm):
             selected_owner_id = selected_owner_id or current_owner_id
 
         if selected_owner_id:
-            self.fields["bien"].queryset = BienImmobilier.objects.filter(
-                Q(proprietaire_id=selected_owner_id, disponible=True)
-                | Q(pk=getattr(self.instance, "bien_id", None))
-            ).order_by("titre")
+            biens = Q(proprietaire_id=selected_owner_id, disponible=True)
+            if getattr(self.instance, "bien_id", None):
+                # "OR id IS NULL" would defeat the (proprietaire, disponible) index
+                biens |= Q(pk=self.instance.bien_id)
+            self.fields["bien"].queryset = BienImmobilier.objects.filter(biens).order_by("titre")
 
         if self.instance and self.instance.pk:
             self.fields["bien"].queryset = BienImmobilier.objects.filter(
@@ -92,7 +111,6 @@ class ContratLocationForm(forms.ModelForm):
         bien = cleaned_data.get("bien")
         date_debut = cleaned_data.get("date_debut")
         date_fin = cleaned_data.get("date_fin")
-        actif = cleaned_data.get("actif")
 
         if date_debut and date_fin and date_fin <= date_debut:
             self.add_error("date_fin", "La date de fin doit être après la date de début.")
@@ -102,12 +120,4 @@ class ContratLocationForm(forms.ModelForm):
         if bien and proprietaire and bien.proprietaire_id != proprietaire.id:
             self.add_error("bien", "Le bien sélectionné ne correspond pas au propriétaire choisi.")
 
-        if bien and actif:
-            contrats_actifs = ContratLocation.objects.filter(bien=bien, actif=True)
-            if self.instance.pk:
-                contrats_actifs = contrats_actifs.exclude(pk=self.instance.pk)
-
-            if contrats_actifs.exists():
-                self.add_error("actif", "Ce bien a déjà un contrat actif.")
-
         return cleaned_data
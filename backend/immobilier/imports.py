@@ -0,0 +1,424 @@
+"""Streaming bulk import of owners, properties, contracts and images.
+
+Rows are read one at a time (CSV with a header line, or JSON Lines) and handled
+in batches: the references of a batch (owner of a bien, bien of a contract) are
+loaded with one query, every row is validated with the regular form, and the
+valid ones are written with ``bulk_create``. ``bulk_create`` sends no signals,
+so no notification email goes out; the importer applies the dashboard deltas
+and availability changes the signal handlers would otherwise have made.
+Invalid rows are reported with their line number and skipped.
+
+An optional ``id`` column keeps the source identifiers, so that the biens file
+can refer to the owners of the owners file, and so on.
+"""
+import csv
+import io
+import json
+import os
+import zipfile
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.color import no_style
+from django.db import DatabaseError, connections, transaction
+from django.db.models.functions import Now
+
+from .forms import BienImmobilierForm, ContratLocationForm, ProprietaireForm
+from .models import CONTRAT_ACTIF_EXISTANT, BienImage, BienImmobilier, ContratLocation, Proprietaire
+from .stats import appliquer_deltas_en_masse, contributions_bien, contributions_contrat, contributions_proprietaire, difference
+
+
+FORMATS = ("csv", "jsonl")
+VALEURS_FAUSSES = {"", "0", "false", "faux", "non", "no", "n"}
+
+
+def detecter_format(nom):
+    extension = os.path.splitext(nom)[1].lower()
+    return {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".zip": "zip"}.get(extension)
+
+
+def lire_lignes(fichier, format):
+    """Yield ``(numero_de_ligne, donnees, erreur)`` from a binary file, without loading it."""
+    texte = io.TextIOWrapper(fichier, encoding="utf-8-sig", newline="")
+    if format == "csv":
+        lecteur = csv.DictReader(texte)
+        for donnees in lecteur:
+            yield lecteur.line_num, {cle: (v or "").strip() for cle, v in donnees.items() if cle}, None
+        return
+    for numero, ligne in enumerate(texte, start=1):
+        if not ligne.strip():
+            continue
+        try:
+            donnees = json.loads(ligne)
+        except ValueError as exc:
+            yield numero, None, f"JSON invalide : {exc}"
+            continue
+        if not isinstance(donnees, dict):
+            yield numero, None, "Chaque ligne doit être un objet JSON."
+            continue
+        yield numero, donnees, None
+
+
+def _entier(valeur):
+    try:
+        return int(valeur)
+    except (TypeError, ValueError):
+        return None
+
+
+class RapportImport:
+    """Counts of one import; keeps the first ``max_erreurs`` errors, counts all of them."""
+
+    def __init__(self, sur_erreur=None, max_erreurs=100):
+        self.lignes = 0
+        self.importees = 0
+        self.nb_erreurs = 0
+        self.erreurs = []
+        self.sur_erreur = sur_erreur
+        self.max_erreurs = max_erreurs
+
+    def erreur(self, ligne, message):
+        self.nb_erreurs += 1
+        if len(self.erreurs) < self.max_erreurs:
+            self.erreurs.append((ligne, message))
+        if self.sur_erreur:
+            self.sur_erreur(ligne, message)
+
+
+def _message_formulaire(form):
+    return " ; ".join(
+        f"{champ} : {' '.join(messages)}" if champ != "__all__" else " ".join(messages)
+        for champ, messages in form.errors.items()
+    )
+
+
+class ReferenceLot(forms.ModelChoiceField):
+    """ModelChoiceField resolved against the rows the importer loaded for the batch."""
+
+    connus = {}
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.connus[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages["invalid_choice"], code="invalid_choice", params={"value": value}
+            )
+
+
+class _ReferencesVerifiees:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # ReferenceLot already proved the referenced rows exist; skip the
+        # model-level ForeignKey check, one query per row.
+        self.instance.references_verifiees = frozenset(
+            nom for nom, champ in self.fields.items() if isinstance(champ, ReferenceLot)
+        )
+
+
+class BienImportForm(_ReferencesVerifiees, BienImmobilierForm):
+    proprietaire = ReferenceLot(Proprietaire.objects.none())
+
+
+class ContratImportForm(_ReferencesVerifiees, ContratLocationForm):
+    proprietaire = ReferenceLot(Proprietaire.objects.none(), label="Propriétaire")
+    bien = ReferenceLot(BienImmobilier.objects.none())
+    # ids of the biens holding an active contract, filled in per batch
+    biens_occupes = frozenset()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        bien = cleaned_data.get("bien")
+        if bien and cleaned_data.get("actif") and bien.pk in self.biens_occupes:
+            self.add_error("actif", CONTRAT_ACTIF_EXISTANT)
+        return cleaned_data
+
+
+class _Import:
+    modele = None
+    formulaire = None
+    booleens = ()
+
+    def __init__(self, rapport=None, batch_size=1000, using="default"):
+        self.rapport = rapport or RapportImport()
+        self.batch_size = batch_size
+        self.using = using
+        self.ids_explicites = False
+
+    def executer(self, fichier, format):
+        lot = []
+        for numero, donnees, erreur in lire_lignes(fichier, format):
+            self.rapport.lignes += 1
+            if erreur:
+                self.rapport.erreur(numero, erreur)
+                continue
+            lot.append((numero, self._normaliser(donnees)))
+            if len(lot) >= self.batch_size:
+                self._traiter_lot(lot)
+                lot = []
+        if lot:
+            self._traiter_lot(lot)
+        if self.ids_explicites:
+            self._recaler_sequence()
+        return self.rapport
+
+    def _normaliser(self, donnees):
+        donnees = {cle: "" if v is None else v for cle, v in donnees.items()}
+        for champ in self.booleens:
+            valeur = donnees.pop(champ, None)
+            if valeur in (None, ""):
+                valeur = self.modele._meta.get_field(champ).default
+            elif isinstance(valeur, str):
+                valeur = valeur.strip().lower() not in VALEURS_FAUSSES
+            if valeur:
+                donnees[champ] = "on"
+        return donnees
+
+    def _ids(self, lot, colonne):
+        return {n for n in (_entier(donnees.get(colonne)) for _, donnees in lot) if n is not None}
+
+    def preparer(self, lot):
+        """Load what the forms of this batch refer to."""
+
+    def formulaire_pour(self, donnees):
+        return self.formulaire(data=donnees)
+
+    def accepter(self, instance):
+        """Called for each valid row, before the batch is written."""
+
+    def apres_creation(self, instances):
+        """Apply what the post_save handlers would have done."""
+
+    def _traiter_lot(self, lot):
+        existants = set()
+        ids_lot = self._ids(lot, "id")
+        if ids_lot:
+            self.ids_explicites = True
+            existants = set(
+                self.modele.objects.using(self.using).filter(pk__in=ids_lot).values_list("pk", flat=True)
+            )
+        self.preparer(lot)
+
+        valides = []
+        for numero, donnees in lot:
+            form = self.formulaire_pour(donnees)
+            if not form.is_valid():
+                self.rapport.erreur(numero, _message_formulaire(form))
+                continue
+            instance = form.save(commit=False)
+            if donnees.get("id") not in (None, ""):
+                instance.pk = _entier(donnees["id"])
+                if instance.pk is None:
+                    self.rapport.erreur(numero, f"id : identifiant invalide ({donnees['id']}).")
+                    continue
+                if instance.pk in existants:
+                    self.rapport.erreur(numero, f"id : l'identifiant {instance.pk} existe déjà.")
+                    continue
+                existants.add(instance.pk)
+            self.accepter(instance)
+            valides.append((numero, instance))
+
+        if not valides:
+            return
+        instances = [instance for _, instance in valides]
+        try:
+            with transaction.atomic(using=self.using):
+                self.modele.objects.using(self.using).bulk_create(instances)
+                self.apres_creation(instances)
+        except DatabaseError as exc:
+            for numero, _ in valides:
+                self.rapport.erreur(numero, f"Lot rejeté par la base : {exc}")
+            return
+        self.rapport.importees += len(instances)
+
+    def _recaler_sequence(self):
+        connexion = connections[self.using]
+        requetes = connexion.ops.sequence_reset_sql(no_style(), [self.modele])
+        if requetes:
+            with connexion.cursor() as cursor:
+                for sql in requetes:
+                    cursor.execute(sql)
+
+
+class ImportProprietaires(_Import):
+    modele = Proprietaire
+    formulaire = ProprietaireForm
+
+    def apres_creation(self, instances):
+        appliquer_deltas_en_masse(difference([contributions_proprietaire()] * len(instances)), using=self.using)
+
+
+class ImportBiens(_Import):
+    modele = BienImmobilier
+    formulaire = BienImportForm
+    booleens = ("disponible",)
+
+    def preparer(self, lot):
+        self.proprietaires = Proprietaire.objects.using(self.using).in_bulk(self._ids(lot, "proprietaire"))
+
+    def formulaire_pour(self, donnees):
+        form = super().formulaire_pour(donnees)
+        form.fields["proprietaire"].connus = self.proprietaires
+        return form
+
+    def apres_creation(self, instances):
+        appliquer_deltas_en_masse(
+            difference([contributions_bien(b.proprietaire_id, b.ville, b.disponible) for b in instances]),
+            using=self.using,
+        )
+
+
+class ImportContrats(_Import):
+    modele = ContratLocation
+    formulaire = ContratImportForm
+    booleens = ("actif",)
+
+    def preparer(self, lot):
+        self.biens = BienImmobilier.objects.using(self.using).in_bulk(self._ids(lot, "bien"))
+        for _, donnees in lot:
+            # The owner column is optional: it defaults to the bien's owner.
+            bien = self.biens.get(_entier(donnees.get("bien")))
+            if bien is not None and donnees.get("proprietaire") in (None, ""):
+                donnees["proprietaire"] = bien.proprietaire_id
+        self.proprietaires = Proprietaire.objects.using(self.using).in_bulk(self._ids(lot, "proprietaire"))
+        self.biens_occupes = set(
+            ContratLocation.objects.using(self.using)
+            .filter(bien_id__in=list(self.biens), actif=True)
+            .values_list("bien_id", flat=True)
+        )
+
+    def formulaire_pour(self, donnees):
+        form = super().formulaire_pour(donnees)
+        form.fields["bien"].connus = self.biens
+        form.fields["proprietaire"].connus = self.proprietaires
+        form.biens_occupes = self.biens_occupes
+        return form
+
+    def accepter(self, contrat):
+        # Two active contracts for the same bien within one file.
+        if contrat.actif:
+            self.biens_occupes.add(contrat.bien_id)
+
+    def apres_creation(self, contrats):
+        deltas = [contributions_contrat(c.bien.proprietaire_id, c.actif) for c in contrats]
+        loues = {c.bien_id: c.bien for c in contrats if c.actif and c.bien.disponible}
+        if loues:
+            BienImmobilier.objects.using(self.using).filter(pk__in=list(loues)).update(disponible=False, modifie_le=Now())
+            for bien in loues.values():
+                deltas.append(contributions_bien(bien.proprietaire_id, bien.ville, False))
+                deltas.append(difference(ancien=[contributions_bien(bien.proprietaire_id, bien.ville, True)]))
+                bien.disponible = False
+        appliquer_deltas_en_masse(difference(deltas), using=self.using)
+
+
+class ImportImages(_Import):
+    """ZIP archive of ``<id du bien>/<photo>`` entries.
+
+    Renditions are not generated inline; run ``manage.py generer_renditions``
+    afterwards (templates fall back to the original meanwhile).
+    """
+
+    modele = BienImage
+
+    def executer(self, fichier, format="zip"):
+        with zipfile.ZipFile(fichier) as archive:
+            lot = []
+            for entree in archive.infolist():
+                if entree.is_dir() or entree.filename.startswith("__MACOSX/"):
+                    continue
+                self.rapport.lignes += 1
+                lot.append(entree)
+                if len(lot) >= self.batch_size:
+                    self._traiter_archive(archive, lot)
+                    lot = []
+            if lot:
+                self._traiter_archive(archive, lot)
+        return self.rapport
+
+    def _traiter_archive(self, archive, lot):
+        references = {}
+        for entree in lot:
+            dossier, _, nom = entree.filename.rpartition("/")
+            references[entree.filename] = (dossier.rsplit("/", 1)[-1], nom)
+        ids = {int(d) for d, _ in references.values() if d.isdigit()}
+        biens = set(BienImmobilier.objects.using(self.using).filter(pk__in=ids).values_list("pk", flat=True))
+
+        champ = forms.ImageField()
+        images = []
+        try:
+            for entree in lot:
+                dossier, nom = references[entree.filename]
+                if not dossier.isdigit() or int(dossier) not in biens:
+                    self.rapport.erreur(entree.filename, f"bien : aucun bien d'identifiant « {dossier} ».")
+                    continue
+                try:
+                    # One image in memory at a time.
+                    fichier = champ.clean(SimpleUploadedFile(nom, archive.read(entree)))
+                except ValidationError as exc:
+                    self.rapport.erreur(entree.filename, f"image : {' '.join(exc.messages)}")
+                    continue
+                image = BienImage(bien_id=int(dossier))
+                chemin = image.image.field.generate_filename(image, nom)
+                fichier.seek(0)
+                image.image.name = default_storage.save(chemin, fichier)
+                images.append(image)
+            with transaction.atomic(using=self.using):
+                BienImage.objects.using(self.using).bulk_create(images)
+                BienImmobilier.objects.using(self.using).filter(
+                    pk__in={image.bien_id for image in images}
+                ).update(modifie_le=Now())
+        except BaseException:
+            for image in images:
+                default_storage.delete(image.image.name)
+            raise
+        self.rapport.importees += len(images)
+
+
+class ImportFichierForm(forms.Form):
+    fichier = forms.FileField(label="Fichier")
+    format = forms.ChoiceField(
+        label="Format",
+        required=False,
+        choices=[("", "D'après l'extension"), ("csv", "CSV"), ("jsonl", "JSON Lines")],
+    )
+
+    def __init__(self, *args, type_import=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.type_import = type_import
+        if type_import == "images":
+            del self.fields["format"]
+            self.fields["fichier"].help_text = "Archive ZIP : un dossier par bien, nommé d'après son identifiant."
+
+    def clean(self):
+        cleaned_data = super().clean()
+        fichier = cleaned_data.get("fichier")
+        if fichier is None:
+            return cleaned_data
+        format = "zip" if self.type_import == "images" else cleaned_data.get("format") or detecter_format(fichier.name)
+        if format not in (*FORMATS, "zip") or (format == "zip") != (self.type_import == "images"):
+            self.add_error("fichier", "Format de fichier non pris en charge pour cet import.")
+        cleaned_data["format"] = format
+        return cleaned_data
+
+
+IMPORTS = {
+    "proprietaires": ImportProprietaires,
+    "biens": ImportBiens,
+    "contrats": ImportContrats,
+    "images": ImportImages,
+}
+
+
+def importer(type_import, fichier, format=None, batch_size=1000, rapport=None, using="default"):
+    """Import ``fichier`` (a binary file object) and return its RapportImport."""
+    if type_import not in IMPORTS:
+        raise ValueError(f"Type d'import inconnu : {type_import}")
+    if type_import == "images":
+        format = "zip"
+    elif format not in FORMATS:
+        raise ValueError(f"Format inconnu : {format} (attendu : {', '.join(FORMATS)})")
+    return IMPORTS[type_import](rapport=rapport, batch_size=batch_size, using=using).executer(fichier, format)
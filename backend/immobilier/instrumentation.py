@@ -0,0 +1,165 @@
+"""Per-request SQL instrumentation: query budgets and N+1 detection.
+
+``RequetesMiddleware`` times the request and records every query of it with
+its duration and the template being rendered when it ran. Templates are
+attributed by the ``TemplatesInstrumentes`` backend (``TEMPLATES["BACKEND"]``),
+which marks the rendering of each template it loads; queries run by an
+``{% include %}`` or a parent template count for the template the view rendered.
+At the end of the request it checks
+
+- the budget declared on the view with ``@budget_requetes(n)``;
+- repeated query shapes: the same SQL (parameters aside) issued
+  ``REQUETES_SEUIL_REPETITIONS`` times or more is the signature of an N+1.
+
+Violations raise ``BudgetRequetesDepasse`` when ``REQUETES_STRICT`` is on (the
+view tests turn it on with ``override_settings``) and are logged otherwise. A
+``Server-Timing`` header exposes the SQL time, the rest of the view's time and,
+for each template, its queries and rendering time to the browser dev tools.
+"""
+import contextvars
+import logging
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+
+logger = logging.getLogger("immobilier.requetes")
+
+_template_courant = contextvars.ContextVar("immobilier_template_courant", default=None)
+_releve_courant = contextvars.ContextVar("immobilier_releve_courant", default=None)
+
+
+class BudgetRequetesDepasse(AssertionError):
+    pass
+
+
+def budget_requetes(maximum, repetitions=True):
+    """Declare the maximum number of SQL queries a view may issue.
+
+    ``maximum=None`` leaves the count open and ``repetitions=False`` skips the
+    N+1 check, for views that issue the same statements once per batch (imports).
+    """
+
+    def decorateur(vue):
+        vue.budget_requetes = maximum
+        vue.detecter_repetitions = repetitions
+        return vue
+
+    return decorateur
+
+
+class _Releve:
+    def __init__(self):
+        self.requetes = []  # (sql, durée en s, template)
+        self.rendus = defaultdict(float)  # template -> durée de rendu en s
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.requetes.append((sql, time.perf_counter() - debut, _template_courant.get()))
+
+    @property
+    def duree(self):
+        return sum(duree for _, duree, _ in self.requetes)
+
+    def par_template(self):
+        """``{template: [requêtes, durée SQL, durée de rendu]}``; "(vue)" for queries outside any template."""
+        totaux = defaultdict(lambda: [0, 0.0, 0.0])
+        for _, duree, template in self.requetes:
+            totaux[template or "(vue)"][0] += 1
+            totaux[template or "(vue)"][1] += duree
+        for template, duree in self.rendus.items():
+            totaux[template][2] += duree
+        return dict(totaux)
+
+    def repetitions(self, seuil):
+        formes = Counter(sql for sql, _, _ in self.requetes)
+        return [(sql, n) for sql, n in formes.most_common() if n >= seuil]
+
+
+class TemplateInstrumente(Template):
+    def render(self, context=None, request=None):
+        releve = _releve_courant.get()
+        jeton = _template_courant.set(self.template.name)
+        debut = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            _template_courant.reset(jeton)
+            if releve is not None:
+                releve.rendus[self.template.name] += time.perf_counter() - debut
+
+
+class TemplatesInstrumentes(DjangoTemplates):
+    """The Django template backend, with templates that report their rendering to ``RequetesMiddleware``."""
+
+    def from_string(self, template_code):
+        return TemplateInstrumente(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TemplateInstrumente(super().get_template(template_name).template, self)
+
+
+class RequetesMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        releve = _Releve()
+        jeton = _releve_courant.set(releve)
+        debut = time.perf_counter()
+        try:
+            with ExitStack() as pile:
+                for alias in connections:
+                    pile.enter_context(connections[alias].execute_wrapper(releve))
+                response = self.get_response(request)
+        finally:
+            _releve_courant.reset(jeton)
+        # Streaming bodies (PDF, ZIP exports) are produced later and not counted.
+        vue = time.perf_counter() - debut - releve.duree
+        self._verifier(request, releve, vue)
+        mesures = [
+            f'db;dur={releve.duree * 1000:.1f};desc="{len(releve.requetes)} requetes"',
+            f'vue;dur={vue * 1000:.1f};desc="vue et rendu hors SQL"',
+        ]
+        for template, (n, duree_sql, duree_rendu) in releve.par_template().items():
+            if template != "(vue)":
+                mesures.append(
+                    f'tpl;dur={duree_rendu * 1000:.1f};desc="{template} : {n} requetes, {duree_sql * 1000:.1f} ms SQL"'
+                )
+        response["Server-Timing"] = ", ".join(mesures)
+        return response
+
+    def _verifier(self, request, releve, duree_vue):
+        match = getattr(request, "resolver_match", None)
+        vue = match.view_name if match else request.path
+        budget = getattr(match.func, "budget_requetes", None) if match else None
+        seuil = getattr(settings, "REQUETES_SEUIL_REPETITIONS", 5)
+
+        problemes = []
+        if budget is not None and len(releve.requetes) > budget:
+            problemes.append(f"{len(releve.requetes)} requêtes pour un budget de {budget}")
+        if match is None or getattr(match.func, "detecter_repetitions", True):
+            repetitions = releve.repetitions(seuil)
+        else:
+            repetitions = []
+        for sql, n in repetitions:
+            problemes.append(f"{n}x la même requête (N+1 probable) : {sql[:200]}")
+        if not problemes:
+            logger.debug("%s : %s requêtes, %.1f ms", vue, len(releve.requetes), releve.duree * 1000)
+            return
+
+        details = ", ".join(
+            f"{template} {n} req/{duree * 1000:.1f} ms" for template, (n, duree, _) in releve.par_template().items()
+        )
+        details += f" ; SQL {releve.duree * 1000:.1f} ms, vue et rendu {duree_vue * 1000:.1f} ms"
+        message = f"{vue} : " + " ; ".join(problemes) + f" [{details}]"
+        if getattr(settings, "REQUETES_STRICT", False):
+            raise BudgetRequetesDepasse(message)
+        logger.warning(message)
@@ -0,0 +1,29 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from immobilier.exports import flux_zip_contrats
+from immobilier.filtres import filtrer_contrats
+from immobilier.models import ContratLocation
+
+
+class Command(BaseCommand):
+    help = "Exporte les PDF des contrats filtrés dans une archive ZIP (mêmes filtres que la liste)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("sortie", help="Chemin du fichier ZIP à écrire.")
+        parser.add_argument("--q", default="")
+        parser.add_argument("--actif", choices=["1", "0"])
+        parser.add_argument("--du", help="Date de début minimale (AAAA-MM-JJ).")
+        parser.add_argument("--au", help="Date de début maximale (AAAA-MM-JJ).")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        params = {cle: options[cle] for cle in ("q", "actif", "du", "au")}
+        contrats = filtrer_contrats(ContratLocation.objects.all(), params).order_by("-date_debut", "-id")
+        taille = 0
+        with open(options["sortie"], "wb") as fichier:
+            for morceau in flux_zip_contrats(contrats, workers=options["workers"]):
+                fichier.write(morceau)
+                taille += len(morceau)
+        self.stdout.write(self.style.SUCCESS(f"{options['sortie']} écrit ({taille} octets)."))
@@ -0,0 +1,53 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Now
+
+from immobilier.models import BienImage, BienImmobilier
+from immobilier.thumbnails import creer_renditions
+
+
+class Command(BaseCommand):
+    help = "Génère les vignettes (carte, galerie, complet ; WebP + JPEG) des images existantes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--force", action="store_true", help="Régénère aussi les images déjà traitées.")
+
+    def handle(self, *args, **options):
+        images = BienImage.objects.order_by("pk")
+        if not options["force"]:
+            images = images.filter(renditions={})
+        racine = str(settings.MEDIA_ROOT)
+        batch_size = options["batch_size"]
+
+        traitees = erreurs = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            lot = []
+            for pk, nom in images.values_list("pk", "image").iterator(chunk_size=batch_size):
+                lot.append((pk, nom))
+                if len(lot) >= batch_size:
+                    ok, ko = self._traiter_lot(pool, racine, lot)
+                    traitees, erreurs, lot = traitees + ok, erreurs + ko, []
+            ok, ko = self._traiter_lot(pool, racine, lot)
+            traitees, erreurs = traitees + ok, erreurs + ko
+
+        self.stdout.write(self.style.SUCCESS(f"{traitees} image(s) traitée(s), {erreurs} erreur(s)."))
+
+    def _traiter_lot(self, pool, racine, lot):
+        futures = {pool.submit(creer_renditions, racine, nom): (pk, nom) for pk, nom in lot}
+        a_enregistrer = []
+        erreurs = 0
+        for future in as_completed(futures):
+            pk, nom = futures[future]
+            try:
+                a_enregistrer.append(BienImage(pk=pk, renditions=future.result()))
+            except Exception as exc:
+                erreurs += 1
+                self.stderr.write(f"  {nom} : {exc}")
+        BienImage.objects.bulk_update(a_enregistrer, ["renditions"])
+        BienImmobilier.objects.filter(images__in=[image.pk for image in a_enregistrer]).update(modifie_le=Now())
+        return len(a_enregistrer), erreurs
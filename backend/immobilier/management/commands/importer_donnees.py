@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from immobilier.imports import FORMATS, IMPORTS, RapportImport, detecter_format, importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe en flux un fichier CSV ou JSON Lines de propriétaires, biens ou contrats, ou une "
+        "archive ZIP d'images (<id du bien>/<photo>), par lots bulk_create et sans notification."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("type", choices=sorted(IMPORTS))
+        parser.add_argument("fichier")
+        parser.add_argument("--format", choices=FORMATS, help="Déduit de l'extension par défaut.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        format = options["format"] or detecter_format(options["fichier"])
+        if options["type"] != "images" and format not in FORMATS:
+            raise CommandError("Format inconnu : précisez --format csv ou --format jsonl.")
+
+        def sur_erreur(ligne, message):
+            self.stderr.write(f"  ligne {ligne} : {message}")
+
+        debut = time.monotonic()
+        try:
+            with open(options["fichier"], "rb") as fichier:
+                rapport = importer(
+                    options["type"],
+                    fichier,
+                    format=format,
+                    batch_size=options["batch_size"],
+                    rapport=RapportImport(sur_erreur=sur_erreur, max_erreurs=0),
+                )
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        style = self.style.SUCCESS if not rapport.nb_erreurs else self.style.WARNING
+        self.stdout.write(style(
+            f"{rapport.importees}/{rapport.lignes} ligne(s) importée(s), {rapport.nb_erreurs} erreur(s), "
+            f"en {time.monotonic() - debut:.1f}s."
+        ))
+        if options["type"] == "images" and rapport.importees:
+            self.stdout.write("Lancez `manage.py generer_renditions` pour créer les vignettes.")
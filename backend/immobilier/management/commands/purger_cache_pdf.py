@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from immobilier.contrats_pdf import dossier_cache
+
+
+class Command(BaseCommand):
+    help = "Supprime les PDF de contrats en cache non servis depuis N jours."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jours", type=int, default=30)
+
+    def handle(self, *args, **options):
+        limite = time.time() - options["jours"] * 86400
+        supprimes = 0
+        dossier = dossier_cache()
+        if dossier.exists():
+            for chemin in dossier.iterdir():
+                if chemin.stat().st_mtime < limite:
+                    chemin.unlink(missing_ok=True)
+                    supprimes += 1
+        self.stdout.write(self.style.SUCCESS(f"{supprimes} fichier(s) supprimé(s)."))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from immobilier.televersements import dossier_televersements
+
+
+class Command(BaseCommand):
+    help = "Supprime les téléversements d'images abandonnés depuis N heures."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--heures", type=int, default=24)
+
+    def handle(self, *args, **options):
+        limite = time.time() - options["heures"] * 3600
+        supprimes = 0
+        dossier = dossier_televersements()
+        if dossier.exists():
+            # A chunk touches the .part file: an upload in progress is never purged.
+            for chemin in dossier.glob("*.part"):
+                if chemin.stat().st_mtime < limite:
+                    chemin.unlink(missing_ok=True)
+                    chemin.with_suffix(".json").unlink(missing_ok=True)
+                    supprimes += 1
+        self.stdout.write(self.style.SUCCESS(f"{supprimes} téléversement(s) supprimé(s)."))
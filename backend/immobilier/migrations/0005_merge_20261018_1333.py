@@ -0,0 +1,14 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:33
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immobilier', '0004_alter_bienimmobilier_id_alter_contratlocation_id_and_more'),
+        ('immobilier', '0004_bienimage'),
+    ]
+
+    operations = [
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:40
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+CHAMPS_STATS = ("nb_proprietaires", "nb_biens", "nb_biens_disponibles", "nb_contrats", "nb_contrats_actifs")
+
+
+def _calculer_stats(Proprietaire, BienImmobilier, ContratLocation, using):
+    # Frozen copy of stats.calculer_stats and its row keys at the time of this migration.
+    lignes = defaultdict(lambda: dict.fromkeys(CHAMPS_STATS, 0))
+    disponibles = Count("id", filter=Q(disponible=True))
+
+    lignes["global"]["nb_proprietaires"] = Proprietaire.objects.using(using).count()
+
+    biens = BienImmobilier.objects.using(using).order_by()
+    for row in biens.values("proprietaire_id", "ville").annotate(n=Count("id"), d=disponibles):
+        proprietaire, ville = row["proprietaire_id"], row["ville"]
+        for cle in ("global", f"proprietaire:{proprietaire}", f"ville:{ville}", f"proprietaire:{proprietaire}:ville:{ville}"):
+            lignes[cle]["nb_biens"] += row["n"]
+            lignes[cle]["nb_biens_disponibles"] += row["d"]
+
+    contrats = ContratLocation.objects.using(using).order_by()
+    for row in contrats.values("bien__proprietaire_id").annotate(n=Count("id"), a=Count("id", filter=Q(actif=True))):
+        for cle in ("global", f"proprietaire:{row['bien__proprietaire_id']}"):
+            lignes[cle]["nb_contrats"] += row["n"]
+            lignes[cle]["nb_contrats_actifs"] += row["a"]
+
+    return lignes
+
+
+def remplir_stats(apps, schema_editor):
+    """The table is new: compute every row from the source tables and insert it."""
+    modeles = (apps.get_model("immobilier", nom) for nom in ("Proprietaire", "BienImmobilier", "ContratLocation"))
+    DashboardStats = apps.get_model("immobilier", "DashboardStats")
+    using = schema_editor.connection.alias
+    DashboardStats.objects.using(using).bulk_create(
+        [
+            DashboardStats(cle=cle, ville=cle.rsplit("ville:", 1)[1] if "ville:" in cle else "", **valeurs)
+            for cle, valeurs in _calculer_stats(*modeles, using).items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immobilier', '0006_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardStats',
+            fields=[
+                ('cle', models.CharField(max_length=150, primary_key=True, serialize=False)),
+                ('ville', models.CharField(blank=True, choices=[('yaounde', 'Yaoundé'), ('douala', 'Douala'), ('bafoussam', 'Bafoussam'), ('bamenda', 'Bamenda'), ('garoua', 'Garoua'), ('maroua', 'Maroua'), ('ngaoundere', 'Ngaoundéré'), ('bertoua', 'Bertoua'), ('ebolowa', 'Ebolowa'), ('kribi', 'Kribi'), ('limbe', 'Limbé'), ('buea', 'Buéa'), ('kumba', 'Kumba'), ('dschang', 'Dschang'), ('nkongsamba', 'Nkongsamba'), ('edea', 'Edéa'), ('mbalmayo', 'Mbalmayo'), ('sangmelima', 'Sangmélima'), ('meiganga', 'Meiganga'), ('kousseri', 'Kousséri')], max_length=100)),
+                ('nb_proprietaires', models.IntegerField(default=0)),
+                ('nb_biens', models.IntegerField(default=0)),
+                ('nb_biens_disponibles', models.IntegerField(default=0)),
+                ('nb_contrats', models.IntegerField(default=0)),
+                ('nb_contrats_actifs', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(remplir_stats, migrations.RunPython.noop),
+    ]
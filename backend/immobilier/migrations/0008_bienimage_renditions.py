@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immobilier', '0007_dashboardstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bienimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immobilier', '0009_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bienimmobilier',
+            name='modifie_le',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
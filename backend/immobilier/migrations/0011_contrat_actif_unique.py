@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:35
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, F, OuterRef, Q
+
+
+def desactiver_doublons(apps, schema_editor):
+    """Keep the most recent active contract of each bien, so the constraint can be created.
+
+    The dashboard counters lose the deactivated contracts in place: an active
+    contract counts under the global key and under its owner's key.
+    """
+    ContratLocation = apps.get_model("immobilier", "ContratLocation")
+    DashboardStats = apps.get_model("immobilier", "DashboardStats")
+    using = schema_editor.connection.alias
+    contrats = ContratLocation.objects.using(using)
+    plus_recent = contrats.filter(bien=OuterRef("bien"), actif=True).filter(
+        Q(date_debut__gt=OuterRef("date_debut")) | Q(date_debut=OuterRef("date_debut"), pk__gt=OuterRef("pk"))
+    )
+    doublons = contrats.filter(Exists(plus_recent), actif=True)
+    par_proprietaire = list(doublons.values_list("bien__proprietaire_id").annotate(n=Count("id")).order_by())
+    if not par_proprietaire:
+        return
+    doublons.update(actif=False)
+    stats = DashboardStats.objects.using(using)
+    for proprietaire_id, n in par_proprietaire:
+        stats.filter(cle=f"proprietaire:{proprietaire_id}").update(nb_contrats_actifs=F("nb_contrats_actifs") - n)
+    total = sum(n for _, n in par_proprietaire)
+    stats.filter(cle="global").update(nb_contrats_actifs=F("nb_contrats_actifs") - total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immobilier', '0010_bienimmobilier_modifie_le'),
+    ]
+
+    operations = [
+        migrations.RunPython(desactiver_doublons, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='contratlocation',
+            constraint=models.UniqueConstraint(condition=models.Q(('actif', True)), fields=('bien',), name='contrat_actif_unique', violation_error_message='Ce bien a déjà un contrat actif.'),
+        ),
+    ]
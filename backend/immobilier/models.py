@@ -2,16 +2,41 @@ from django.db import models
 from django.core.validators import MinValueValidator
 
 
+class ControlesDelegues:
+	"""Model validation that skips the checks a caller made itself or leaves to the database.
+
+	Set on an instance before full_clean(): ``references_verifiees`` names the
+	foreign keys whose rows are known to exist (clean_fields would query each
+	one), ``contraintes_en_base`` the fields whose constraints are enforced by
+	the database on save.
+	"""
+
+	references_verifiees = frozenset()
+	contraintes_en_base = frozenset()
+
+	def clean_fields(self, exclude=None):
+		super().clean_fields(exclude={*(exclude or ()), *self.references_verifiees})
+
+	def validate_constraints(self, exclude=None):
+		super().validate_constraints(exclude={*(exclude or ()), *self.contraintes_en_base})
+
+
 class Proprietaire(models.Model):
 	nom_complet = models.CharField(max_length=120)
 	email = models.EmailField(blank=True)
 	telephone = models.CharField(max_length=20, blank=True)
 
+	class Meta:
+		indexes = [
+			# keyset pagination of proprietaires_liste
+			models.Index(fields=["nom_complet", "id"], name="proprio_nom_id_idx"),
+		]
+
 	def __str__(self):
 		return self.nom_complet
 
 
-class BienImmobilier(models.Model):
+class BienImmobilier(ControlesDelegues, models.Model):
 	APPARTEMENT = "appartement"
 	MAISON = "maison"
 	TERRAIN = "terrain"
@@ -77,6 +102,18 @@ class BienImmobilier(models.Model):
 	proprietaire = models.ForeignKey(Proprietaire, on_delete=models.CASCADE, related_name="biens")
 	disponible = models.BooleanField(default=True)
 	cree_le = models.DateTimeField(auto_now_add=True)
+	# Bumped on every change visible through the API, images and owner name included (see signals)
+	modifie_le = models.DateTimeField(auto_now=True)
+
+	class Meta:
+		indexes = [
+			# keyset pagination of biens_liste
+			models.Index(fields=["cree_le", "id"], name="bien_cree_le_id_idx"),
+			# available listings, newest first; partial so SQLite can match a bare "WHERE disponible"
+			models.Index(fields=["-cree_le", "-id"], condition=models.Q(disponible=True), name="bien_dispo_cree_idx"),
+			# owner dashboard and per-owner counters
+			models.Index(fields=["proprietaire", "disponible"], name="bien_proprio_dispo_idx"),
+		]
 
 	def __str__(self):
 		return self.titre
@@ -85,16 +122,25 @@ class BienImmobilier(models.Model):
 class BienImage(models.Model):
 	bien = models.ForeignKey(BienImmobilier, on_delete=models.CASCADE, related_name="images")
 	image = models.ImageField(upload_to="biens/")
+	# Pre-generated sizes, filled in by immobilier.thumbnails
+	renditions = models.JSONField(default=dict, blank=True)
 	cree_le = models.DateTimeField(auto_now_add=True)
 
 	class Meta:
 		ordering = ["-cree_le"]
+		indexes = [
+			# images of a bien in display order
+			models.Index(fields=["bien", "-cree_le"], name="image_bien_cree_idx"),
+		]
 
 	def __str__(self):
 		return f"Image - {self.bien.titre}"
 
 
-class ContratLocation(models.Model):
+CONTRAT_ACTIF_EXISTANT = "Ce bien a déjà un contrat actif."
+
+
+class ContratLocation(ControlesDelegues, models.Model):
 	bien = models.ForeignKey(BienImmobilier, on_delete=models.CASCADE, related_name="contrats")
 	locataire_nom = models.CharField(max_length=120)
 	date_debut = models.DateField()
@@ -104,6 +150,37 @@ class ContratLocation(models.Model):
 
 	class Meta:
 		ordering = ["-date_debut"]
+		indexes = [
+			# keyset pagination of contrats_liste
+			models.Index(fields=["date_debut", "id"], name="contrat_debut_id_idx"),
+			# "does this bien have an active contract" (availability updates)
+			models.Index(fields=["bien", "actif"], name="contrat_bien_actif_idx"),
+			# expirer_contrats only looks at active leases
+			models.Index(fields=["date_fin"], condition=models.Q(actif=True), name="contrat_actif_fin_idx"),
+		]
+		constraints = [
+			# At most one active lease per bien, whatever the concurrent submissions.
+			models.UniqueConstraint(
+				fields=["bien"],
+				condition=models.Q(actif=True),
+				name="contrat_actif_unique",
+				violation_error_message=CONTRAT_ACTIF_EXISTANT,
+			),
+		]
 
 	def __str__(self):
 		return f"{self.locataire_nom} - {self.bien.titre}"
+
+
+class DashboardStats(models.Model):
+	# Scope key, see immobilier.stats: "global", "proprietaire:<id>", "ville:<ville>", ...
+	cle = models.CharField(max_length=150, primary_key=True)
+	ville = models.CharField(max_length=100, blank=True, choices=BienImmobilier.VILLE_CHOICES)
+	nb_proprietaires = models.IntegerField(default=0)
+	nb_biens = models.IntegerField(default=0)
+	nb_biens_disponibles = models.IntegerField(default=0)
+	nb_contrats = models.IntegerField(default=0)
+	nb_contrats_actifs = models.IntegerField(default=0)
+
+	def __str__(self):
+		return self.cle
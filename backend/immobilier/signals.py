@@ -0,0 +1,137 @@
+from django.conf import settings
+from django.db.models import Count, Q
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import BienImage, BienImmobilier, ContratLocation, DashboardStats, Proprietaire
+from .stats import (
+    abandonner_deltas,
+    appliquer_deltas,
+    cle_proprietaire,
+    contributions_bien,
+    contributions_contrat,
+    contributions_proprietaire,
+    difference,
+    filtre_prefixe,
+    proprietaire_groupe,
+)
+from .contrats_pdf import planifier_prerendu
+from .thumbnails import planifier_renditions, supprimer_renditions
+
+
+# Dashboard statistics: pre_save remembers the row as stored, post_save
+# applies the difference to the DashboardStats snapshot.
+
+CHAMPS_STATS_BIEN = ("proprietaire_id", "ville", "disponible")
+CHAMPS_STATS_CONTRAT = ("bien__proprietaire_id", "actif")
+
+
+def _etat_bien(bien):
+    return bien.proprietaire_id, bien.ville, bien.disponible
+
+
+def _proprietaire_du_contrat(contrat, using):
+    if ContratLocation.bien.is_cached(contrat):
+        return contrat.bien.proprietaire_id
+    proprietaire_id = proprietaire_groupe(contrat.bien_id)
+    if proprietaire_id is not None:
+        return proprietaire_id
+    return BienImmobilier.objects.using(using).filter(pk=contrat.bien_id).values_list("proprietaire_id", flat=True).first()
+
+
+@receiver(pre_save, sender=BienImmobilier)
+def memoriser_etat_bien(sender, instance, using, update_fields=None, **kwargs):
+    if instance._state.adding:
+        instance._etat_stats = None
+    elif update_fields is not None and not {"proprietaire", "proprietaire_id", "ville", "disponible"}.intersection(update_fields):
+        instance._etat_stats = _etat_bien(instance)
+    else:
+        instance._etat_stats = (
+            BienImmobilier.objects.using(using).filter(pk=instance.pk).values_list(*CHAMPS_STATS_BIEN).first()
+        )
+
+
+@receiver(post_save, sender=BienImmobilier)
+def maj_stats_bien(sender, instance, using, **kwargs):
+    ancien = getattr(instance, "_etat_stats", None)
+    nouveau = _etat_bien(instance)
+    avant = [contributions_bien(*ancien)] if ancien else []
+    apres = [contributions_bien(*nouveau)]
+
+    if ancien and ancien[0] != nouveau[0]:
+        # Reassigned: the bien's contracts now count for the new owner.
+        contrats = instance.contrats.aggregate(n=Count("id"), a=Count("id", filter=Q(actif=True)))
+        if contrats["n"]:
+            avant.append(contributions_contrat(ancien[0], True, contrats["n"], contrats["a"]))
+            apres.append(contributions_contrat(nouveau[0], True, contrats["n"], contrats["a"]))
+
+    appliquer_deltas(difference(apres, avant), using=using)
+    instance._etat_stats = nouveau
+
+
+@receiver(post_delete, sender=BienImmobilier)
+def retirer_stats_bien(sender, instance, using, **kwargs):
+    appliquer_deltas(difference(ancien=[contributions_bien(*_etat_bien(instance))]), using=using)
+
+
+@receiver(pre_save, sender=ContratLocation)
+def memoriser_etat_contrat(sender, instance, using, **kwargs):
+    instance._etat_stats = None
+    if not instance._state.adding:
+        instance._etat_stats = (
+            ContratLocation.objects.using(using).filter(pk=instance.pk).values_list(*CHAMPS_STATS_CONTRAT).first()
+        )
+
+
+@receiver(post_save, sender=ContratLocation)
+def maj_stats_contrat(sender, instance, using, **kwargs):
+    ancien = getattr(instance, "_etat_stats", None)
+    nouveau = (_proprietaire_du_contrat(instance, using), instance.actif)
+    avant = [contributions_contrat(*ancien)] if ancien else []
+    appliquer_deltas(difference([contributions_contrat(*nouveau)], avant), using=using)
+    instance._etat_stats = nouveau
+
+
+@receiver(post_delete, sender=ContratLocation)
+def retirer_stats_contrat(sender, instance, using, **kwargs):
+    proprietaire_id = _proprietaire_du_contrat(instance, using)
+    appliquer_deltas(difference(ancien=[contributions_contrat(proprietaire_id, instance.actif)]), using=using)
+
+
+@receiver(post_save, sender=Proprietaire)
+def maj_stats_proprietaire(sender, instance, created, using, **kwargs):
+    if created:
+        appliquer_deltas(contributions_proprietaire(), using=using)
+    else:
+        # The owner's name is part of the API representation of each bien.
+        BienImmobilier.objects.using(using).filter(proprietaire=instance).update(modifie_le=Now())
+
+
+@receiver(post_delete, sender=Proprietaire)
+def retirer_stats_proprietaire(sender, instance, using, **kwargs):
+    appliquer_deltas(difference(ancien=[contributions_proprietaire()]), using=using)
+    cle = cle_proprietaire(instance.pk)
+    abandonner_deltas(cle)
+    DashboardStats.objects.using(using).filter(Q(cle=cle) | filtre_prefixe(f"{cle}:")).delete()
+
+
+@receiver(post_save, sender=BienImage)
+def generer_renditions_image(sender, instance, created, using, raw=False, **kwargs):
+    if created and not raw:
+        planifier_renditions(instance.pk)
+        BienImmobilier.objects.using(using).filter(pk=instance.bien_id).update(modifie_le=Now())
+
+
+@receiver(post_delete, sender=BienImage)
+def supprimer_renditions_image(sender, instance, using, origin=None, **kwargs):
+    supprimer_renditions(str(settings.MEDIA_ROOT), instance.renditions)
+    # origin is the image or queryset deleted; cascades from a bien or an owner have nothing left to bump.
+    if getattr(origin, "model", type(origin)) is BienImage:
+        BienImmobilier.objects.using(using).filter(pk=instance.bien_id).update(modifie_le=Now())
+
+
+@receiver(post_save, sender=ContratLocation)
+def prerendre_pdf_contrat(sender, instance, raw=False, **kwargs):
+    if not raw:
+        planifier_prerendu(instance.pk)
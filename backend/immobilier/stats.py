@@ -0,0 +1,222 @@
+"""Dashboard counters kept in ``DashboardStats`` rows.
+
+Rows are keyed by scope: ``global``, ``proprietaire:<id>``, ``ville:<ville>`` and
+``proprietaire:<id>:ville:<ville>``. Signal handlers apply deltas on every
+write; ``reconcilier_stats`` recomputes everything from the source tables.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, F, Q
+
+from .models import BienImmobilier, ContratLocation, DashboardStats, Proprietaire
+
+
+CLE_GLOBALE = "global"
+CHAMPS_STATS = ("nb_proprietaires", "nb_biens", "nb_biens_disponibles", "nb_contrats", "nb_contrats_actifs")
+
+
+def cle_proprietaire(proprietaire_id):
+    return f"proprietaire:{proprietaire_id}"
+
+
+def cle_ville(ville):
+    return f"ville:{ville}"
+
+
+def cle_proprietaire_ville(proprietaire_id, ville):
+    return f"proprietaire:{proprietaire_id}:ville:{ville}"
+
+
+def _ville_de_cle(cle):
+    return cle.rsplit("ville:", 1)[1] if "ville:" in cle else ""
+
+
+def lire_stats(cle, using="default", modele=DashboardStats):
+    """Single primary-key read; an unsaved zero row if the scope has no data yet."""
+    return modele.objects.using(using).filter(cle=cle).first() or modele(cle=cle, ville=_ville_de_cle(cle))
+
+
+def filtre_prefixe(prefixe):
+    """``cle`` starts with ``prefixe`` (ending in ":"), as a range the primary key index can serve."""
+    return Q(cle__gte=prefixe, cle__lt=prefixe[:-1] + ";")
+
+
+def lire_stats_villes(prefixe="", using="default", modele=DashboardStats):
+    return modele.objects.using(using).filter(filtre_prefixe(f"{prefixe}ville:"))
+
+
+def contributions_bien(proprietaire_id, ville, disponible, nb=1):
+    valeurs = {"nb_biens": nb, "nb_biens_disponibles": nb if disponible else 0}
+    return {
+        CLE_GLOBALE: valeurs,
+        cle_proprietaire(proprietaire_id): valeurs,
+        cle_ville(ville): valeurs,
+        cle_proprietaire_ville(proprietaire_id, ville): valeurs,
+    }
+
+
+def contributions_contrat(proprietaire_id, actif, nb=1, nb_actifs=None):
+    if nb_actifs is None:
+        nb_actifs = nb if actif else 0
+    valeurs = {"nb_contrats": nb, "nb_contrats_actifs": nb_actifs}
+    contributions = {CLE_GLOBALE: valeurs}
+    if proprietaire_id is not None:
+        contributions[cle_proprietaire(proprietaire_id)] = valeurs
+    return contributions
+
+
+def contributions_proprietaire():
+    return {CLE_GLOBALE: {"nb_proprietaires": 1}}
+
+
+def difference(nouveau=(), ancien=()):
+    """``sum(nouveau) - sum(ancien)`` for two lists of contribution dicts."""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for liste, signe in ((nouveau, 1), (ancien, -1)):
+        for contributions in liste:
+            for cle, valeurs in contributions.items():
+                for champ, valeur in valeurs.items():
+                    deltas[cle][champ] += signe * valeur
+    return {
+        cle: {champ: v for champ, v in valeurs.items() if v}
+        for cle, valeurs in deltas.items()
+        if any(valeurs.values())
+    }
+
+
+_groupes = threading.local()
+
+
+@contextmanager
+def deltas_groupes(proprietaires=None):
+    """Sum the deltas applied inside the block and write them once on exit.
+
+    Cascade deletes fire one signal per row; grouped, they cost one UPDATE per
+    touched key instead of one per row and key. ``proprietaires`` maps the ids
+    of the biens being deleted to their owner's: the contracts the cascade
+    loads come without their bien, and their signal would look it up per row.
+    """
+    if getattr(_groupes, "en_cours", None) is not None:
+        yield
+        return
+    _groupes.en_cours = defaultdict(list)
+    _groupes.proprietaires = proprietaires or {}
+    try:
+        yield
+        en_attente = _groupes.en_cours
+    finally:
+        _groupes.en_cours = None
+        _groupes.proprietaires = {}
+    for using, liste in en_attente.items():
+        appliquer_deltas(difference(liste), using=using)
+
+
+def proprietaire_groupe(bien_id):
+    """The owner of ``bien_id`` as given to the current ``deltas_groupes`` block, or None."""
+    return getattr(_groupes, "proprietaires", {}).get(bien_id)
+
+
+def abandonner_deltas(prefixe):
+    """Drop grouped deltas for keys equal to or under ``prefixe`` (rows about to be deleted)."""
+    for liste in (getattr(_groupes, "en_cours", None) or {}).values():
+        for i, deltas in enumerate(liste):
+            liste[i] = {cle: v for cle, v in deltas.items() if cle != prefixe and not cle.startswith(f"{prefixe}:")}
+
+
+def appliquer_deltas(deltas, using="default"):
+    if not deltas:
+        return
+    if getattr(_groupes, "en_cours", None) is not None:
+        _groupes.en_cours[using].append(deltas)
+        return
+    # No savepoint: nothing here recovers from an error, and the writes that
+    # call this already run in a transaction (two queries less each).
+    with transaction.atomic(using=using, savepoint=False):
+        for cle, valeurs in deltas.items():
+            increments = {champ: F(champ) + valeur for champ, valeur in valeurs.items()}
+            lignes = DashboardStats.objects.using(using).filter(cle=cle)
+            if not lignes.update(**increments):
+                DashboardStats.objects.using(using).get_or_create(cle=cle, defaults={"ville": _ville_de_cle(cle)})
+                lignes.update(**increments)
+
+
+def appliquer_deltas_en_masse(deltas, using="default", taille=500):
+    """``appliquer_deltas`` for thousands of keys (bulk imports): a few queries per ``taille`` keys.
+
+    Rows are read under lock, incremented in Python and written back with
+    ``bulk_update``; missing ones are inserted. If a concurrent writer inserts
+    one of them first, the chunk falls back to ``appliquer_deltas``.
+    """
+    cles = list(deltas)
+    for i in range(0, len(cles), taille):
+        morceau = {cle: deltas[cle] for cle in cles[i:i + taille]}
+        try:
+            with transaction.atomic(using=using):
+                lignes = DashboardStats.objects.using(using).filter(cle__in=list(morceau))
+                if connections[using].features.has_select_for_update:
+                    lignes = lignes.select_for_update()
+                existantes = {row.cle: row for row in lignes}
+                nouvelles = [DashboardStats(cle=cle, ville=_ville_de_cle(cle)) for cle in morceau if cle not in existantes]
+                for row in (*existantes.values(), *nouvelles):
+                    for champ, valeur in morceau[row.cle].items():
+                        setattr(row, champ, getattr(row, champ) + valeur)
+                DashboardStats.objects.using(using).bulk_update(existantes.values(), CHAMPS_STATS)
+                DashboardStats.objects.using(using).bulk_create(nouvelles)
+        except IntegrityError:
+            appliquer_deltas(morceau, using=using)
+
+
+def calculer_stats(modeles=None, using="default"):
+    """Recompute every row from the source tables in a handful of grouped queries."""
+    proprietaire_model, bien_model, contrat_model = modeles or (Proprietaire, BienImmobilier, ContratLocation)
+    lignes = defaultdict(lambda: dict.fromkeys(CHAMPS_STATS, 0))
+    disponibles = Count("id", filter=Q(disponible=True))
+
+    lignes[CLE_GLOBALE]["nb_proprietaires"] = proprietaire_model.objects.using(using).count()
+
+    biens = bien_model.objects.using(using).order_by()
+    for row in biens.values("proprietaire_id", "ville").annotate(n=Count("id"), d=disponibles):
+        for cle in contributions_bien(row["proprietaire_id"], row["ville"], True):
+            lignes[cle]["nb_biens"] += row["n"]
+            lignes[cle]["nb_biens_disponibles"] += row["d"]
+
+    contrats = contrat_model.objects.using(using).order_by()
+    for row in contrats.values("bien__proprietaire_id").annotate(n=Count("id"), a=Count("id", filter=Q(actif=True))):
+        for cle in contributions_contrat(row["bien__proprietaire_id"], True):
+            lignes[cle]["nb_contrats"] += row["n"]
+            lignes[cle]["nb_contrats_actifs"] += row["a"]
+
+    return lignes
+
+
+def reconcilier_stats(modeles=None, stats_model=DashboardStats, using="default", dry_run=False):
+    """Rewrite drifted rows and drop stale ones. Returns the list of keys that differed."""
+    attendues = calculer_stats(modeles, using=using)
+    actuelles = {row.cle: row for row in stats_model.objects.using(using).all()}
+
+    derives = []
+    a_ecrire = []
+    for cle, valeurs in attendues.items():
+        row = actuelles.pop(cle, None)
+        if row is None or any(getattr(row, champ) != valeurs[champ] for champ in CHAMPS_STATS):
+            derives.append(cle)
+            a_ecrire.append(stats_model(cle=cle, ville=_ville_de_cle(cle), **valeurs))
+    # Leftover rows are stale; all-zero ones (emptied scopes) are harmless and not reported.
+    derives.extend(cle for cle, row in actuelles.items() if any(getattr(row, champ) for champ in CHAMPS_STATS))
+
+    if not dry_run:
+        with transaction.atomic(using=using):
+            obsoletes = list(actuelles)
+            for i in range(0, len(obsoletes), 500):
+                stats_model.objects.using(using).filter(cle__in=obsoletes[i:i + 500]).delete()
+            stats_model.objects.using(using).bulk_create(
+                a_ecrire,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=["cle"],
+                update_fields=["ville", *CHAMPS_STATS],
+            )
+    return derives
@@ -0,0 +1,204 @@
+"""Resumable, chunked uploads of bien photos.
+
+The browser opens an upload with the file's name, size and SHA-256, then sends
+it in chunks (``PUT`` with ``Content-Range: bytes debut-fin/taille``). Each
+chunk is copied from the request stream to ``<id>.part`` in blocks, at its
+offset, so neither a chunk nor the file is ever held in memory and the part
+file is the assembled upload. After a dropped connection the client asks for
+the bytes received (``GET``) and resumes from there. When the last byte
+arrives the file is checked against the declared size and digest and opened
+with Pillow; a file that fails is discarded.
+
+The upload's description lives next to it in ``<id>.json``. The bien form
+only posts the ids of finished uploads: ``attacher`` moves the files into the
+media storage (a rename on the same disk) and creates their BienImage rows
+with one bulk_create. ``purger_televersements`` removes abandoned uploads.
+"""
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.validators import validate_image_file_extension
+from django.db import transaction
+from django.db.models.functions import Now
+
+
+TAILLE_MAX = 20 * 1024 * 1024
+MORCEAU_MAX = 8 * 1024 * 1024
+BLOC = 64 * 1024
+
+
+class ErreurTeleversement(Exception):
+    """Rejected request; ``statut`` is the HTTP status to answer with."""
+
+    def __init__(self, message, statut=400, recu=None):
+        super().__init__(message)
+        self.statut = statut
+        self.recu = recu
+
+
+def dossier_televersements():
+    return Path(getattr(settings, "TELEVERSEMENTS_DIR", Path(settings.BASE_DIR) / "cache" / "televersements"))
+
+
+def taille_max():
+    return getattr(settings, "TELEVERSEMENTS_TAILLE_MAX", TAILLE_MAX)
+
+
+class Televersement:
+    def __init__(self, ident, utilisateur, nom, taille, empreinte, termine=False):
+        self.ident = ident
+        self.utilisateur = utilisateur
+        self.nom = nom
+        self.taille = taille
+        self.empreinte = empreinte
+        self.termine = termine
+
+    @property
+    def chemin(self):
+        return dossier_televersements() / f"{self.ident}.part"
+
+    @property
+    def chemin_meta(self):
+        return dossier_televersements() / f"{self.ident}.json"
+
+    @property
+    def recu(self):
+        try:
+            return self.chemin.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def enregistrer(self):
+        temporaire = self.chemin_meta.with_suffix(".tmp")
+        temporaire.write_text(json.dumps({
+            "utilisateur": self.utilisateur,
+            "nom": self.nom,
+            "taille": self.taille,
+            "empreinte": self.empreinte,
+            "termine": self.termine,
+        }))
+        os.replace(temporaire, self.chemin_meta)
+
+    def supprimer(self):
+        self.chemin.unlink(missing_ok=True)
+        self.chemin_meta.unlink(missing_ok=True)
+
+
+def creer(utilisateur, nom, taille, empreinte):
+    """Open an upload of ``taille`` bytes for ``utilisateur`` (a user id)."""
+    nom = os.path.basename(nom.replace("\\", "/"))
+    validate_image_file_extension(File(None, name=nom))
+    if not 0 < taille <= taille_max():
+        raise ValidationError(f"La taille doit être comprise entre 1 et {taille_max()} octets.")
+    televersement = Televersement(str(uuid.uuid4()), utilisateur, nom, taille, empreinte.lower())
+    dossier_televersements().mkdir(parents=True, exist_ok=True)
+    televersement.chemin.touch()
+    televersement.enregistrer()
+    return televersement
+
+
+def charger(utilisateur, ident):
+    """The upload ``ident`` of ``utilisateur``, or None if unknown or someone else's."""
+    try:
+        meta = json.loads((dossier_televersements() / f"{uuid.UUID(str(ident))}.json").read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+    if meta["utilisateur"] != utilisateur:
+        return None
+    return Televersement(str(uuid.UUID(str(ident))), **meta)
+
+
+def _verifier(televersement):
+    from PIL import Image, UnidentifiedImageError
+
+    empreinte = hashlib.sha256()
+    with open(televersement.chemin, "rb") as fichier:
+        for bloc in iter(lambda: fichier.read(BLOC), b""):
+            empreinte.update(bloc)
+    if empreinte.hexdigest() != televersement.empreinte:
+        raise ErreurTeleversement("Le fichier reçu ne correspond pas à son empreinte SHA-256.", 422)
+    try:
+        with Image.open(televersement.chemin) as image:
+            image.verify()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+        raise ErreurTeleversement("Le fichier reçu n'est pas une image valide.", 422)
+
+
+def ecrire(televersement, debut, fin, taille, flux):
+    """Append the chunk ``debut``-``fin`` (inclusive) read from ``flux``; returns the bytes received.
+
+    A chunk must start where the part file ends: otherwise ErreurTeleversement
+    409 carries the offset to resume from. The upload is verified once complete.
+    """
+    if televersement.termine:
+        raise ErreurTeleversement("Ce téléversement est déjà terminé.", 409, televersement.taille)
+    if taille != televersement.taille or not debut <= fin < taille or fin - debut + 1 > MORCEAU_MAX:
+        raise ErreurTeleversement("Content-Range invalide.", 416)
+    recu = televersement.recu
+    if debut != recu:
+        raise ErreurTeleversement("Le morceau ne commence pas à la fin des octets reçus.", 409, recu)
+
+    reste = fin - debut + 1
+    with open(televersement.chemin, "r+b") as fichier:
+        fichier.seek(debut)
+        while reste:
+            bloc = flux.read(min(BLOC, reste))
+            if not bloc:
+                # Connection dropped: keep what arrived, the client resumes from it.
+                break
+            fichier.write(bloc)
+            reste -= len(bloc)
+
+    recu = televersement.recu
+    if recu == televersement.taille:
+        try:
+            _verifier(televersement)
+        except ErreurTeleversement:
+            televersement.supprimer()
+            raise
+        televersement.termine = True
+        televersement.enregistrer()
+    return recu
+
+
+class _FichierTeleverse(File):
+    # FileSystemStorage moves files that expose a temporary path instead of copying them.
+    def temporary_file_path(self):
+        return self.name
+
+
+def attacher(bien, televersements):
+    """Create the BienImage rows of finished uploads with one bulk_create and return them."""
+    from .models import BienImage, BienImmobilier
+    from .thumbnails import planifier_renditions
+
+    if not televersements:
+        return []
+    images = []
+    try:
+        for televersement in televersements:
+            image = BienImage(bien=bien)
+            chemin = image.image.field.generate_filename(image, televersement.nom)
+            with _FichierTeleverse(open(televersement.chemin, "rb"), name=str(televersement.chemin)) as fichier:
+                image.image.name = default_storage.save(chemin, fichier)
+            images.append(image)
+        with transaction.atomic():
+            BienImage.objects.bulk_create(images)
+            # bulk_create sends no post_save: bump the bien and queue the renditions here.
+            BienImmobilier.objects.filter(pk=bien.pk).update(modifie_le=Now())
+            for image in images:
+                planifier_renditions(image.pk)
+    except BaseException:
+        for image in images:
+            default_storage.delete(image.image.name)
+        raise
+    for televersement in televersements:
+        televersement.supprimer()
+    return images
@@ -0,0 +1,16 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from immobilier.assets import BUNDLES, COMMUN, PREFIXE
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle_css(nom):
+    """``<link>`` to a CSS bundle of immobilier.assets (hashed name once collected)."""
+    if nom != COMMUN and nom not in BUNDLES:
+        raise template.TemplateSyntaxError(f"Bundle CSS inconnu : {nom}")
+    return format_html('<link rel="stylesheet" href="{}">', static(f"{PREFIXE}/{nom}.css"))
@@ -0,0 +1,52 @@
+from django import template
+from django.conf import settings
+from django.utils.html import format_html, format_html_join
+
+from immobilier.thumbnails import RENDITIONS
+
+
+register = template.Library()
+
+
+def _url(chemin):
+    return f"{settings.MEDIA_URL}{chemin}"
+
+
+def _srcset(renditions, extension):
+    return format_html_join(
+        ", ",
+        "{} {}w",
+        ((_url(renditions[nom][extension]), renditions[nom]["w"]) for nom in RENDITIONS if nom in renditions),
+    )
+
+
+@register.filter
+def rendition_url(bien_image, rendition="galerie"):
+    """URL of one JPEG rendition, or of the original while renditions are pending."""
+    entree = (bien_image.renditions or {}).get(rendition)
+    return _url(entree["jpg"]) if entree else bien_image.image.url
+
+
+@register.simple_tag
+def image_responsive(bien_image, rendition="carte", sizes="100vw", alt="", css_class=""):
+    """``<picture>`` with a WebP srcset and a JPEG fallback; ``rendition`` sets the default src."""
+    renditions = bien_image.renditions or {}
+    if rendition not in renditions:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', bien_image.image.url, alt, css_class)
+
+    entree = renditions[rendition]
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" loading="lazy">'
+        '</picture>',
+        _srcset(renditions, "webp"),
+        sizes,
+        _url(entree["jpg"]),
+        _srcset(renditions, "jpg"),
+        sizes,
+        entree["w"],
+        entree["h"],
+        alt,
+        css_class,
+    )
@@ -1,3 +1,931 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import date
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from .expiration import expirer_contrats
+from .models import BienImage, BienImmobilier, ContratLocation, Proprietaire
+from .stats import reconcilier_stats
+
+
+MEDIA_TEST = tempfile.mkdtemp(prefix="immobilier-media-")
+
+
+def _creer_bien(**kwargs):
+    proprietaire = kwargs.pop("proprietaire", None) or Proprietaire.objects.create(nom_complet="Owner")
+    valeurs = {
+        "titre": "Bien test",
+        "adresse": "Rue test",
+        "ville": "douala",
+        "superficie_m2": 40,
+        "loyer_mensuel": "50000.00",
+        "type_bien": "appartement",
+        "proprietaire": proprietaire,
+    }
+    valeurs.update(kwargs)
+    return BienImmobilier.objects.create(**valeurs)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, RENDITIONS_SYNCHRONES=True)
+class RenditionsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_TEST, ignore_errors=True)
+        super().tearDownClass()
+
+    def _upload(self, bien, largeur=2000, hauteur=1500):
+        contenu = io.BytesIO()
+        Image.new("RGB", (largeur, hauteur), "navy").save(contenu, "JPEG")
+        fichier = SimpleUploadedFile("photo.jpg", contenu.getvalue(), content_type="image/jpeg")
+        with self.captureOnCommitCallbacks(execute=True):
+            image = BienImage.objects.create(bien=bien, image=fichier)
+        image.refresh_from_db()
+        return image
+
+    def test_renditions_generated_after_upload(self):
+        image = self._upload(_creer_bien())
+        self.assertEqual(set(image.renditions), {"carte", "galerie", "complet"})
+        self.assertEqual(image.renditions["carte"]["w"], 320)
+        self.assertEqual(image.renditions["carte"]["h"], 240)
+        for entree in image.renditions.values():
+            self.assertTrue(os.path.exists(os.path.join(MEDIA_TEST, entree["webp"])))
+            self.assertTrue(os.path.exists(os.path.join(MEDIA_TEST, entree["jpg"])))
+
+        html = Template('{% load images_biens %}{% image_responsive img "carte" sizes="72px" %}').render(
+            Context({"img": image})
+        )
+        self.assertIn('type="image/webp"', html)
+        self.assertIn("320w", html)
+        self.assertIn("1600w", html)
+
+    def test_small_originals_are_not_upscaled(self):
+        image = self._upload(_creer_bien(), largeur=200, hauteur=100)
+        self.assertEqual(image.renditions["complet"]["w"], 200)
+
+    def test_pending_renditions_fall_back_to_original(self):
+        bien = _creer_bien()
+        image = BienImage(bien=bien, image="biens/absente.jpg")
+        html = Template('{% load images_biens %}{% image_responsive img %}').render(Context({"img": image}))
+        self.assertIn("/media/biens/absente.jpg", html)
+
+
+CACHE_PDF_TEST = Path(tempfile.mkdtemp(prefix="immobilier-pdf-"))
+
+
+@override_settings(CONTRATS_PDF_CACHE_DIR=CACHE_PDF_TEST, REQUETES_STRICT=True)
+class ContratPdfCacheTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(CACHE_PDF_TEST, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("agent", password="x"))
+        self.bien = _creer_bien()
+        self.contrat = ContratLocation.objects.create(
+            bien=self.bien,
+            locataire_nom="Locataire",
+            date_debut=date(2026, 1, 1),
+            date_fin=date(2026, 12, 31),
+            caution="100.00",
+        )
+        self.url = reverse("contrat_pdf", args=[self.contrat.pk])
+
+    def test_pdf_is_cached_and_revalidated(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(b"".join(resp.streaming_content).startswith(b"%PDF"))
+        etag = resp["ETag"]
+        self.assertEqual(len(list(CACHE_PDF_TEST.glob("*.pdf"))), 1)
+
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+    def test_related_change_invalidates(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.bien.titre = "Nouveau titre"
+        self.bien.save()
+
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+
+    def test_zip_export_follows_list_filters(self):
+        ContratLocation.objects.create(
+            bien=_creer_bien(),
+            locataire_nom="Ancien",
+            date_debut=date(2024, 1, 1),
+            date_fin=date(2024, 12, 31),
+            caution="100.00",
+            actif=False,
+        )
+        resp = self.client.get(reverse("contrats_export_pdf"), {"actif": "1", "du": "2025-06-01"})
+        self.assertEqual(resp["Content-Type"], "application/zip")
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(resp.streaming_content)))
+        self.assertEqual(archive.namelist(), [f"contrat_{self.contrat.pk}.pdf"])
+        self.assertTrue(archive.read(f"contrat_{self.contrat.pk}.pdf").startswith(b"%PDF"))
+
+        # Every export of the process renders in the same bounded pool.
+        from . import exports
+
+        pool = exports.pool_partage()
+        resp = self.client.get(reverse("contrats_export_pdf"))
+        self.assertEqual(len(zipfile.ZipFile(io.BytesIO(b"".join(resp.streaming_content))).namelist()), 2)
+        self.assertIs(exports.pool_partage(), pool)
+
+
+class ExpirationContratsTest(TestCase):
+    def test_expired_contract_frees_its_bien(self):
+        bien = _creer_bien(disponible=False)
+        ContratLocation.objects.create(
+            bien=bien,
+            locataire_nom="Locataire",
+            date_debut=date(2025, 1, 1),
+            date_fin=date(2025, 12, 31),
+            caution="100.00",
+        )
+        self.assertEqual(expirer_contrats(date(2026, 1, 1)), (1, 1))
+        bien.refresh_from_db()
+        self.assertTrue(bien.disponible)
+        self.assertFalse(bien.contrats.filter(actif=True).exists())
+        self.assertEqual(reconcilier_stats(dry_run=True), [])
+
+
+# Whole-table reads: "SCAN t" on SQLite, "Seq Scan on t" on Postgres (planned
+# with enable_seqscan off, so it only remains when no index fits).
+SCAN_COMPLET = {
+    "sqlite": re.compile(r"^SCAN (immobilier_\w+)$"),
+    "postgresql": re.compile(r"Seq Scan on (immobilier_\w+)"),
+}
+# Reads that are full by design: choice lists of every row, and the infix
+# "icontains" search of biens_liste that no B-tree index can serve.
+LECTURES_COMPLETES = (
+    re.compile(r'FROM "immobilier_proprietaire"( ORDER BY [^)]*)?$'),
+    re.compile(r'WHERE \("immobilier_bienimmobilier"."disponible" OR "immobilier_bienimmobilier"."id" = \d+\) ORDER BY'),
+    re.compile(r"LIKE '%"),
+)
+
+
+def _plan(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            with transaction.atomic():
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("EXPLAIN " + sql)
+                return [row[0] for row in cursor.fetchall()]
+        cursor.execute("EXPLAIN QUERY PLAN " + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def balayages_complets(queries):
+    motif = SCAN_COMPLET[connection.vendor]
+    trouves = []
+    for query in queries:
+        sql = query["sql"]
+        if not sql.startswith("SELECT") or any(m.search(sql) for m in LECTURES_COMPLETES):
+            continue
+        trouves.extend((m.group(1), sql) for m in map(motif.search, map(str.strip, _plan(sql))) if m)
+    return trouves
+
+
+@override_settings(REQUETES_STRICT=True)
+class ExplainPlansTest(TestCase):
+    def test_list_dashboard_and_form_queries_use_indexes(self):
+        self.client.force_login(User.objects.create_user("agent", password="x"))
+        bien = _creer_bien()
+        contrat = ContratLocation.objects.create(
+            bien=bien,
+            locataire_nom="Locataire",
+            date_debut=date(2026, 1, 1),
+            date_fin=date(2026, 12, 31),
+            caution="100.00",
+        )
+        urls = [
+            reverse("dashboard"),
+            reverse("biens_liste"),
+            reverse("biens_detail", args=[bien.pk]),
+            reverse("biens_ajouter"),
+            reverse("biens_modifier", args=[bien.pk]),
+            reverse("proprietaires_liste"),
+            reverse("proprietaires_ajouter"),
+            reverse("proprietaires_modifier", args=[bien.proprietaire_id]),
+            reverse("contrats_liste"),
+            reverse("contrats_liste") + "?actif=1&du=2026-01-01",
+            reverse("contrats_ajouter") + f"?proprietaire={bien.proprietaire_id}",
+            reverse("contrats_modifier", args=[contrat.pk]),
+        ]
+        for url in urls:
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200, url)
+            self.assertEqual(balayages_complets(ctx.captured_queries), [], url)
+
+
+
+@override_settings(REQUETES_STRICT=True)
+class BudgetRequetesTest(TestCase):
+    """Every view declares a query budget; the middleware enforces it in tests."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("agent", password="x"))
+        # Several rows everywhere, so per-row queries show up as repetitions.
+        for p in range(3):
+            proprietaire = Proprietaire.objects.create(nom_complet=f"Proprio {p}")
+            for b in range(3):
+                bien = _creer_bien(proprietaire=proprietaire, titre=f"Bien {p}-{b}")
+                for i in range(3):
+                    BienImage.objects.create(bien=bien, image=f"biens/{p}-{b}-{i}.jpg")
+                for annee in (2024, 2025):
+                    ContratLocation.objects.create(
+                        bien=bien,
+                        locataire_nom=f"Locataire {annee}",
+                        date_debut=date(annee, 1, 1),
+                        date_fin=date(annee, 12, 31),
+                        caution="100.00",
+                        actif=False,
+                    )
+        self.bien = BienImmobilier.objects.order_by("pk").first()
+        self.contrat = self.bien.contrats.order_by("pk").first()
+
+    def test_every_view_declares_a_budget(self):
+        from . import api, views
+
+        for nom in dir(views):
+            vue = getattr(views, nom)
+            if callable(vue) and getattr(vue, "__module__", None) == views.__name__ and not nom.startswith("_"):
+                self.assertIsInstance(getattr(vue, "budget_requetes", None), int, nom)
+        for vue in (api.biens_liste, api.biens_detail, api.proprietaires_resume):
+            self.assertIsInstance(getattr(vue, "budget_requetes", None), int, vue.__name__)
+
+    def test_pages_stay_within_budget(self):
+        ids = {"biens": self.bien.pk, "proprietaires": self.bien.proprietaire_id, "contrats": self.contrat.pk}
+        urls = [
+            reverse("dashboard"),
+            reverse("biens_liste"),
+            reverse("biens_ajouter"),
+            reverse("biens_detail", args=[ids["biens"]]),
+            reverse("biens_modifier", args=[ids["biens"]]),
+            reverse("biens_supprimer", args=[ids["biens"]]),
+            reverse("proprietaires_liste"),
+            reverse("proprietaires_ajouter"),
+            reverse("proprietaires_modifier", args=[ids["proprietaires"]]),
+            reverse("proprietaires_supprimer", args=[ids["proprietaires"]]),
+            reverse("contrats_liste"),
+            reverse("contrats_liste") + "?actif=0&du=2024-01-01",
+            reverse("contrats_ajouter"),
+            reverse("contrats_modifier", args=[ids["contrats"]]),
+            reverse("contrats_supprimer", args=[ids["contrats"]]),
+        ]
+        for url in urls:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200, url)
+            self.assertIn("vue;dur=", resp["Server-Timing"], url)
+
+    def test_writes_stay_within_budget(self):
+        proprietaire = self.bien.proprietaire_id
+        champs_bien = {
+            "titre": "Studio",
+            "adresse": "Rue 1",
+            "ville": "douala",
+            "superficie_m2": 20,
+            "loyer_mensuel": "40000",
+            "type_bien": "appartement",
+            "proprietaire": proprietaire,
+            "disponible": "on",
+        }
+        resp = self.client.post(reverse("biens_ajouter"), champs_bien)
+        self.assertEqual(resp.status_code, 302)
+        resp = self.client.post(reverse("biens_modifier", args=[self.bien.pk]), {**champs_bien, "titre": "Duplex"})
+        self.assertEqual(resp.status_code, 302)
+        resp = self.client.post(reverse("contrats_ajouter"), {
+            "proprietaire": proprietaire,
+            "bien": BienImmobilier.objects.get(titre="Studio").pk,
+            "locataire_nom": "Nouveau",
+            "date_debut": "2026-01-01",
+            "date_fin": "2026-12-31",
+            "caution": "80000",
+            "actif": "on",
+        })
+        self.assertEqual(resp.status_code, 302)
+        resp = self.client.post(reverse("contrats_modifier", args=[self.contrat.pk]), {
+            "proprietaire": proprietaire,
+            "bien": self.bien.pk,
+            "locataire_nom": "Renommé",
+            "date_debut": "2024-01-01",
+            "date_fin": "2024-12-31",
+            "caution": "100.00",
+        })
+        self.assertEqual(resp.status_code, 302)
+        resp = self.client.post(reverse("proprietaires_ajouter"), {"nom_complet": "Nouveau proprio"})
+        self.assertEqual(resp.status_code, 302)
+        resp = self.client.post(reverse("proprietaires_modifier", args=[proprietaire]), {"nom_complet": "Proprio"})
+        self.assertEqual(resp.status_code, 302)
+        resp = self.client.post(reverse("contrats_supprimer", args=[self.contrat.pk]))
+        self.assertEqual(resp.status_code, 302)
+        resp = self.client.post(reverse("biens_supprimer", args=[self.bien.pk]))
+        self.assertEqual(resp.status_code, 302)
+        resp = self.client.post(reverse("proprietaires_supprimer", args=[proprietaire]))
+        self.assertEqual(resp.status_code, 302)
+        # Grouped cascade deltas leave the counters exact.
+        self.assertEqual(reconcilier_stats(dry_run=True), [])
+
+    def test_owner_delete_looks_up_no_bien_per_contract(self):
+        proprietaire = self.bien.proprietaire_id
+        with CaptureQueriesContext(connection) as requetes:
+            resp = self.client.post(reverse("proprietaires_supprimer", args=[proprietaire]))
+        self.assertEqual(resp.status_code, 302)
+        self.assertFalse(ContratLocation.objects.filter(bien__proprietaire_id=proprietaire).exists())
+        recherches = [q["sql"] for q in requetes if '"immobilier_bienimmobilier"."proprietaire_id" FROM' in q["sql"]]
+        self.assertEqual(recherches, [])
+        self.assertEqual(reconcilier_stats(dry_run=True), [])
+
+    def test_repeated_query_is_reported(self):
+        from django.urls import resolve
+
+        from .instrumentation import BudgetRequetesDepasse, RequetesMiddleware
+
+        def vue(request):
+            # One query per image: the N+1 the detector exists for.
+            [str(image) for image in BienImage.objects.all()]
+            return HttpResponse()
+
+        request = RequestFactory().get(reverse("dashboard"))
+        request.resolver_match = resolve(reverse("dashboard"))
+        middleware = RequetesMiddleware(vue)
+        with self.settings(REQUETES_STRICT=True), self.assertRaisesMessage(BudgetRequetesDepasse, "N+1 probable"):
+            middleware(request)
+
+        with self.settings(REQUETES_STRICT=False), self.assertLogs("immobilier.requetes", "WARNING"):
+            middleware(request)
+
+    def test_queries_are_attributed_to_the_template_that_ran_them(self):
+        from django.shortcuts import render
+        from django.urls import resolve
+
+        from .instrumentation import RequetesMiddleware
+
+        def vue(request):
+            # The owner is not joined: the template loads it.
+            bien = BienImmobilier.objects.get(pk=self.bien.pk)
+            return render(request, "immobilier/biens_detail.html", {"bien": bien, "images": []})
+
+        request = RequestFactory().get(reverse("biens_detail", args=[self.bien.pk]))
+        request.user = User.objects.get(username="agent")
+        request.resolver_match = resolve(reverse("biens_detail", args=[self.bien.pk]))
+        resp = RequetesMiddleware(vue)(request)
+        self.assertIn('db;dur=', resp["Server-Timing"])
+        self.assertRegex(resp["Server-Timing"], r'tpl;dur=[\d.]+;desc="immobilier/biens_detail.html : 1 requetes, ')
+
+
+@override_settings(REQUETES_STRICT=True)
+class ContratActifUniqueTest(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("agent", password="x"))
+        self.bien = _creer_bien()
+
+    def _poster(self, url, **valeurs):
+        donnees = {
+            "proprietaire": self.bien.proprietaire_id,
+            "bien": self.bien.pk,
+            "locataire_nom": "Locataire",
+            "date_debut": "2026-01-01",
+            "date_fin": "2026-12-31",
+            "caution": "1000",
+            "actif": "on",
+        }
+        donnees.update(valeurs)
+        return self.client.post(url, {k: v for k, v in donnees.items() if v is not None})
+
+    def test_contract_for_an_owner_with_an_email(self):
+        Proprietaire.objects.filter(pk=self.bien.proprietaire_id).update(email="owner@example.com")
+        resp = self._poster(reverse("contrats_ajouter"))
+        self.assertEqual(resp.status_code, 302)
+        contrat = self.bien.contrats.get()
+        resp = self._poster(reverse("contrats_modifier", args=[contrat.pk]), locataire_nom="Renommé")
+        self.assertEqual(resp.status_code, 302)
+        # This backend sends no notification email.
+        self.assertEqual(mail.outbox, [])
+
+    def test_database_rejects_a_second_active_contract(self):
+        ContratLocation.objects.create(
+            bien=self.bien, locataire_nom="A", date_debut=date(2026, 1, 1), date_fin=date(2026, 12, 31), caution=1
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ContratLocation.objects.create(
+                bien=self.bien, locataire_nom="B", date_debut=date(2026, 1, 1), date_fin=date(2026, 12, 31), caution=1
+            )
+        ContratLocation.objects.create(
+            bien=self.bien, locataire_nom="C", date_debut=date(2025, 1, 1), date_fin=date(2025, 12, 31), caution=1,
+            actif=False,
+        )
+
+    def test_write_path_relies_on_the_constraint(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self._poster(reverse("contrats_ajouter"))
+        self.assertEqual(resp.status_code, 302)
+        self.bien.refresh_from_db()
+        self.assertFalse(self.bien.disponible)
+        lectures = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT") and "contratlocation" in q["sql"]]
+        self.assertEqual(lectures, [])
+
+        # A concurrent submission that passed validation before the first commit.
+        BienImmobilier.objects.filter(pk=self.bien.pk).update(disponible=True)
+        resp = self._poster(reverse("contrats_ajouter"), locataire_nom="Concurrent")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["form"].errors["actif"], ["Ce bien a déjà un contrat actif."])
+        self.assertEqual(ContratLocation.objects.count(), 1)
+
+    def test_availability_follows_the_active_contract(self):
+        self._poster(reverse("contrats_ajouter"))
+        contrat = ContratLocation.objects.get()
+        autre = _creer_bien(proprietaire=self.bien.proprietaire, titre="Autre")
+
+        self._poster(reverse("contrats_modifier", args=[contrat.pk]), bien=autre.pk)
+        self.bien.refresh_from_db()
+        autre.refresh_from_db()
+        self.assertEqual((self.bien.disponible, autre.disponible), (True, False))
+
+        self._poster(reverse("contrats_modifier", args=[contrat.pk]), bien=autre.pk, actif=None)
+        autre.refresh_from_db()
+        self.assertTrue(autre.disponible)
+
+        self._poster(reverse("contrats_modifier", args=[contrat.pk]), bien=autre.pk)
+        self.client.post(reverse("contrats_supprimer", args=[contrat.pk]))
+        autre.refresh_from_db()
+        self.assertTrue(autre.disponible)
+        self.assertEqual(reconcilier_stats(dry_run=True), [])
+
+
+@override_settings(REQUETES_STRICT=True)
+class ImportDonneesTest(TestCase):
+    def _fichier(self, contenu):
+        return io.BytesIO(contenu.encode("utf-8"))
+
+    def test_csv_and_jsonl_import_in_batches_without_notifications(self):
+        from .imports import importer
+
+        rapport = importer("proprietaires", self._fichier(
+            "id,nom_complet,email,telephone\n"
+            "501,Awa Ngono,awa@example.com,699000001\n"
+            "502,Paul Biya,pas-un-email,699000002\n"
+            "503,Jean Fotso,,\n"
+        ), format="csv", batch_size=2)
+        self.assertEqual((rapport.lignes, rapport.importees, rapport.nb_erreurs), (3, 2, 1))
+        self.assertEqual(rapport.erreurs[0][0], 3)
+        self.assertIn("email", rapport.erreurs[0][1])
+
+        biens = "\n".join([
+            '{"id": 801, "titre": "Studio", "adresse": "Rue 1", "ville": "douala", "superficie_m2": 20, '
+            '"loyer_mensuel": "40000", "type_bien": "appartement", "proprietaire": 501}',
+            '{"id": 802, "titre": "Villa", "adresse": "Rue 2", "ville": "kribi", "superficie_m2": 200, '
+            '"loyer_mensuel": "300000", "type_bien": "maison", "proprietaire": 503, "disponible": false}',
+            '{"titre": "Orphelin", "adresse": "Rue 3", "ville": "douala", "superficie_m2": 20, '
+            '"loyer_mensuel": "1", "type_bien": "maison", "proprietaire": 999}',
+            "pas du json",
+        ])
+        rapport = importer("biens", self._fichier(biens), format="jsonl", batch_size=2)
+        self.assertEqual((rapport.importees, rapport.nb_erreurs), (2, 2))
+        self.assertEqual(sorted(ligne for ligne, _ in rapport.erreurs), [3, 4])
+        self.assertTrue(BienImmobilier.objects.get(pk=801).disponible)
+        self.assertFalse(BienImmobilier.objects.get(pk=802).disponible)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rapport = importer("contrats", self._fichier(
+                "bien,locataire_nom,date_debut,date_fin,caution,actif\n"
+                "801,Ancien,2024-01-01,2024-12-31,80000,non\n"
+                "801,Actuel,2025-01-01,2026-12-31,80000,oui\n"
+                "801,Doublon,2025-06-01,2026-06-01,80000,\n"
+                "802,Dates,2026-01-01,2025-01-01,1,0\n"
+            ), format="csv", batch_size=10)
+        self.assertEqual((rapport.importees, rapport.nb_erreurs), (2, 2))
+        self.assertIn("Ce bien a déjà un contrat actif.", rapport.erreurs[0][1])
+        self.assertIn("date_fin", rapport.erreurs[1][1])
+        self.assertFalse(BienImmobilier.objects.get(pk=801).disponible)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(reconcilier_stats(dry_run=True), [])
+
+    def test_references_are_not_checked_once_per_row(self):
+        from .imports import importer
+
+        proprietaire = Proprietaire.objects.create(nom_complet="Awa")
+        lignes = ["titre,adresse,ville,superficie_m2,loyer_mensuel,type_bien,proprietaire"]
+        lignes += [f"Bien {i},Rue {i},douala,20,40000,appartement,{proprietaire.pk}" for i in range(20)]
+        with CaptureQueriesContext(connection) as requetes:
+            rapport = importer("biens", self._fichier("\n".join(lignes)), format="csv", batch_size=50)
+        self.assertEqual((rapport.importees, rapport.nb_erreurs), (20, 0))
+        existences = [q["sql"] for q in requetes if q["sql"].startswith('SELECT 1 AS "a" FROM "immobilier_proprietaire"')]
+        self.assertEqual(existences, [])
+
+    def test_image_archive(self):
+        from .imports import importer
+
+        bien = _creer_bien()
+        contenu = io.BytesIO()
+        Image.new("RGB", (40, 30), "red").save(contenu, "JPEG")
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr(f"{bien.pk}/salon.jpg", contenu.getvalue())
+            zf.writestr(f"{bien.pk}/notes.jpg", b"pas une image")
+            zf.writestr("999999/cuisine.jpg", contenu.getvalue())
+        archive.seek(0)
+        with override_settings(MEDIA_ROOT=MEDIA_TEST):
+            rapport = importer("images", archive)
+        self.assertEqual((rapport.lignes, rapport.importees, rapport.nb_erreurs), (3, 1, 2))
+        image = bien.images.get()
+        self.assertTrue(os.path.exists(os.path.join(MEDIA_TEST, image.image.name)))
+
+    def test_admin_upload(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "x"))
+        url = reverse("admin:immobilier_proprietaire_importer")
+        self.assertContains(self.client.get(reverse("admin:immobilier_proprietaire_changelist")), url)
+        fichier = SimpleUploadedFile("proprios.csv", b"nom_complet,email\nAwa,awa@example.com\n,x\n")
+        resp = self.client.post(url, {"fichier": fichier}, follow=True)
+        self.assertContains(resp, "1/2 ligne(s) importée(s).")
+        self.assertContains(resp, "Ligne 3")
+        self.assertTrue(Proprietaire.objects.filter(nom_complet="Awa").exists())
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8") as f:
+            f.write("nom_complet\nAwa\nJean\n")
+        self.addCleanup(os.remove, f.name)
+        sortie = io.StringIO()
+        call_command("importer_donnees", "proprietaires", f.name, stdout=sortie)
+        self.assertIn("2/2 ligne(s) importée(s)", sortie.getvalue())
+        self.assertEqual(Proprietaire.objects.count(), 2)
+
+
+TELEVERSEMENTS_TEST = Path(tempfile.mkdtemp(prefix="immobilier-televersements-"))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, RENDITIONS_SYNCHRONES=True, TELEVERSEMENTS_DIR=TELEVERSEMENTS_TEST, REQUETES_STRICT=True)
+class TeleversementTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TELEVERSEMENTS_TEST, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("agent", password="x"))
+        contenu = io.BytesIO()
+        Image.new("RGB", (300, 200), "olive").save(contenu, "PNG")
+        self.photo = contenu.getvalue()
+
+    def _ouvrir(self, contenu, nom="salon.png", empreinte=None):
+        resp = self.client.post(reverse("televersements_creer"), {
+            "nom": nom,
+            "taille": len(contenu),
+            "empreinte": empreinte or hashlib.sha256(contenu).hexdigest(),
+        })
+        self.assertEqual(resp.status_code, 201)
+        return reverse("televersement_morceau", args=[resp.json()["id"]])
+
+    def _envoyer(self, url, contenu, debut, fin):
+        return self.client.put(
+            url,
+            contenu[debut:fin + 1],
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {debut}-{fin}/{len(contenu)}",
+        )
+
+    def _televerser(self, contenu):
+        url = self._ouvrir(contenu)
+        resp = self._envoyer(url, contenu, 0, len(contenu) - 1)
+        self.assertTrue(resp.json()["termine"])
+        return resp.json()["id"]
+
+    def test_chunks_resume_from_the_received_offset(self):
+        url = self._ouvrir(self.photo)
+        milieu = len(self.photo) // 2
+        resp = self._envoyer(url, self.photo, 0, milieu - 1)
+        self.assertEqual(resp.json(), {"id": url.split("/")[-2], "recu": milieu, "termine": False})
+        # A retried chunk the server already has is refused with the offset to resume from.
+        resp = self._envoyer(url, self.photo, 0, milieu - 1)
+        self.assertEqual((resp.status_code, resp.json()["recu"]), (409, milieu))
+        self.assertEqual(self.client.get(url).json()["recu"], milieu)
+        self.assertEqual(self._envoyer(url, self.photo, milieu, len(self.photo) + 5).status_code, 416)
+
+        resp = self._envoyer(url, self.photo, milieu, len(self.photo) - 1)
+        self.assertEqual(resp.json()["recu"], len(self.photo))
+        self.assertTrue(resp.json()["termine"])
+        self.assertEqual((TELEVERSEMENTS_TEST / f"{resp.json()['id']}.part").read_bytes(), self.photo)
+
+    def test_corrupt_or_foreign_uploads_are_rejected(self):
+        url = self._ouvrir(self.photo, empreinte="0" * 64)
+        resp = self._envoyer(url, self.photo, 0, len(self.photo) - 1)
+        self.assertEqual(resp.status_code, 422)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        texte = b"pas une image"
+        resp = self._envoyer(self._ouvrir(texte), texte, 0, len(texte) - 1)
+        self.assertEqual(resp.status_code, 422)
+        self.assertEqual(self.client.post(reverse("televersements_creer"), {
+            "nom": "script.sh", "taille": 10, "empreinte": "0" * 64,
+        }).status_code, 400)
+
+        url = self._ouvrir(self.photo)
+        self.client.force_login(User.objects.create_user("voisin", password="x"))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self._envoyer(url, self.photo, 0, 9).status_code, 404)
+
+    def test_form_attaches_finished_uploads_in_one_insert(self):
+        bien = _creer_bien()
+        ids = [self._televerser(self.photo), self._televerser(self.photo)]
+        champs = {
+            "titre": bien.titre,
+            "adresse": bien.adresse,
+            "ville": bien.ville,
+            "superficie_m2": bien.superficie_m2,
+            "loyer_mensuel": bien.loyer_mensuel,
+            "type_bien": bien.type_bien,
+            "proprietaire": bien.proprietaire_id,
+            "disponible": "on",
+        }
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(reverse("biens_modifier", args=[bien.pk]), {**champs, "televersements": ids})
+        self.assertEqual(resp.status_code, 302)
+        inserts = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "immobilier_bienimage"')]
+        self.assertEqual(len(inserts), 1)
+
+        images = list(bien.images.order_by("pk"))
+        self.assertEqual(len(images), 2)
+        for image in images:
+            image.refresh_from_db()
+            self.assertTrue(os.path.exists(os.path.join(MEDIA_TEST, image.image.name)))
+            self.assertEqual(set(image.renditions), {"carte", "galerie", "complet"})
+        self.assertEqual(list(TELEVERSEMENTS_TEST.glob(f"{ids[0]}.*")), [])
+
+        # Unfinished or already attached uploads fail the form.
+        url = self._ouvrir(self.photo)
+        for ident in (ids[0], url.split("/")[-2]):
+            resp = self.client.post(reverse("biens_modifier", args=[bien.pk]), {**champs, "televersements": [ident]})
+            self.assertEqual(resp.status_code, 200)
+            self.assertContains(resp, "fini d&#x27;être téléversée")
+        self.assertEqual(bien.images.count(), 2)
+
+        champs["titre"] = "Copie"
+        resp = self.client.post(reverse("biens_ajouter"), {**champs, "televersements": [self._televerser(self.photo)]})
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(BienImage.objects.filter(bien__titre="Copie").count(), 1)
+
+        # A bien whose photos cannot be attached is not created either.
+        ident = self._televerser(self.photo)
+        (TELEVERSEMENTS_TEST / f"{ident}.part").unlink()
+        champs["titre"] = "Sans photo"
+        with self.assertRaises(FileNotFoundError):
+            self.client.post(reverse("biens_ajouter"), {**champs, "televersements": [ident]})
+        self.assertFalse(BienImmobilier.objects.filter(titre="Sans photo").exists())
+
+    def test_purge_removes_abandoned_uploads(self):
+        ancien = self._ouvrir(self.photo).split("/")[-2]
+        recent = self._ouvrir(self.photo).split("/")[-2]
+        il_y_a_deux_jours = time.time() - 2 * 86400
+        os.utime(TELEVERSEMENTS_TEST / f"{ancien}.part", (il_y_a_deux_jours, il_y_a_deux_jours))
+        sortie = io.StringIO()
+        call_command("purger_televersements", "--heures", "24", stdout=sortie)
+        self.assertIn("1 téléversement(s) supprimé(s)", sortie.getvalue())
+        self.assertEqual(list(TELEVERSEMENTS_TEST.glob(f"{ancien}.*")), [])
+        self.assertTrue((TELEVERSEMENTS_TEST / f"{recent}.json").exists())
+
+
+@override_settings(REQUETES_STRICT=True)
+class ExportTabulaireTest(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("agent", password="x"))
+        proprietaire = Proprietaire.objects.create(nom_complet="Awa Ngono")
+        for i in range(30):
+            bien = _creer_bien(proprietaire=proprietaire, titre=f"Studio {i}", ville="yaounde")
+            ContratLocation.objects.create(
+                bien=bien,
+                locataire_nom=f"Locataire {i}",
+                date_debut=date(2026, 1, 1),
+                date_fin=date(2026, 12, 31),
+                caution="100.00",
+            )
+        _creer_bien(proprietaire=proprietaire, titre="Villa", type_bien="maison")
+
+    def _contenu(self, resp):
+        self.assertTrue(resp.streaming)
+        with CaptureQueriesContext(connection) as ctx:
+            contenu = b"".join(resp.streaming_content)
+        # One query for all the rows, whatever their number: no per-row lookups.
+        self.assertEqual(len(ctx.captured_queries), 1)
+        return contenu
+
+    def test_csv_respects_filters_and_resolves_labels(self):
+        resp = self.client.get(reverse("biens_export", args=["csv"]) + "?q=studio")
+        self.assertEqual(resp["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn("attachment;", resp["Content-Disposition"])
+        lignes = self._contenu(resp).decode("utf-8-sig").splitlines()
+        self.assertEqual(len(lignes), 31)
+        self.assertTrue(lignes[0].startswith("ID;Titre;Adresse;Ville"))
+        self.assertIn(";Yaoundé;40;50000.00;Appartement;Oui;Awa Ngono;", lignes[1])
+
+        lignes = self._contenu(self.client.get(reverse("proprietaires_export", args=["csv"]))).decode("utf-8-sig")
+        self.assertIn("1;Awa Ngono;;;31;31\r\n", lignes)
+
+    def test_xlsx_is_a_valid_workbook(self):
+        from xml.etree import ElementTree
+
+        resp = self.client.get(reverse("contrats_export", args=["xlsx"]) + "?actif=1")
+        with zipfile.ZipFile(io.BytesIO(self._contenu(resp))) as archive:
+            self.assertIsNone(archive.testzip())
+            feuille = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+            ElementTree.fromstring(archive.read("xl/workbook.xml"))
+        ns = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+        lignes = feuille.findall("x:sheetData/x:row", ns)
+        self.assertEqual(len(lignes), 31)
+        textes = [t.text for t in lignes[1].iter("{%s}t" % ns["x"])]
+        self.assertIn("Yaoundé", textes)
+        self.assertIn("Oui", textes)
+        # date_debut is a real date cell: a serial number with the date style
+        dates = [c.find("x:v", ns).text for c in lignes[1].findall("x:c", ns) if c.get("s") == "1"]
+        self.assertEqual(dates[0], str((date(2026, 1, 1) - date(1899, 12, 30)).days))
+
+    def test_user_text_cannot_become_a_formula_or_break_the_workbook(self):
+        from xml.etree import ElementTree
+
+        bien = BienImmobilier.objects.get(titre="Villa")
+        BienImmobilier.objects.filter(pk=bien.pk).update(titre='=HYPERLINK("http://x";"Villa")', adresse="Rue\x01 2")
+        lignes = self._contenu(self.client.get(reverse("biens_export", args=["csv"]))).decode("utf-8-sig")
+        self.assertIn(f'{bien.pk};"\'=HYPERLINK(""http://x"";""Villa"")";Rue\x01 2;', lignes)
+
+        resp = self.client.get(reverse("biens_export", args=["xlsx"]))
+        with zipfile.ZipFile(io.BytesIO(self._contenu(resp))) as archive:
+            feuille = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        textes = [t.text for t in feuille.iter("{http://schemas.openxmlformats.org/spreadsheetml/2006/main}t")]
+        self.assertIn("Rue 2", textes)
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get(reverse("biens_export", args=["pdf"])).status_code, 404)
+
+
+@override_settings(REQUETES_STRICT=True)
+class ApiBiensTest(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("agent", password="x"))
+        self.proprietaire = Proprietaire.objects.create(nom_complet="Awa Ngono")
+        self.biens = [
+            _creer_bien(proprietaire=self.proprietaire, titre=f"Bien {i}", loyer_mensuel=f"{i}0000.00",
+                        ville="yaounde" if i % 2 else "douala")
+            for i in range(1, 6)
+        ]
+        BienImage.objects.create(bien=self.biens[0], image="biens/photo.jpg")
+
+    def test_sparse_fieldsets_project_the_columns(self):
+        with CaptureQueriesContext(connection) as requetes:
+            resp = self.client.get(reverse("api_biens_liste"), {"fields": "titre,loyer_mensuel"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["results"][0], {"titre": "Bien 5", "loyer_mensuel": "50000.00"})
+        sql = [q["sql"] for q in requetes.captured_queries if "immobilier_bienimmobilier" in q["sql"]]
+        self.assertEqual(len(sql), 2)
+        self.assertNotIn("adresse", sql[1])
+        self.assertNotIn("immobilier_proprietaire", sql[1])
+
+        resp = self.client.get(reverse("api_biens_detail", args=[self.biens[0].pk]), {"fields": "proprietaire,images"})
+        self.assertEqual(resp.json(), {
+            "proprietaire": {"id": self.proprietaire.pk, "nom_complet": "Awa Ngono"},
+            "images": [{"id": self.biens[0].images.get().pk, "url": "/media/biens/photo.jpg", "renditions": {}}],
+        })
+
+        resp = self.client.get(reverse("api_biens_liste"), {"fields": "titre,mot_de_passe"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("fields", resp.json()["erreurs"])
+
+    def test_filters_and_cursor(self):
+        url = reverse("api_biens_liste")
+        resp = self.client.get(url, {"ville": "yaounde", "loyer_min": "20000", "fields": "titre"})
+        self.assertEqual([b["titre"] for b in resp.json()["results"]], ["Bien 5", "Bien 3"])
+
+        resp = self.client.get(url, {"loyer_max": "beaucoup"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("loyer_max", resp.json()["erreurs"])
+
+        titres = []
+        resp = self.client.get(url, {"fields": "titre", "limit": 2})
+        while True:
+            titres += [b["titre"] for b in resp.json()["results"]]
+            if not resp.json()["next"]:
+                break
+            resp = self.client.get(resp.json()["next"])
+        self.assertEqual(titres, ["Bien 5", "Bien 4", "Bien 3", "Bien 2", "Bien 1"])
+
+    def test_conditional_requests(self):
+        url = reverse("api_biens_liste")
+        resp = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        etag = resp["ETag"]
+        self.assertTrue(etag.startswith("W/"))
+        with CaptureQueriesContext(connection) as requetes:
+            resp = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(len([q for q in requetes.captured_queries if "immobilier_" in q["sql"]]), 1)
+
+        # The owner's name is part of the payload.
+        self.proprietaire.nom_complet = "Awa N."
+        self.proprietaire.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        bien = self.biens[0]
+        resp = self.client.get(reverse("api_biens_detail", args=[bien.pk]))
+        derniere_modif = resp["Last-Modified"]
+        resp = self.client.get(reverse("api_biens_detail", args=[bien.pk]), HTTP_IF_MODIFIED_SINCE=derniere_modif)
+        self.assertEqual(resp.status_code, 304)
+        etag = resp["ETag"]
+
+        bien.images.get().delete()
+        resp = self.client.get(reverse("api_biens_detail", args=[bien.pk]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["images"], [])
+
+    def test_owner_summary_and_authentication(self):
+        resp = self.client.get(reverse("api_proprietaires_resume", args=[self.proprietaire.pk]))
+        self.assertEqual(resp.json(), {
+            "id": self.proprietaire.pk,
+            "nom_complet": "Awa Ngono",
+            "nb_biens": 5,
+            "nb_biens_disponibles": 5,
+            "nb_contrats": 0,
+            "nb_contrats_actifs": 0,
+        })
+        resp = self.client.get(reverse("api_proprietaires_resume", args=[self.proprietaire.pk]),
+                               HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(self.client.get(reverse("api_biens_detail", args=[0])).status_code, 404)
+
+        self.client.logout()
+        resp = self.client.get(reverse("api_biens_liste"))
+        self.assertEqual(resp.status_code, 401)
+        self.client.force_login(User.objects.get(username="agent"))
+        self.assertEqual(self.client.post(reverse("api_biens_liste")).status_code, 405)
+
+
+STATIC_TEST = tempfile.mkdtemp(prefix="immobilier-static-")
+ASSETS_TEST = tempfile.mkdtemp(prefix="immobilier-assets-")
+
+
+@override_settings(
+    STATIC_ROOT=STATIC_TEST,
+    ASSETS_BUILD_DIR=ASSETS_TEST,
+    STATICFILES_FINDERS=["immobilier.assets.BundlesFinder"],
+    REQUETES_STRICT=True,
+)
+class AssetsStatiquesTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(STATIC_TEST, ignore_errors=True)
+        shutil.rmtree(ASSETS_TEST, ignore_errors=True)
+
+    def test_shared_rules_are_hoisted_once(self):
+        from .assets import COMMUN, composer_bundles
+
+        bundles = composer_bundles()
+        self.assertIn(".btn-ajouter:hover{", bundles[COMMUN])
+        self.assertNotIn(".btn-ajouter:hover{", bundles["biens_liste"])
+        # defined differently per page: stays in each page bundle
+        self.assertNotIn(".page-wrapper{", bundles[COMMUN])
+        self.assertIn(".page-wrapper{", bundles["biens_liste"])
+        # included by the three list pages
+        self.assertIn(".pagination-bar{", bundles[COMMUN])
+        self.assertNotIn("\n", bundles["biens_liste"])
+
+    def test_pages_link_hashed_precompressed_bundles(self):
+        call_command("collectstatic", interactive=False, verbosity=0)
+        self.client.force_login(User.objects.create_user("agent", password="x"))
+        html = self.client.get(reverse("biens_liste")).content.decode()
+        self.assertNotIn("<style", html)
+        liens = re.findall(r'href="(/static/immobilier/css/[^"]+)"', html)
+        self.assertEqual(len(liens), 3)
+        self.assertTrue(all(re.search(r"\.[0-9a-f]{12}\.css$", lien) for lien in liens), liens)
+
+        resp = self.client.get(liens[-1], HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertEqual(resp["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(resp["Vary"], "Accept-Encoding")
+        brut = self.client.get(liens[-1])
+        self.assertNotIn("Content-Encoding", brut)
+        self.assertEqual(
+            gzip.decompress(b"".join(resp.streaming_content)), b"".join(brut.streaming_content)
+        )
+
+        self.assertEqual(self.client.get("/static/immobilier/css/biens_liste.css")["Cache-Control"], "public, no-cache")
+        self.assertEqual(self.client.get("/static/../config/settings.py").status_code, 404)
@@ -0,0 +1,99 @@
+"""Pre-generated renditions of BienImage uploads.
+
+Each original gets one file per (rendition, format), stored next to it:
+``biens/photo.jpg`` -> ``biens/photo__carte.webp``, ``biens/photo__carte.jpg``, ...
+The result is recorded in ``BienImage.renditions`` so templates never touch
+the filesystem. ``creer_renditions`` only needs Pillow and a directory, so it
+can run in a thread after the upload or in a process pool for backfills.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+# name -> max width in pixels, smallest first
+RENDITIONS = {
+    "carte": 320,
+    "galerie": 800,
+    "complet": 1600,
+}
+FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="renditions")
+
+
+def _nom_rendition(nom_original, rendition, extension):
+    base, _ = os.path.splitext(nom_original)
+    return f"{base}__{rendition}.{extension}"
+
+
+def creer_renditions(racine, nom_original):
+    """Write every rendition of ``racine/nom_original`` and return the mapping to store.
+
+    ``{"carte": {"w": 320, "h": 240, "webp": "biens/x__carte.webp", "jpg": "biens/x__carte.jpg"}, ...}``
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(os.path.join(racine, nom_original)) as source:
+        source = ImageOps.exif_transpose(source)
+        source.load()
+        if source.mode not in ("RGB", "RGBA"):
+            source = source.convert("RGBA" if "transparency" in source.info else "RGB")
+
+        resultat = {}
+        for rendition, largeur in RENDITIONS.items():
+            image = source.copy()
+            image.thumbnail((largeur, largeur * 4), Image.Resampling.LANCZOS)
+            entree = {"w": image.width, "h": image.height}
+            for extension, options in FORMATS.items():
+                nom = _nom_rendition(nom_original, rendition, extension)
+                sortie = image.convert("RGB") if options["format"] == "JPEG" else image
+                sortie.save(os.path.join(racine, nom), **options)
+                entree[extension] = nom.replace(os.sep, "/")
+            resultat[rendition] = entree
+    return resultat
+
+
+def supprimer_renditions(racine, renditions):
+    for entree in (renditions or {}).values():
+        for extension in FORMATS:
+            chemin = entree.get(extension)
+            if chemin:
+                try:
+                    os.remove(os.path.join(racine, chemin))
+                except FileNotFoundError:
+                    pass
+
+
+def generer_renditions(image_id):
+    """Build and record the renditions of one BienImage (runs outside the request)."""
+    from .models import BienImage, BienImmobilier
+
+    try:
+        nom, bien_id = BienImage.objects.filter(pk=image_id).values_list("image", "bien_id").first() or (None, None)
+        if not nom:
+            return
+        renditions = creer_renditions(str(settings.MEDIA_ROOT), nom)
+        BienImage.objects.filter(pk=image_id).update(renditions=renditions)
+        BienImmobilier.objects.filter(pk=bien_id).update(modifie_le=timezone.now())
+    except Exception:
+        logger.exception("Échec de génération des renditions pour l'image %s", image_id)
+    finally:
+        close_old_connections()
+
+
+def planifier_renditions(image_id):
+    """Queue rendition generation once the upload's transaction commits."""
+    if getattr(settings, "RENDITIONS_SYNCHRONES", False):
+        transaction.on_commit(lambda: generer_renditions(image_id))
+    else:
+        transaction.on_commit(lambda: _executor.submit(generer_renditions, image_id))
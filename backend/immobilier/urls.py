@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import api, views
 
 urlpatterns = [
     path(
@@ -23,6 +23,11 @@ urlpatterns = [
         views.biens_liste,
         name="biens_liste",
     ),
+    path(
+        "biens/export/<str:format>/",
+        views.biens_export,
+        name="biens_export",
+    ),
     path(
         "biens/nouveau/",
         views.biens_create,
@@ -38,6 +43,16 @@ urlpatterns = [
         views.biens_delete,
         name="biens_supprimer",
     ),
+    path(
+        "televersements/",
+        views.televersements_creer,
+        name="televersements_creer",
+    ),
+    path(
+        "televersements/<uuid:ident>/",
+        views.televersement_morceau,
+        name="televersement_morceau",
+    ),
     path(
         "biens/<int:pk>/",
         views.biens_detail,
@@ -48,6 +63,11 @@ urlpatterns = [
         views.proprietaires_liste,
         name="proprietaires_liste",
     ),
+    path(
+        "proprietaires/export/<str:format>/",
+        views.proprietaires_export,
+        name="proprietaires_export",
+    ),
     path(
         "proprietaires/nouveau/",
         views.proprietaires_create,
@@ -68,6 +88,16 @@ urlpatterns = [
         views.contrats_liste,
         name="contrats_liste",
     ),
+    path(
+        "contrats/export/",
+        views.contrats_export_pdf,
+        name="contrats_export_pdf",
+    ),
+    path(
+        "contrats/export/<str:format>/",
+        views.contrats_export,
+        name="contrats_export",
+    ),
     path(
         "contrats/nouveau/",
         views.contrats_create,
@@ -88,4 +118,19 @@ urlpatterns = [
         views.contrat_pdf,
         name="contrat_pdf",
     ),
-]
\ No newline at end of file
+    path(
+        "api/biens/",
+        api.biens_liste,
+        name="api_biens_liste",
+    ),
+    path(
+        "api/biens/<int:pk>/",
+        api.biens_detail,
+        name="api_biens_detail",
+    ),
+    path(
+        "api/proprietaires/<int:pk>/",
+        api.proprietaires_resume,
+        name="api_proprietaires_resume",
+    ),
+]
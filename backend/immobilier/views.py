@@ -1,25 +1,49 @@
-from django.db.models import Q
+import re
+
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Now
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404, redirect, render
-from django.http import HttpResponse
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from .forms import BienImmobilierForm, ContratLocationForm, ProprietaireForm
-from .models import BienImmobilier, BienImage, ContratLocation, Proprietaire
+from django.http import FileResponse, Http404, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import require_http_methods, require_POST
+from .contrats_pdf import empreinte_contrat, pdf_contrat
+from .exports import (
+    COLONNES_BIENS,
+    COLONNES_CONTRATS,
+    COLONNES_PROPRIETAIRES,
+    flux_csv,
+    flux_xlsx,
+    flux_zip_contrats,
+    lignes_export,
+)
+from .filtres import filtrer_biens, filtrer_contrats, filtrer_proprietaires
+from .instrumentation import budget_requetes
+from .forms import BienImmobilierForm, ContratLocationForm, ProprietaireForm, TeleversementForm
+from .models import CONTRAT_ACTIF_EXISTANT, BienImmobilier, BienImage, ContratLocation, Proprietaire
+from .pagination import paginer_keyset
+from . import televersements
+from .stats import CLE_GLOBALE, appliquer_deltas, contributions_bien, deltas_groupes, difference, lire_stats
 
 
 @login_required
+@budget_requetes(4)
 def dashboard(request):
+    stats = lire_stats(CLE_GLOBALE)
     context = {
-        "nb_biens": BienImmobilier.objects.count(),
-        "nb_proprietaires": Proprietaire.objects.count(),
-        "nb_contrats_actifs": ContratLocation.objects.filter(actif=True).count(),
-        "nb_biens_disponibles": BienImmobilier.objects.filter(disponible=True).count(),
+        "nb_biens": stats.nb_biens,
+        "nb_proprietaires": stats.nb_proprietaires,
+        "nb_contrats_actifs": stats.nb_contrats_actifs,
+        "nb_biens_disponibles": stats.nb_biens_disponibles,
     }
     return render(request, "immobilier/Dashboard.html", context)
 
 
 @login_required
+@budget_requetes(3)
 def page_placeholder(request, title, description, pk=None):
     context = {
         "title": title,
@@ -29,32 +53,48 @@ def page_placeholder(request, title, description, pk=None):
     return render(request, "immobilier/page_placeholder.html", context)
 
 
+def _paginate_queryset(request, queryset, ordre, per_page=20):
+    page = paginer_keyset(
+        queryset,
+        ordre,
+        curseur=request.GET.get("curseur"),
+        per_page=per_page,
+        avec_total=True,
+    )
+    # Active filters, carried over by the pagination links.
+    filtres = request.GET.copy()
+    filtres.pop("curseur", None)
+    page.filtres = filtres.urlencode()
+    return page
+
+
 @login_required
+@budget_requetes(6)
 def biens_liste(request):
     recherche = request.GET.get("q", "").strip()
-    biens = BienImmobilier.objects.select_related("proprietaire").prefetch_related("images").order_by("-cree_le")
-    if recherche:
-        biens = biens.filter(Q(titre__icontains=recherche) | Q(ville__icontains=recherche))
+    biens = filtrer_biens(
+        BienImmobilier.objects.select_related("proprietaire").prefetch_related("images"), request.GET
+    )
 
-    biens = list(biens)
-    for bien in biens:
+    page_obj = _paginate_queryset(request, biens, ["-cree_le", "-id"])
+    for bien in page_obj:
         images = list(bien.images.all())
         bien.image_apercu = images[0] if images else None
 
-    context = {"title": "Liste des biens", "biens": biens, "q": recherche}
+    context = {"title": "Liste des biens", "biens": page_obj, "q": recherche}
     return render(request, "immobilier/biens_liste.html", context)
 
 
 @login_required
+@budget_requetes(16)
 def biens_create(request):
     if request.method == "POST":
-        form = BienImmobilierForm(request.POST, request.FILES)
+        form = BienImmobilierForm(request.POST, utilisateur=request.user)
         if form.is_valid():
-            bien = form.save()
-
-            for image_file in request.FILES.getlist("images"):
-                BienImage.objects.create(bien=bien, image=image_file)
-
+            # A bien is created with its photos or not at all.
+            with transaction.atomic():
+                bien = form.save()
+                televersements.attacher(bien, form.cleaned_data["televersements"])
             return redirect("biens_liste")
     else:
         form = BienImmobilierForm()
@@ -67,20 +107,20 @@ def biens_create(request):
 
 
 @login_required
+@budget_requetes(14)
 def biens_update(request, pk):
     bien = get_object_or_404(BienImmobilier, pk=pk)
     if request.method == "POST":
-        form = BienImmobilierForm(request.POST, request.FILES, instance=bien)
+        form = BienImmobilierForm(request.POST, instance=bien, utilisateur=request.user)
         if form.is_valid():
-            bien = form.save()
-
-            images_a_supprimer = request.POST.getlist("images_a_supprimer")
-            if images_a_supprimer:
-                BienImage.objects.filter(bien=bien, id__in=images_a_supprimer).delete()
+            with transaction.atomic():
+                bien = form.save()
 
-            for image_file in request.FILES.getlist("images"):
-                BienImage.objects.create(bien=bien, image=image_file)
+                images_a_supprimer = request.POST.getlist("images_a_supprimer")
+                if images_a_supprimer:
+                    BienImage.objects.filter(bien=bien, id__in=images_a_supprimer).delete()
 
+                televersements.attacher(bien, form.cleaned_data["televersements"])
             return redirect("biens_liste")
     else:
         form = BienImmobilierForm(instance=bien)
@@ -93,44 +133,140 @@ def biens_update(request, pk):
     return render(request, "immobilier/biens_form.html", context)
 
 
+def _reponse_televersement(televersement, statut=200):
+    return JsonResponse(
+        {"id": televersement.ident, "recu": televersement.recu, "termine": televersement.termine}, status=statut
+    )
+
+
+@login_required
+@budget_requetes(2)
+@require_POST
+def televersements_creer(request):
+    form = TeleversementForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({"erreurs": form.errors}, status=400)
+    try:
+        televersement = televersements.creer(request.user.pk, **form.cleaned_data)
+    except ValidationError as exc:
+        return JsonResponse({"erreurs": {"__all__": exc.messages}}, status=400)
+    return _reponse_televersement(televersement, statut=201)
+
+
 @login_required
+@budget_requetes(2)
+@require_http_methods(["GET", "PUT"])
+def televersement_morceau(request, ident):
+    televersement = televersements.charger(request.user.pk, ident)
+    if televersement is None:
+        raise Http404("Téléversement inconnu.")
+    if request.method == "PUT":
+        plage = re.fullmatch(r"bytes (\d+)-(\d+)/(\d+)", request.headers.get("Content-Range", ""))
+        if plage is None:
+            return JsonResponse({"erreurs": {"__all__": ["En-tête Content-Range manquant."]}}, status=400)
+        try:
+            # The body is read from the socket in blocks, straight into the part file.
+            televersements.ecrire(televersement, *map(int, plage.groups()), request)
+        except televersements.ErreurTeleversement as exc:
+            donnees = {"erreurs": {"__all__": [str(exc)]}}
+            if exc.recu is not None:
+                donnees["recu"] = exc.recu
+            return JsonResponse(donnees, status=exc.statut)
+    return _reponse_televersement(televersement)
+
+
+def _supprimer_avec_contrats(objet, proprietaires):
+    # The cascade loads the contracts without their bien: ``proprietaires``
+    # (bien id -> owner id) spares their stats signal a lookup per contract,
+    # and the cascade's deltas are written in one pass.
+    with transaction.atomic(), deltas_groupes(proprietaires):
+        objet.delete()
+
+
+@login_required
+@budget_requetes(15)
 def biens_delete(request, pk):
     bien = get_object_or_404(BienImmobilier, pk=pk)
     if request.method == "POST":
-        bien.delete()
+        _supprimer_avec_contrats(bien, {bien.pk: bien.proprietaire_id})
         return redirect("biens_liste")
     context = {"title": "Supprimer un bien", "bien": bien}
     return render(request, "immobilier/biens_confirm_delete.html", context)
 
 
 @login_required
+@budget_requetes(5)
 def biens_detail(request, pk):
     bien = get_object_or_404(BienImmobilier.objects.select_related("proprietaire"), pk=pk)
-    images = bien.images.all()
+    images = list(bien.images.all())
     context = {
         "title": "Détail d'un bien",
         "bien": bien,
         "images": images,
-        "image_principale": images.first(),
+        "image_principale": images[0] if images else None,
     }
     return render(request, "immobilier/biens_detail.html", context)
 
 
+FORMATS_EXPORT = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _reponse_export(queryset, colonnes, nom, format):
+    # Rows are read and encoded while the response is sent: the first bytes go
+    # out immediately and memory does not grow with the number of rows.
+    if format not in FORMATS_EXPORT:
+        raise Http404("Format d'export inconnu.")
+    lignes = lignes_export(queryset, colonnes)
+    flux = flux_xlsx(lignes, feuille=nom.capitalize()) if format == "xlsx" else flux_csv(lignes)
+    response = StreamingHttpResponse(flux, content_type=FORMATS_EXPORT[format])
+    response["Content-Disposition"] = f'attachment; filename="{nom}_{timezone.localdate():%Y%m%d}.{format}"'
+    return response
+
+
+@login_required
+@budget_requetes(3)
+def biens_export(request, format):
+    biens = filtrer_biens(BienImmobilier.objects.all(), request.GET).order_by("-cree_le", "-id")
+    return _reponse_export(biens, COLONNES_BIENS, "biens", format)
+
+
+def _annoter_compteurs_biens(proprietaires):
+    # Correlated subqueries are only evaluated for the rows of the page,
+    # each one an index lookup on proprietaire_id.
+    biens = BienImmobilier.objects.filter(proprietaire=OuterRef("pk")).order_by().values("proprietaire")
+
+    def _compter(qs):
+        return Coalesce(Subquery(qs.annotate(n=Count("pk")).values("n")), 0)
+
+    return proprietaires.annotate(
+        nb_biens=_compter(biens),
+        nb_biens_disponibles=_compter(biens.filter(disponible=True)),
+        nb_biens_loues=_compter(biens.filter(disponible=False)),
+    )
+
+
 @login_required
+@budget_requetes(5)
 def proprietaires_liste(request):
     recherche = request.GET.get("q", "").strip()
-    proprietaires = Proprietaire.objects.all().order_by("nom_complet")
-    if recherche:
-        proprietaires = proprietaires.filter(
-            Q(nom_complet__icontains=recherche)
-            | Q(email__icontains=recherche)
-            | Q(telephone__icontains=recherche)
-        )
-    context = {"title": "Liste des propriétaires", "proprietaires": proprietaires, "q": recherche}
+    proprietaires = filtrer_proprietaires(_annoter_compteurs_biens(Proprietaire.objects.all()), request.GET)
+    page_obj = _paginate_queryset(request, proprietaires, ["nom_complet", "id"])
+    context = {"title": "Liste des propriétaires", "proprietaires": page_obj, "q": recherche}
     return render(request, "immobilier/proprietaires_liste.html", context)
 
 
 @login_required
+@budget_requetes(3)
+def proprietaires_export(request, format):
+    proprietaires = filtrer_proprietaires(_annoter_compteurs_biens(Proprietaire.objects.all()), request.GET)
+    return _reponse_export(proprietaires.order_by("nom_complet", "id"), COLONNES_PROPRIETAIRES, "proprietaires", format)
+
+
+@login_required
+@budget_requetes(5)
 def proprietaires_create(request):
     if request.method == "POST":
         form = ProprietaireForm(request.POST)
@@ -144,6 +280,7 @@ def proprietaires_create(request):
 
 
 @login_required
+@budget_requetes(6)
 def proprietaires_update(request, pk):
     proprietaire = get_object_or_404(Proprietaire, pk=pk)
     if request.method == "POST":
@@ -158,42 +295,98 @@ def proprietaires_update(request, pk):
 
 
 @login_required
+@budget_requetes(17)
 def proprietaires_delete(request, pk):
     proprietaire = get_object_or_404(Proprietaire, pk=pk)
     if request.method == "POST":
-        proprietaire.delete()
+        biens = proprietaire.biens.values_list("pk", flat=True)
+        _supprimer_avec_contrats(proprietaire, dict.fromkeys(biens, proprietaire.pk))
         return redirect("proprietaires_liste")
     context = {"title": "Supprimer un propriétaire", "proprietaire": proprietaire}
     return render(request, "immobilier/proprietaires_confirm_delete.html", context)
 
 
-def _mettre_a_jour_disponibilite_bien(bien):
-    a_contrat_actif = bien.contrats.filter(actif=True).exists()
-    bien.disponible = not a_contrat_actif
-    bien.save(update_fields=["disponible"])
+def _basculer_disponibilite(bien, disponible):
+    """Set ``bien.disponible`` with one conditional UPDATE, a no-op if it already holds.
+
+    A bien is only freed if it has no active contract left. QuerySet.update
+    skips the signals, so the stats delta is applied here when the row changed.
+    """
+    biens = BienImmobilier.objects.filter(pk=bien.pk, disponible=not disponible)
+    if disponible:
+        biens = biens.filter(~Exists(ContratLocation.objects.filter(bien=OuterRef("pk"), actif=True)))
+    if biens.update(disponible=disponible, modifie_le=Now()):
+        appliquer_deltas(difference(
+            [contributions_bien(bien.proprietaire_id, bien.ville, disponible)],
+            [contributions_bien(bien.proprietaire_id, bien.ville, not disponible)],
+        ))
+        bien.disponible = disponible
+
+
+def _enregistrer_contrat(form, ancien_bien=None, ancien_actif=False):
+    """Save the contract and the availability of the biens it touches in one transaction.
+
+    The contrat_actif_unique constraint settles concurrent submissions: the
+    losing one gets the form error back and None is returned.
+    """
+    try:
+        with transaction.atomic(), deltas_groupes():
+            contrat = form.save()
+            meme_bien = ancien_bien is not None and ancien_bien.pk == contrat.bien_id
+            if contrat.actif and not (ancien_actif and meme_bien):
+                _basculer_disponibilite(contrat.bien, False)
+            if ancien_actif and not (contrat.actif and meme_bien):
+                _basculer_disponibilite(ancien_bien, True)
+    except IntegrityError:
+        instance = form.instance
+        autres_actifs = ContratLocation.objects.filter(bien_id=instance.bien_id, actif=True).exclude(pk=instance.pk)
+        if not autres_actifs.exists():
+            raise
+        form.add_error("actif", CONTRAT_ACTIF_EXISTANT)
+        return None
+    return contrat
 
 
 @login_required
+@budget_requetes(5)
 def contrats_liste(request):
     recherche = request.GET.get("q", "").strip()
-    contrats = ContratLocation.objects.select_related("bien", "bien__proprietaire").order_by("-date_debut")
-    if recherche:
-        contrats = contrats.filter(
-            Q(locataire_nom__icontains=recherche)
-            | Q(bien__titre__icontains=recherche)
-            | Q(bien__proprietaire__nom_complet__icontains=recherche)
-        )
-    context = {"title": "Liste des contrats", "contrats": contrats, "q": recherche}
+    contrats = filtrer_contrats(ContratLocation.objects.select_related("bien", "bien__proprietaire"), request.GET)
+    page_obj = _paginate_queryset(request, contrats, ["-date_debut", "-id"])
+    context = {
+        "title": "Liste des contrats",
+        "contrats": page_obj,
+        "q": recherche,
+        "actif": request.GET.get("actif", ""),
+        "du": request.GET.get("du", ""),
+        "au": request.GET.get("au", ""),
+    }
     return render(request, "immobilier/contrats_liste.html", context)
 
 
 @login_required
+@budget_requetes(3)
+def contrats_export_pdf(request):
+    contrats = filtrer_contrats(ContratLocation.objects.all(), request.GET).order_by("-date_debut", "-id")
+    response = StreamingHttpResponse(flux_zip_contrats(contrats), content_type="application/zip")
+    nom = f"contrats_{timezone.localdate():%Y%m%d}.zip"
+    response["Content-Disposition"] = f'attachment; filename="{nom}"'
+    return response
+
+
+@login_required
+@budget_requetes(3)
+def contrats_export(request, format):
+    contrats = filtrer_contrats(ContratLocation.objects.all(), request.GET).order_by("-date_debut", "-id")
+    return _reponse_export(contrats, COLONNES_CONTRATS, "contrats", format)
+
+
+@login_required
+@budget_requetes(14)
 def contrats_create(request):
     if request.method == "POST":
         form = ContratLocationForm(request.POST)
-        if form.is_valid():
-            contrat = form.save()
-            _mettre_a_jour_disponibilite_bien(contrat.bien)
+        if form.is_valid() and _enregistrer_contrat(form):
             return redirect("contrats_liste")
     else:
         proprietaire_id = request.GET.get("proprietaire")
@@ -204,15 +397,13 @@ def contrats_create(request):
 
 
 @login_required
+@budget_requetes(16)
 def contrats_update(request, pk):
-    contrat = get_object_or_404(ContratLocation, pk=pk)
-    ancien_bien = contrat.bien
+    contrat = get_object_or_404(ContratLocation.objects.select_related("bien"), pk=pk)
+    ancien_bien, ancien_actif = contrat.bien, contrat.actif
     if request.method == "POST":
         form = ContratLocationForm(request.POST, instance=contrat)
-        if form.is_valid():
-            contrat = form.save()
-            _mettre_a_jour_disponibilite_bien(ancien_bien)
-            _mettre_a_jour_disponibilite_bien(contrat.bien)
+        if form.is_valid() and _enregistrer_contrat(form, ancien_bien, ancien_actif):
             return redirect("contrats_liste")
     else:
         form = ContratLocationForm(instance=contrat)
@@ -221,61 +412,37 @@ def contrats_update(request, pk):
 
 
 @login_required
+@budget_requetes(12)
 def contrats_delete(request, pk):
     contrat = get_object_or_404(ContratLocation.objects.select_related("bien"), pk=pk)
     bien = contrat.bien
     if request.method == "POST":
-        contrat.delete()
-        _mettre_a_jour_disponibilite_bien(bien)
+        with transaction.atomic(), deltas_groupes():
+            contrat.delete()
+            if contrat.actif:
+                _basculer_disponibilite(bien, True)
         return redirect("contrats_liste")
     context = {"title": "Supprimer un contrat", "contrat": contrat}
     return render(request, "immobilier/contrats_confirm_delete.html", context)
 
 
 @login_required
+@budget_requetes(4)
 def contrat_pdf(request, pk):
     contrat = get_object_or_404(ContratLocation.objects.select_related("bien", "bien__proprietaire"), pk=pk)
 
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="contrat_{pk}.pdf"'
-
-    p = canvas.Canvas(response, pagesize=A4)
-    width, height = A4
-
-    # Titre
-    p.setFont("Helvetica-Bold", 20)
-    p.drawString(200, height - 80, "CONTRAT DE LOCATION")
-
-    # Ligne de séparation
-    p.line(50, height - 95, width - 50, height - 95)
-
-    # Infos contrat
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, height - 130, "Informations du contrat")
-
-    p.setFont("Helvetica", 11)
-    p.drawString(50, height - 155, f"Locataire : {contrat.locataire_nom}")
-    p.drawString(50, height - 175, f"Bien : {contrat.bien.titre}")
-    p.drawString(50, height - 195, f"Adresse : {contrat.bien.adresse}, {contrat.bien.ville}")
-    p.drawString(50, height - 215, f"Propriétaire : {contrat.bien.proprietaire.nom_complet}")
-    p.drawString(50, height - 235, f"Loyer mensuel : {contrat.bien.loyer_mensuel} FCFA")
-    p.drawString(50, height - 255, f"Caution : {contrat.caution} FCFA")
-    p.drawString(50, height - 275, f"Date début : {contrat.date_debut}")
-    p.drawString(50, height - 295, f"Date fin : {contrat.date_fin}")
-    p.drawString(50, height - 315, f"Statut : {'Actif' if contrat.actif else 'Inactif'}")
-
-    # Ligne de séparation
-    p.line(50, height - 335, width - 50, height - 335)
-
-    # Signatures
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, height - 370, "Signatures")
-    p.setFont("Helvetica", 11)
-    
-    p.drawString(50, height - 420, f" Propriétaire : {contrat.bien.proprietaire.nom_complet}")
-
-    p.drawString(300, height - 420, f"Locataire : {contrat.locataire_nom}")
-
-    p.showPage()
-    p.save()
-    return response
\ No newline at end of file
+    # The fingerprint covers every printed field, so it is a strong ETag.
+    empreinte = empreinte_contrat(contrat)
+    etag = quote_etag(empreinte)
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(
+            open(pdf_contrat(contrat, empreinte), "rb"),
+            as_attachment=True,
+            filename=f"contrat_{pk}.pdf",
+            content_type="application/pdf",
+        )
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
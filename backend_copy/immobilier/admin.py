@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import BienImmobilier, ContratLocation, Proprietaire
+from .models import BienImmobilier, ContratLocation, EmailSortant, Proprietaire
 
 
 @admin.register(Proprietaire)
@@ -21,3 +21,11 @@ class ContratLocationAdmin(admin.ModelAdmin):
     list_display = ("bien", "locataire_nom", "date_debut", "date_fin", "actif")
     list_filter = ("actif", "date_debut", "date_fin")
     search_fields = ("locataire_nom", "bien__titre")
+
+
+@admin.register(EmailSortant)
+class EmailSortantAdmin(admin.ModelAdmin):
+    list_display = ("sujet", "statut", "tentatives", "prochain_essai", "cree_le", "envoye_le")
+    list_filter = ("statut",)
+    search_fields = ("sujet", "destinataires")
+    readonly_fields = ("cree_le", "envoye_le", "derniere_erreur")
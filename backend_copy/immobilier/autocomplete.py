@@ -0,0 +1,88 @@
+"""Lazily loaded choices for the owner and bien selects of the forms.
+
+``AutocompleteSelect`` only renders the selected option; ``autocomplete.js``
+fetches the others from the JSON endpoints below as the user types. Typed text
+and names are compared after ``search.normaliser`` (lowercase, no accents), in
+Python on both sides: SQLite's LOWER() only folds ASCII. Owners are matched on
+a prefix of their stored ``nom_normalise``, an index range of
+``proprio_nom_norm_idx``; one owner's available biens on a prefix of their
+``titre_normalise``, a range of ``bien_proprio_dispo_titre_idx``. Either way a
+form costs the same to render whatever the size of the tables.
+"""
+from django import forms
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+
+from .models import BienImmobilier, Proprietaire
+from .search import normaliser
+
+
+LIMITE = 20
+
+
+class AutocompleteSelect(forms.Select):
+    """``<select>`` holding only the current value; ``depend_de`` names a field whose value filters the choices."""
+
+    class Media:
+        js = ["immobilier/autocomplete.js"]
+
+    def __init__(self, url, depend_de=None, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+        self.depend_de = depend_de
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["attrs"]["data-autocomplete-url"] = str(self.url)
+        if self.depend_de:
+            context["widget"]["attrs"]["data-autocomplete-depend"] = self.depend_de
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        champ = self.choices.field
+        choix = [("", champ.empty_label or "---------")]
+        selection = [v for v in value if v not in ("", None)]
+        if selection:
+            try:
+                choix += [self.choices.choice(obj) for obj in self.choices.queryset.filter(pk__in=selection)]
+            except (TypeError, ValueError, ValidationError):
+                pass
+        tous, self.choices = self.choices, choix
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = tous
+
+
+def _borne_prefixe(prefixe):
+    """``prefixe <= x < borne`` for every ``x`` starting with ``prefixe``: an index range, unlike LIKE."""
+    return prefixe + "\U0010ffff"
+
+
+def _resultats(objets):
+    return JsonResponse({"results": [{"id": obj.pk, "text": str(obj)} for obj in objets]})
+
+
+@login_required
+def proprietaires(request):
+    """``?q=`` : owners whose name starts with ``q`` (ignoring case and accents), by name."""
+    prefixe = normaliser(request.GET.get("q", "").strip())
+    qs = Proprietaire.objects.all()
+    if prefixe:
+        qs = qs.filter(nom_normalise__gte=prefixe, nom_normalise__lt=_borne_prefixe(prefixe))
+    return _resultats(qs.only("id", "nom_complet").order_by("nom_normalise", "id")[:LIMITE])
+
+
+@login_required
+def biens_disponibles(request):
+    """``?proprietaire=&q=`` : available biens of one owner whose titre starts with ``q``."""
+    try:
+        proprietaire_id = int(request.GET.get("proprietaire", ""))
+    except ValueError:
+        return _resultats([])
+    prefixe = normaliser(request.GET.get("q", "").strip())
+    qs = BienImmobilier.objects.filter(proprietaire_id=proprietaire_id, disponible=True)
+    if prefixe:
+        qs = qs.filter(titre_normalise__gte=prefixe, titre_normalise__lt=_borne_prefixe(prefixe))
+    return _resultats(qs.only("id", "titre").order_by("titre_normalise", "id")[:LIMITE])
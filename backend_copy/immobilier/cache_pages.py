@@ -0,0 +1,99 @@
+"""Full-page cache of the public property pages for anonymous visitors.
+
+Keys embed version counters kept in the cache itself: a global one for
+``biens_liste``, and for ``biens_detail`` one per bien plus one shared by all
+detail pages. Saving or deleting a bien (or its owner, whose name and contacts
+are printed) increments the counters, so stale pages are simply never looked
+up again and expire on their own; nothing has to enumerate keys. Changes that
+touch too many biens to bump one counter each (large expiry sweeps) bump the
+shared one instead. Counters start from the clock rather than
+from 1, so a counter lost to an eviction cannot bring old pages back.
+
+Versions live in the default cache: use the file-based backend when several
+worker processes serve the site, local memory otherwise.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+CLE_VERSION_GLOBALE = "immobilier:pages:version"
+CLE_VERSION_DETAILS = "immobilier:pages:version:details"
+
+
+def _cle_version_bien(pk):
+    return f"immobilier:pages:version:bien:{pk}"
+
+
+def _incrementer(cle):
+    try:
+        cache.incr(cle)
+    except ValueError:
+        cache.add(cle, time.time_ns(), None)
+
+
+def _versions(cles):
+    valeurs = cache.get_many(cles)
+    for cle in cles:
+        if cle not in valeurs:
+            cache.add(cle, time.time_ns(), None)
+            valeurs[cle] = cache.get(cle)
+    return [valeurs[cle] for cle in cles]
+
+
+def version_pages():
+    """Current global version: changes whenever a bien listed on the pages does."""
+    return _versions([CLE_VERSION_GLOBALE])[0]
+
+
+def invalider_pages(*bien_ids, tous_les_details=False, using="default"):
+    """Retire the list pages and the detail pages of ``bien_ids``, or of every bien with ``tous_les_details``.
+
+    Bumped right away and again once the transaction commits, so a page
+    rendered from the old rows in between is not kept either.
+    """
+    def _bump():
+        _incrementer(CLE_VERSION_GLOBALE)
+        if tous_les_details:
+            _incrementer(CLE_VERSION_DETAILS)
+        for pk in bien_ids:
+            _incrementer(_cle_version_bien(pk))
+
+    _bump()
+    transaction.on_commit(_bump, using=using)
+
+
+def cache_page_anonyme(par_bien=False):
+    """Serve GET/HEAD responses of anonymous visitors from the cache.
+
+    The key is the path and query string plus the global version, or with
+    ``par_bien`` the versions of the bien named by the ``pk`` URL argument and
+    of all detail pages.
+    """
+    def decorateur(vue):
+        @wraps(vue)
+        def _vue(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or request.user.is_authenticated:
+                return vue(request, *args, **kwargs)
+
+            if par_bien:
+                versions = _versions([_cle_version_bien(kwargs["pk"]), CLE_VERSION_DETAILS])
+            else:
+                versions = _versions([CLE_VERSION_GLOBALE])
+            chemin = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            cle = f"immobilier:page:{vue.__name__}:{chemin}:" + ":".join(map(str, versions))
+            response = cache.get(cle)
+            if response is None:
+                response = vue(request, *args, **kwargs)
+                # Pages that set a cookie (CSRF, messages) are specific to this visitor.
+                if response.status_code == 200 and not response.cookies and not response.streaming:
+                    cache.set(cle, response, settings.PAGES_CACHE_TIMEOUT)
+            return response
+
+        return _vue
+
+    return decorateur
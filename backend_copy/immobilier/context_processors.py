@@ -1,10 +1,10 @@
-from .models import Proprietaire
+from .middleware import proprietaire_id_courant
 
 
 def user_is_proprietaire(request):
     """Context processor to expose whether the current user is linked to a Proprietaire."""
     try:
-        is_prop = request.user.is_authenticated and Proprietaire.objects.filter(user=request.user).exists()
+        is_prop = proprietaire_id_courant(request) is not None
     except Exception:
         is_prop = False
     return {"user_is_proprietaire": is_prop}
@@ -0,0 +1,157 @@
+"""Facet filters of biens_liste and their counts.
+
+Each facet (ville, type_bien, loyer band, surface band, disponible) takes
+several values, ORed together; facets are ANDed. The count next to a value is
+the number of biens the list would show with that value ticked: it obeys the
+search and every other facet, but not its own.
+
+All the counts come from one grouped aggregate: the biens matching the search
+(``q``, radius, loyer and surface ranges) grouped by their five facet values. Each group is a cell of a
+cube of at most 20 x 4 x 5 x 5 x 2 cells, and the counts of any selection are
+sums of cells, folded in Python. Without a search the aggregate only reads the
+covering ``bien_cree_facettes_idx``. The cube is cached per normalised search
+under the version of the page cache, so ticking facets reads no table until a
+bien changes.
+"""
+import hashlib
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+from .cache_pages import version_pages
+from .models import BienImmobilier
+from .search import termes
+
+
+def _nombre(n):
+    return f"{n:,}".replace(",", "\xa0")
+
+
+def _tranches(bornes, unite):
+    """``[(code, libelle, min, max)]`` from increasing bounds; ``max`` is excluded, None for the last band."""
+    limites = [0, *bornes, None]
+    resultat = []
+    for bas, haut in zip(limites, limites[1:]):
+        if not bas:
+            libelle = f"moins de {_nombre(haut)} {unite}"
+        elif haut is None:
+            libelle = f"{_nombre(bas)} {unite} et plus"
+        else:
+            libelle = f"{_nombre(bas)} à {_nombre(haut)} {unite}"
+        resultat.append((f"{bas}-{'' if haut is None else haut}", libelle, bas, haut))
+    return resultat
+
+
+TRANCHES_LOYER = _tranches([50_000, 100_000, 200_000, 500_000], "FCFA")
+TRANCHES_SURFACE = _tranches([50, 100, 200, 500], "m²")
+# facet -> (label, model field, bands); bands are None for plain choice fields
+FACETTES = {
+    "ville": ("Ville", "ville", None),
+    "type_bien": ("Type", "type_bien", None),
+    "loyer": ("Loyer mensuel", "loyer_mensuel", TRANCHES_LOYER),
+    "surface": ("Surface", "superficie_m2", TRANCHES_SURFACE),
+    "disponible": ("Disponibilité", "disponible", None),
+}
+CHOIX = {
+    "ville": BienImmobilier.VILLE_CHOICES,
+    "type_bien": BienImmobilier.TYPE_BIEN_CHOICES,
+    "loyer": [(code, libelle) for code, libelle, _, _ in TRANCHES_LOYER],
+    "surface": [(code, libelle) for code, libelle, _, _ in TRANCHES_SURFACE],
+    "disponible": [("1", "Disponible"), ("0", "Loué")],
+}
+
+
+def selection(params):
+    """``{facet: sorted codes}`` of the ticked values; unknown codes are dropped, unticked facets left out."""
+    resultat = {}
+    for nom, choix in CHOIX.items():
+        codes = set(params.getlist(nom)) & {code for code, _ in choix}
+        if codes:
+            resultat[nom] = tuple(sorted(codes))
+    return resultat
+
+
+def _condition(nom, codes):
+    _, champ, tranches = FACETTES[nom]
+    if nom == "disponible":
+        return Q(disponible__in=[code == "1" for code in codes])
+    if tranches is None:
+        return Q(**{f"{champ}__in": codes})
+    condition = Q()
+    for code, _, bas, haut in tranches:
+        if code in codes:
+            condition |= Q(**{f"{champ}__gte": bas}) & (Q(**{f"{champ}__lt": haut}) if haut is not None else Q())
+    return condition
+
+
+def filtrer(queryset, choisies):
+    """Restrict ``queryset`` to the facet selection returned by ``selection``."""
+    for nom, codes in choisies.items():
+        queryset = queryset.filter(_condition(nom, codes))
+    return queryset
+
+
+def _tranche(champ, tranches):
+    return Case(
+        *(When(**{f"{champ}__lt": haut}, then=Value(code)) for code, _, _, haut in tranches if haut is not None),
+        default=Value(tranches[-1][0]),
+        output_field=CharField(),
+    )
+
+
+def cube(queryset):
+    """``[(cell, count)]``: the biens of ``queryset`` grouped by their facet values, in one query."""
+    lignes = (
+        queryset.select_related(None)
+        .order_by()
+        .annotate(tranche_loyer=_tranche("loyer_mensuel", TRANCHES_LOYER))
+        .annotate(tranche_surface=_tranche("superficie_m2", TRANCHES_SURFACE))
+        .values_list("ville", "type_bien", "tranche_loyer", "tranche_surface", "disponible")
+        .annotate(nombre=Count("id"))
+    )
+    return [((ville, type_bien, loyer, surface, "1" if disponible else "0"), nombre)
+            for ville, type_bien, loyer, surface, disponible, nombre in lignes]
+
+
+def cube_en_cache(queryset, recherche="", centre=None, bornes=()):
+    """``cube(queryset)`` for the search ``recherche`` / ``centre`` / ``bornes`` that ``queryset`` applies, cached."""
+    if centre is not None:
+        centre = tuple(round(valeur, 4) for valeur in centre)
+    empreinte = hashlib.md5(repr((termes(recherche), centre, tuple(bornes))).encode()).hexdigest()
+    cle = f"immobilier:facettes:{empreinte}:{version_pages()}"
+    resultat = cache.get(cle)
+    if resultat is None:
+        resultat = cube(queryset)
+        cache.set(cle, resultat, settings.PAGES_CACHE_TIMEOUT)
+    return resultat
+
+
+def compter(cellules, choisies):
+    """``(facettes, total)``: per facet its label and ``[(code, libelle, nombre, coche)]``, and the list's total.
+
+    Values with no bien are left out unless ticked.
+    """
+    noms = list(FACETTES)
+    comptes = {nom: Counter() for nom in noms}
+    total = 0
+    for cellule, nombre in cellules:
+        hors = [nom for nom, valeur in zip(noms, cellule) if nom in choisies and valeur not in choisies[nom]]
+        if not hors:
+            total += nombre
+        # A cell counts for a facet if it passes every other facet.
+        for nom, valeur in zip(noms, cellule):
+            if not hors or hors == [nom]:
+                comptes[nom][valeur] += nombre
+
+    facettes = []
+    for nom, (libelle, _, _) in FACETTES.items():
+        cochees = choisies.get(nom, ())
+        valeurs = [
+            (code, libelle_choix, comptes[nom][code], code in cochees)
+            for code, libelle_choix in CHOIX[nom]
+            if comptes[nom][code] or code in cochees
+        ]
+        facettes.append((nom, libelle, valeurs))
+    return facettes, total
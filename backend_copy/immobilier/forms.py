@@ -1,5 +1,8 @@
 from django import forms
 from django.db.models import Q
+from django.urls import reverse_lazy
+from .autocomplete import AutocompleteSelect
+from .geo import RAYON_DEFAUT_KM, RAYON_MAX_KM, centre_ville
 from .models import BienImmobilier, ContratLocation, Proprietaire
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
@@ -18,7 +21,109 @@ class BienImmobilierForm(forms.ModelForm):
             "proprietaire",
             "disponible",
             "exige_validation_contrat",
+            "latitude",
+            "longitude",
         ]
+        widgets = {
+            "proprietaire": AutocompleteSelect(reverse_lazy("autocomplete_proprietaires")),
+        }
+        help_texts = {
+            "latitude": "Laisser vide pour la déduire de l'adresse et de la ville.",
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # Coordinates left untouched follow a new address: they are geocoded again on save.
+        modifies = set(self.changed_data)
+        if {"adresse", "ville"} & modifies and not {"latitude", "longitude"} & modifies:
+            cleaned_data["latitude"] = cleaned_data["longitude"] = None
+        return cleaned_data
+
+
+class RechercheGeoForm(forms.Form):
+    """Radius search of biens_liste: around a ville centre or a ``lat``/``lon`` point."""
+
+    autour = forms.ChoiceField(choices=[("", "Partout")] + BienImmobilier.VILLE_CHOICES, required=False)
+    lat = forms.FloatField(min_value=-90, max_value=90, required=False)
+    lon = forms.FloatField(min_value=-180, max_value=180, required=False)
+    rayon = forms.FloatField(
+        min_value=0.1,
+        max_value=RAYON_MAX_KM,
+        required=False,
+        widget=forms.NumberInput(attrs={"placeholder": RAYON_DEFAUT_KM, "step": "any", "style": "width: 5em"}),
+    )
+
+    def centre(self):
+        """``(lat, lon, rayon_km)``, or None when no point was given."""
+        if not self.is_valid():
+            return None
+        donnees = self.cleaned_data
+        if donnees["lat"] is not None and donnees["lon"] is not None:
+            point = donnees["lat"], donnees["lon"]
+        elif donnees["autour"]:
+            point = centre_ville(donnees["autour"])
+        else:
+            return None
+        return (*point, donnees["rayon"] or RAYON_DEFAUT_KM)
+
+
+class FiltresBiensForm(forms.Form):
+    """Budget and size ranges of biens_liste, and its sort; invalid values are ignored."""
+
+    # tri -> keyset order, each served by an index of BienImmobilier
+    TRIS = {
+        "loyer": ["loyer_mensuel", "id"],
+        "-loyer": ["-loyer_mensuel", "-id"],
+        "surface": ["superficie_m2", "id"],
+        "-surface": ["-superficie_m2", "-id"],
+        "loyer_m2": ["loyer_m2", "id"],
+        "-loyer_m2": ["-loyer_m2", "-id"],
+    }
+
+    loyer_min = forms.DecimalField(min_value=0, required=False, widget=forms.NumberInput(attrs={"placeholder": "min"}))
+    loyer_max = forms.DecimalField(min_value=0, required=False, widget=forms.NumberInput(attrs={"placeholder": "max"}))
+    surface_min = forms.IntegerField(min_value=0, required=False, widget=forms.NumberInput(attrs={"placeholder": "min"}))
+    surface_max = forms.IntegerField(min_value=0, required=False, widget=forms.NumberInput(attrs={"placeholder": "max"}))
+    tri = forms.ChoiceField(
+        choices=[
+            ("", "Pertinence / plus récents"),
+            ("loyer", "Loyer croissant"),
+            ("-loyer", "Loyer décroissant"),
+            ("surface", "Surface croissante"),
+            ("-surface", "Surface décroissante"),
+            ("loyer_m2", "Loyer au m² croissant"),
+            ("-loyer_m2", "Loyer au m² décroissant"),
+        ],
+        required=False,
+    )
+
+    def _donnees(self):
+        self.is_valid()
+        return self.cleaned_data
+
+    def bornes(self):
+        """The valid range values, as a hashable key."""
+        donnees = self._donnees()
+        return tuple(
+            None if donnees.get(nom) is None else float(donnees[nom])
+            for nom in ("loyer_min", "loyer_max", "surface_min", "surface_max")
+        )
+
+    def filtrer(self, biens):
+        donnees = self._donnees()
+        for nom, lookup in (
+            ("loyer_min", "loyer_mensuel__gte"),
+            ("loyer_max", "loyer_mensuel__lte"),
+            ("surface_min", "superficie_m2__gte"),
+            ("surface_max", "superficie_m2__lte"),
+        ):
+            if donnees.get(nom) is not None:
+                biens = biens.filter(**{lookup: donnees[nom]})
+        return biens
+
+    def ordre(self):
+        """The keyset order asked for with ``tri``, or None for the page's default."""
+        return self.TRIS.get(self._donnees().get("tri"))
 
 
 class ProprietaireForm(forms.ModelForm):
@@ -30,9 +135,10 @@ class ProprietaireForm(forms.ModelForm):
 class ContratLocationForm(forms.ModelForm):
     # proprietaire is an extra field to help filter 'bien' choices in the form
     proprietaire = forms.ModelChoiceField(
-        queryset=Proprietaire.objects.all().order_by("nom_complet"),
+        queryset=Proprietaire.objects.all(),
         required=True,
         label="Propriétaire",
+        widget=AutocompleteSelect(reverse_lazy("autocomplete_proprietaires")),
     )
     accepte_contrat = forms.BooleanField(
         required=False,
@@ -55,12 +161,16 @@ class ContratLocationForm(forms.ModelForm):
             "actif",
         ]
         widgets = {
+            "bien": AutocompleteSelect(reverse_lazy("autocomplete_biens"), depend_de="proprietaire"),
             "date_debut": forms.DateInput(attrs={"type": "date"}),
             "date_fin": forms.DateInput(attrs={"type": "date"}),
         }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # The choice field already loaded the bien; contrat_actif_unique would
+        # cost a query and the database enforces it on save, see views._enregistrer_contrat.
+        self.instance.contraintes_en_base = frozenset({"bien"})
         self.fields["bien"].queryset = BienImmobilier.objects.none()
 
         # prefer POST data, then initial, then instance
@@ -78,23 +188,18 @@ class ContratLocationForm(forms.ModelForm):
             selected_owner_id = None
 
         if selected_owner_id:
-            self.fields["bien"].queryset = BienImmobilier.objects.filter(
-                Q(proprietaire_id=selected_owner_id, disponible=True)
-                | Q(pk=getattr(self.instance, "bien_id", None))
-            ).order_by("titre")
-
-        if self.instance and self.instance.pk and not self.fields["bien"].queryset.exists():
-            # allow current bien even if not disponible
-            self.fields["bien"].queryset = BienImmobilier.objects.filter(
-                Q(disponible=True) | Q(pk=self.instance.bien_id)
-            ).order_by("titre")
+            biens = Q(proprietaire_id=selected_owner_id, disponible=True)
+            if getattr(self.instance, "bien_id", None):
+                # "OR id IS NULL" would defeat the (proprietaire, disponible) index
+                biens |= Q(pk=self.instance.bien_id)
+            # Only used to validate the submitted pk: the widget renders the current bien alone.
+            self.fields["bien"].queryset = BienImmobilier.objects.filter(biens)
 
     def clean(self):
         cleaned_data = super().clean()
         bien = cleaned_data.get("bien")
         date_debut = cleaned_data.get("date_debut")
         date_fin = cleaned_data.get("date_fin")
-        actif = cleaned_data.get("actif")
         accepte_contrat = cleaned_data.get("accepte_contrat")
 
         if date_debut and date_fin and date_fin <= date_debut:
@@ -105,14 +210,6 @@ class ContratLocationForm(forms.ModelForm):
         if bien and proprietaire and bien.proprietaire_id != proprietaire.id:
             self.add_error("bien", "Le bien sélectionné ne correspond pas au propriétaire choisi.")
 
-        if bien and actif:
-            contrats_actifs = ContratLocation.objects.filter(bien=bien, actif=True)
-            if self.instance.pk:
-                contrats_actifs = contrats_actifs.exclude(pk=self.instance.pk)
-
-            if contrats_actifs.exists():
-                self.add_error("actif", "Ce bien a déjà un contrat actif.")
-
         # If the selected bien has a contract template and requires validation,
         # ensure the renter accepted it.
         if bien and getattr(bien, "exige_validation_contrat", False):
@@ -0,0 +1,146 @@
+"""Coordinates of the biens: offline geocoding and a grid index for map searches.
+
+Coordinates are entered in the form or, failing that, taken from
+``data/gazetteer.csv``: the approximate centre of a neighbourhood of the ville
+named in the address, else the centre of the ville.
+
+``geocellule`` is an integer geohash: latitude and longitude quantised on a
+2^20 x 2^20 grid (about 20 m x 40 m per cell), their bits interleaved (Morton
+order) so that cells close on the map mostly share a prefix. A bounding box is
+covered by a few ranges of codes, each one a range scan on
+``bien_geocellule_idx``; the exact box or radius test then only runs on the
+rows of those ranges. It needs no spatial extension, on SQLite or Postgres.
+"""
+import csv
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.db.models import ExpressionWrapper, F, FloatField, Q
+from django.db.models.functions import Sqrt
+
+from .search import normaliser
+
+
+GAZETTEER = Path(__file__).resolve().parent / "data" / "gazetteer.csv"
+BITS = 20
+KM_PAR_DEGRE = 111.32
+RAYON_DEFAUT_KM = 3
+RAYON_MAX_KM = 50
+# Above this many ranges the cover stops being refined: coarser cells, more rows to test.
+PLAGES_MAX = 32
+
+
+@lru_cache(maxsize=None)
+def lieux():
+    """``{ville: [(lieu normalised, lat, lon)]}``, longest names first; ``""`` is the ville centre."""
+    resultat = {}
+    with open(GAZETTEER, newline="", encoding="utf-8") as fichier:
+        for ligne in csv.DictReader(fichier):
+            resultat.setdefault(ligne["ville"], []).append(
+                (normaliser(ligne["lieu"]), float(ligne["latitude"]), float(ligne["longitude"]))
+            )
+    for liste in resultat.values():
+        liste.sort(key=lambda lieu: -len(lieu[0]))
+    return resultat
+
+
+def centre_ville(ville):
+    return next(((lat, lon) for nom, lat, lon in lieux().get(ville, ()) if not nom), None)
+
+
+def geocoder(adresse, ville):
+    """``(lat, lon)`` of the first neighbourhood of ``ville`` named in ``adresse``, else of the ville; None if unknown."""
+    texte = normaliser(adresse)
+    for nom, lat, lon in lieux().get(ville, ()):
+        if nom and re.search(rf"\b{re.escape(nom)}\b", texte):
+            return lat, lon
+    return centre_ville(ville)
+
+
+def _quantifier(valeur, borne):
+    """Grid column (or row) of ``valeur`` in ``[-borne, borne]``."""
+    cellule = int((valeur + borne) / (2 * borne) * (1 << BITS))
+    return min(max(cellule, 0), (1 << BITS) - 1)
+
+
+def _etaler(v):
+    # abcd -> 0a0b0c0d
+    v = (v | (v << 16)) & 0x0000FFFF0000FFFF
+    v = (v | (v << 8)) & 0x00FF00FF00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F0F0F0F0F
+    v = (v | (v << 2)) & 0x3333333333333333
+    return (v | (v << 1)) & 0x5555555555555555
+
+
+def _code(x, y):
+    return _etaler(x) | (_etaler(y) << 1)
+
+
+def geocellule(latitude, longitude):
+    if latitude is None or longitude is None:
+        return None
+    return _code(_quantifier(longitude, 180), _quantifier(latitude, 90))
+
+
+def plages(lat_min, lon_min, lat_max, lon_max, plages_max=PLAGES_MAX):
+    """Sorted, merged ``(debut, fin)`` code ranges covering the box."""
+    x0, x1 = _quantifier(lon_min, 180), _quantifier(lon_max, 180)
+    y0, y1 = _quantifier(lat_min, 90), _quantifier(lat_max, 90)
+
+    # Quadtree descent: cells inside the box are final, cells across its edge
+    # are split again, as long as the cover stays within plages_max cells.
+    pleines, partielles, taille = [], [(0, 0)], 1 << BITS
+    while partielles and taille > 1:
+        moitie = taille // 2
+        nouvelles_pleines, suivantes = [], []
+        for x, y in partielles:
+            for qx, qy in ((x, y), (x + moitie, y), (x, y + moitie), (x + moitie, y + moitie)):
+                if qx > x1 or qx + moitie - 1 < x0 or qy > y1 or qy + moitie - 1 < y0:
+                    continue
+                if x0 <= qx and qx + moitie - 1 <= x1 and y0 <= qy and qy + moitie - 1 <= y1:
+                    nouvelles_pleines.append((qx, qy, moitie))
+                else:
+                    suivantes.append((qx, qy))
+        if len(pleines) + len(nouvelles_pleines) + len(suivantes) > plages_max:
+            break
+        pleines += nouvelles_pleines
+        partielles, taille = suivantes, moitie
+
+    cellules = pleines + [(x, y, taille) for x, y in partielles]
+    resultat = []
+    for debut, fin in sorted((_code(x, y), _code(x, y) + c * c - 1) for x, y, c in cellules):
+        if resultat and debut == resultat[-1][1] + 1:
+            resultat[-1] = (resultat[-1][0], fin)
+        else:
+            resultat.append((debut, fin))
+    return resultat
+
+
+def dans_zone(queryset, lat_min, lon_min, lat_max, lon_max):
+    """Biens of ``queryset`` inside the box, found through the grid index."""
+    cellules = Q()
+    for debut, fin in plages(lat_min, lon_min, lat_max, lon_max):
+        cellules |= Q(geocellule__range=(debut, fin))
+    return queryset.filter(
+        cellules,
+        latitude__range=(lat_min, lat_max),
+        longitude__range=(lon_min, lon_max),
+    )
+
+
+def autour(queryset, latitude, longitude, rayon_km):
+    """Biens within ``rayon_km`` of the point, annotated with ``distance_km``.
+
+    Equirectangular distance: over a few tens of km its error is far below
+    the precision of gazetteer coordinates, and it needs no trigonometry in SQL.
+    """
+    dlat = rayon_km / KM_PAR_DEGRE
+    echelle = max(math.cos(math.radians(latitude)), 1e-6)
+    dlon = dlat / echelle
+    queryset = dans_zone(queryset, latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon)
+    dy = F("latitude") - latitude
+    dx = (F("longitude") - longitude) * echelle
+    carre = ExpressionWrapper(dy * dy + dx * dx, output_field=FloatField())
+    return queryset.annotate(distance_km=Sqrt(carre) * KM_PAR_DEGRE).filter(distance_km__lte=rayon_km)
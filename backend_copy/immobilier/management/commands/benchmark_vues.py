@@ -0,0 +1,166 @@
+import json
+import platform
+import statistics
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from immobilier import urls as immobilier_urls
+from immobilier.models import BienImmobilier, ContratLocation, Proprietaire
+
+
+# Routes that change state on GET or end the session.
+ROUTES_EXCLUES = {"deconnexion"}
+# Extra variants of list routes worth timing separately.
+VARIANTES = {
+    "biens_liste": [
+        "?q=appartement",
+        "?q=douala",
+        "?autour=douala&rayon=3",
+        "?ville=douala&type_bien=appartement&disponible=1",
+        "?ville=douala&type_bien=appartement&disponible=1&loyer_max=150000&tri=loyer_m2",
+    ],
+    "biens_carte": ["?bbox=9.68,4.02,9.78,4.08", "?bbox=11.45,3.80,11.60,3.92"],
+    "contrats_liste": ["?q=jean"],
+    "proprietaires_liste": ["?q=mbarga"],
+}
+
+
+def _percentile(valeurs, p):
+    if len(valeurs) == 1:
+        return valeurs[0]
+    return statistics.quantiles(valeurs, n=100, method="inclusive")[p - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Chronomètre chaque route de immobilier/urls.py (p50/p95/p99, nombre de requêtes SQL, "
+        "octets rendus) et enregistre les résultats en JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--sortie", help="Fichier JSON (défaut : benchmarks/<moteur>-<date>.json).")
+        parser.add_argument("--comparer", help="Résultats JSON précédents à comparer (p95).")
+        parser.add_argument("--route", action="append", help="Limiter à ces noms de route.")
+
+    def handle(self, *args, **options):
+        roles = self._roles()
+        hote = next((h for h in settings.ALLOWED_HOSTS if h and "*" not in h), "localhost")
+        resultats = []
+        for nom, url in self._urls(options["route"]):
+            for role, user in roles.items():
+                # Broken views are recorded with their 500 instead of aborting the run.
+                client = Client(HTTP_HOST=hote, raise_request_exception=False)
+                if user is not None:
+                    client.force_login(user)
+                resultats.append(self._mesurer(client, nom, url, role, options["iterations"]))
+                r = resultats[-1]
+                self.stdout.write(
+                    f"  {nom:<24} {role:<14} {r['status']}  p50 {r['p50_ms']:8.1f} ms  "
+                    f"p95 {r['p95_ms']:8.1f} ms  {r['requetes']:3d} req  {r['octets']:8d} o  {url}"
+                )
+
+        rapport = {
+            "meta": {
+                "date": timezone.now().isoformat(),
+                "moteur": connection.vendor,
+                "django": django.get_version(),
+                "python": platform.python_version(),
+                "iterations": options["iterations"],
+                "volumes": {
+                    "proprietaires": Proprietaire.objects.count(),
+                    "biens": BienImmobilier.objects.count(),
+                    "contrats": ContratLocation.objects.count(),
+                },
+            },
+            "resultats": resultats,
+        }
+        sortie = Path(options["sortie"] or settings.BASE_DIR / "benchmarks" / (
+            f"{connection.vendor}-{timezone.now():%Y%m%d-%H%M%S}.json"
+        ))
+        sortie.parent.mkdir(parents=True, exist_ok=True)
+        sortie.write_text(json.dumps(rapport, indent=2, ensure_ascii=False), encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(f"Résultats enregistrés dans {sortie}"))
+
+        if options["comparer"]:
+            self._comparer(json.loads(Path(options["comparer"]).read_text(encoding="utf-8")), rapport)
+
+    def _roles(self):
+        # Pick the accounts with the most data so the owner pages are not trivially empty.
+        proprietaire = (
+            Proprietaire.objects.filter(user__isnull=False).order_by("-pk").select_related("user").first()
+        )
+        locataire_email = (
+            ContratLocation.objects.exclude(locataire_email="").values_list("locataire_email", flat=True).first()
+        )
+        locataire = User.objects.filter(email=locataire_email).first() if locataire_email else None
+        if proprietaire is None or locataire is None:
+            raise CommandError("Aucune donnée exploitable : lancez d'abord `manage.py generer_donnees`.")
+        return {"anonyme": None, "proprietaire": proprietaire.user, "locataire": locataire}
+
+    def _urls(self, filtres):
+        bien = BienImmobilier.objects.order_by("-pk").first()
+        exemples = {
+            "biens": bien.pk,
+            "proprietaires": bien.proprietaire_id,
+            "contrats": ContratLocation.objects.filter(bien__proprietaire_id=bien.proprietaire_id)
+            .values_list("pk", flat=True).first() or ContratLocation.objects.values_list("pk", flat=True).first(),
+        }
+        for pattern in immobilier_urls.urlpatterns:
+            if not isinstance(pattern, URLPattern) or pattern.name in ROUTES_EXCLUES:
+                continue
+            if filtres and pattern.name not in filtres:
+                continue
+            kwargs = {}
+            if "pk" in pattern.pattern.converters:
+                kwargs["pk"] = exemples[pattern.name.split("_")[0]]
+            url = reverse(pattern.name, kwargs=kwargs)
+            yield pattern.name, url
+            for suffixe in VARIANTES.get(pattern.name, []):
+                yield pattern.name, url + suffixe
+
+    def _mesurer(self, client, nom, url, role, iterations):
+        client.get(url)  # warm-up: template loading, session and caches
+        durees = []
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as ctx:
+                debut = time.perf_counter()
+                resp = client.get(url)
+                contenu = b"".join(resp.streaming_content) if resp.streaming else resp.content
+                durees.append((time.perf_counter() - debut) * 1000)
+        return {
+            "route": nom,
+            "url": url,
+            "role": role,
+            "status": resp.status_code,
+            "p50_ms": round(_percentile(durees, 50), 2),
+            "p95_ms": round(_percentile(durees, 95), 2),
+            "p99_ms": round(_percentile(durees, 99), 2),
+            "moyenne_ms": round(statistics.fmean(durees), 2),
+            "requetes": len(ctx.captured_queries),
+            "octets": len(contenu),
+        }
+
+    def _comparer(self, precedent, actuel):
+        avant = {(r["url"], r["role"]): r for r in precedent["resultats"]}
+        self.stdout.write("\nComparaison p95 (avant -> après) :")
+        for r in actuel["resultats"]:
+            ancien = avant.get((r["url"], r["role"]))
+            if not ancien:
+                continue
+            ratio = r["p95_ms"] / ancien["p95_ms"] if ancien["p95_ms"] else 0
+            marque = "  <-- régression" if ratio > 1.2 else ""
+            self.stdout.write(
+                f"  {r['url']:<40} {r['role']:<14} {ancien['p95_ms']:8.1f} -> {r['p95_ms']:8.1f} ms "
+                f"(x{ratio:.2f}), req {ancien['requetes']} -> {r['requetes']}{marque}"
+            )
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from immobilier.outbox import envoyer_en_attente
+
+
+class Command(BaseCommand):
+    help = "Envoie les emails en attente de la file (une seule connexion SMTP, nouvelles tentatives espacées)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lot", type=int, default=100, help="Nombre d'emails réservés par lot.")
+        parser.add_argument("--boucle", action="store_true", help="Continue à interroger la file.")
+        parser.add_argument("--intervalle", type=float, default=10, help="Secondes entre deux passages (--boucle).")
+
+    def handle(self, *args, **options):
+        while True:
+            envoyes, echecs = envoyer_en_attente(limite=options["lot"])
+            if envoyes or echecs or not options["boucle"]:
+                self.stdout.write(self.style.SUCCESS(f"{envoyes} email(s) envoyé(s), {echecs} échec(s)."))
+            if not options["boucle"]:
+                break
+            time.sleep(options["intervalle"])
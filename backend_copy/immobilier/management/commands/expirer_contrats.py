@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from immobilier.expiration import expirer_contrats
+
+
+class Command(BaseCommand):
+    help = "Désactive les contrats dont la date de fin est passée et rend leurs biens disponibles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Date de référence (AAAA-MM-JJ), aujourd'hui par défaut.")
+        parser.add_argument("--dry-run", action="store_true", help="Compte sans rien modifier.")
+
+    def handle(self, *args, **options):
+        date_reference = None
+        if options["date"]:
+            try:
+                date_reference = parse_date(options["date"])
+            except ValueError:
+                date_reference = None
+            if date_reference is None:
+                raise CommandError(f"Date invalide : {options['date']}")
+        nb_contrats, nb_biens = expirer_contrats(date_reference, dry_run=options["dry_run"])
+        prefixe = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(
+            self.style.SUCCESS(f"{prefixe}{nb_contrats} contrat(s) expiré(s), {nb_biens} bien(s) rendu(s) disponible(s).")
+        )
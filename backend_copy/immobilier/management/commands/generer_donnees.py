@@ -0,0 +1,201 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from immobilier.cache_pages import invalider_pages
+from immobilier.geo import geocellule, geocoder
+from immobilier.models import BienImmobilier, ContratLocation, Proprietaire, loyer_au_m2
+from immobilier.search import normaliser, reconstruire_index
+from immobilier.stats import reconcilier_stats
+
+
+PRENOMS = ["Aminatou", "Jean", "Brice", "Carine", "Didier", "Estelle", "Fabrice", "Grace", "Hervé", "Inès",
+           "Joseph", "Larissa", "Marcel", "Nadège", "Olivier", "Pauline", "Rodrigue", "Sandrine", "Thierry", "Yvonne"]
+NOMS = ["Mbarga", "Ngono", "Fotso", "Tchatchoua", "Abena", "Ekambi", "Nkoulou", "Kamga", "Biya", "Ndjock",
+        "Essomba", "Manga", "Tagne", "Owona", "Nana", "Djoumessi", "Atangana", "Moukoko", "Talla", "Eto'o"]
+QUARTIERS = ["Bastos", "Akwa", "Bonapriso", "Essos", "Mvog-Ada", "Bonamoussadi", "Omnisport", "Ndokoti",
+             "Biyem-Assi", "Makepe", "Nlongkak", "Deido", "Mimboman", "Logpom", "Tsinga"]
+# Relative weights: most listings are in the two largest cities.
+POIDS_VILLES = {"yaounde": 30, "douala": 30, "bafoussam": 6, "bamenda": 5, "garoua": 4}
+# type -> (surface range m², rent per m² range)
+GABARITS = {
+    "appartement": ((25, 180), (1500, 4000)),
+    "maison": ((60, 400), (1000, 3000)),
+    "terrain": ((200, 2000), (50, 300)),
+    "local_commercial": ((20, 500), (2000, 6000)),
+}
+MOT_DE_PASSE = "bench-password"
+# Standard deviation, in degrees (about 2 km), of the generated positions.
+ECART_GEO = 0.02
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un jeu de données synthétique volumineux (propriétaires, biens répartis sur les "
+        "villes, contrats) par lots bulk_create, puis reconstruit l'index de recherche et les stats."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--proprietaires", type=int, default=100_000)
+        parser.add_argument("--biens", type=int, default=1_000_000)
+        parser.add_argument("--contrats", type=int, default=3_000_000)
+        parser.add_argument(
+            "--utilisateurs", type=int, default=1000,
+            help="Nombre de propriétaires et de locataires ayant un compte (mot de passe : %s)." % MOT_DE_PASSE,
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        debut = time.monotonic()
+        villes = [v for v, _ in BienImmobilier.VILLE_CHOICES]
+        self.villes = villes
+        self.poids_villes = [POIDS_VILLES.get(v, 2) for v in villes]
+
+        # One hash shared by every generated account: hashing per user would dominate the run.
+        self.mot_de_passe = make_password(MOT_DE_PASSE)
+        prefixe = f"bench{int(time.time())}"
+        nb_comptes = min(options["utilisateurs"], options["proprietaires"])
+
+        proprietaires = self._proprietaires(options["proprietaires"], nb_comptes, prefixe)
+        self._log(f"{len(proprietaires)} propriétaires", debut)
+
+        locataires = self._locataires(options["utilisateurs"], prefixe)
+        self._log(f"{len(locataires)} comptes locataires", debut)
+
+        nb_biens, nb_contrats = self._biens_et_contrats(proprietaires, locataires, options["biens"], options["contrats"])
+        self._log(f"{nb_biens} biens, {nb_contrats} contrats", debut)
+
+        # bulk_create skips signals: rebuild the derived tables in one pass each.
+        reconstruire_index(BienImmobilier.objects.all())
+        reconcilier_stats()
+        invalider_pages()
+        for connection in connections.all():
+            if connection.vendor in ("sqlite", "postgresql"):
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+        self._log("index de recherche, statistiques et ANALYZE", debut)
+        self.stdout.write(self.style.SUCCESS(
+            f"Terminé. Comptes : {prefixe}_proprio_<n> / {prefixe}_loc_<n>, mot de passe « {MOT_DE_PASSE} »."
+        ))
+
+    def _log(self, message, debut):
+        self.stdout.write(f"  [{time.monotonic() - debut:7.1f}s] {message}")
+
+    def _nom(self):
+        return f"{self.rng.choice(PRENOMS)} {self.rng.choice(NOMS)}"
+
+    def _proprietaires(self, nombre, nb_comptes, prefixe):
+        users = User.objects.bulk_create(
+            [
+                User(username=f"{prefixe}_proprio_{i}", email=f"{prefixe}_proprio_{i}@example.com", password=self.mot_de_passe)
+                for i in range(nb_comptes)
+            ],
+            batch_size=self.batch_size,
+        )
+        ids = []
+        for debut in range(0, nombre, self.batch_size):
+            lot = []
+            for i in range(debut, min(debut + self.batch_size, nombre)):
+                nom = self._nom()
+                lot.append(Proprietaire(
+                    user=users[i] if i < len(users) else None,
+                    nom_complet=nom,
+                    nom_normalise=normaliser(nom),
+                    email=f"proprio{i}@example.com",
+                    telephone=f"6{self.rng.randint(50000000, 99999999)}",
+                ))
+            ids.extend(p.pk for p in Proprietaire.objects.bulk_create(lot))
+        return ids
+
+    def _locataires(self, nombre, prefixe):
+        users = User.objects.bulk_create(
+            [
+                User(username=f"{prefixe}_loc_{i}", email=f"{prefixe}_loc_{i}@example.com", password=self.mot_de_passe)
+                for i in range(nombre)
+            ],
+            batch_size=self.batch_size,
+        )
+        return [u.email for u in users]
+
+    def _bien(self, proprietaire_id):
+        type_bien = self.rng.choice(list(GABARITS))
+        (s_min, s_max), (p_min, p_max) = GABARITS[type_bien]
+        superficie = self.rng.randint(s_min, s_max)
+        loyer = Decimal(superficie * self.rng.randint(p_min, p_max)).quantize(Decimal("1000"))
+        libelle = dict(BienImmobilier.TYPE_BIEN_CHOICES)[type_bien]
+        quartier = self.rng.choice(QUARTIERS)
+        adresse = f"{self.rng.randint(1, 400)} rue {self.rng.choice(NOMS)}, {quartier}"
+        ville = self.rng.choices(self.villes, self.poids_villes)[0]
+        # Scattered around the geocoded point, a few km wide. bulk_create skips save(), which
+        # derives geocellule, loyer_m2 and titre_normalise: set them here.
+        lat, lon = geocoder(adresse, ville)
+        lat, lon = lat + self.rng.gauss(0, ECART_GEO), lon + self.rng.gauss(0, ECART_GEO)
+        titre = f"{libelle} {superficie} m² {quartier}"
+        return BienImmobilier(
+            titre=titre,
+            titre_normalise=normaliser(titre),
+            adresse=adresse,
+            ville=ville,
+            latitude=lat,
+            longitude=lon,
+            geocellule=geocellule(lat, lon),
+            superficie_m2=superficie,
+            loyer_mensuel=loyer,
+            loyer_m2=loyer_au_m2(loyer, superficie),
+            type_bien=type_bien,
+            proprietaire_id=proprietaire_id,
+            exige_validation_contrat=self.rng.random() < 0.2,
+        )
+
+    def _contrats(self, bien, nombre, locataires):
+        """``nombre`` successive leases; only the most recent one may still run."""
+        contrats = []
+        debut = date.today() - timedelta(days=365 * nombre + self.rng.randint(0, 365))
+        for n in range(nombre):
+            duree = self.rng.choice([180, 365, 730])
+            fin = debut + timedelta(days=duree)
+            email = self.rng.choice(locataires) if locataires and self.rng.random() < 0.5 else ""
+            contrats.append(ContratLocation(
+                bien=bien,
+                locataire_nom=self._nom(),
+                locataire_telephone=f"6{self.rng.randint(50000000, 99999999)}",
+                locataire_email=email,
+                date_debut=debut,
+                date_fin=fin,
+                caution=bien.loyer_mensuel * 2,
+                actif=n == nombre - 1 and fin >= date.today(),
+            ))
+            debut = fin + timedelta(days=self.rng.randint(0, 60))
+        return contrats
+
+    def _biens_et_contrats(self, proprietaires, locataires, nb_biens, nb_contrats):
+        total_contrats = 0
+        for debut in range(0, nb_biens, self.batch_size):
+            taille = min(self.batch_size, nb_biens - debut)
+            biens = [self._bien(self.rng.choice(proprietaires)) for _ in range(taille)]
+            plans = []
+            for i, bien in enumerate(biens, start=debut):
+                # spreads exactly nb_contrats over the biens, as evenly as possible
+                nombre = (i + 1) * nb_contrats // nb_biens - i * nb_contrats // nb_biens
+                total_contrats += nombre
+                plan = self._contrats(bien, nombre, locataires)
+                bien.disponible = not any(c.actif for c in plan)
+                plans.append(plan)
+            with transaction.atomic():
+                BienImmobilier.objects.bulk_create(biens)
+                contrats = [c for plan in plans for c in plan]
+                for c in contrats:
+                    c.bien_id = c.bien.pk
+                ContratLocation.objects.bulk_create(contrats, batch_size=self.batch_size)
+            if (debut // self.batch_size) % 20 == 0:
+                self.stdout.write(f"    {debut + taille} biens...")
+        return nb_biens, total_contrats
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from immobilier.stats import reconcilier_stats
+
+
+class Command(BaseCommand):
+    help = "Recalcule les statistiques du tableau de bord et corrige les écarts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Affiche les écarts sans les corriger.")
+
+    def handle(self, *args, **options):
+        derives = reconcilier_stats(dry_run=options["dry_run"])
+        for cle in derives:
+            self.stdout.write(f"  écart : {cle}")
+        verbe = "détecté(s)" if options["dry_run"] else "corrigé(s)"
+        self.stdout.write(self.style.SUCCESS(f"{len(derives)} écart(s) {verbe}."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from immobilier.models import BienImmobilier
+from immobilier.search import reconstruire_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte des biens."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        total = reconstruire_index(BienImmobilier.objects.all(), batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{total} bien(s) indexé(s)."))
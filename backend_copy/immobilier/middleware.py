@@ -0,0 +1,99 @@
+"""Resolve the current user's Proprietaire once per request.
+
+The owner id is kept in the session together with a per-user token stored in
+the cache. Signal handlers delete that token whenever a Proprietaire is linked,
+unlinked or deleted, so the next request of any session of that user notices
+the mismatch and looks the link up again. Entries also expire after
+``PROPRIETAIRE_SESSION_TTL`` seconds as a safety net for cache evictions.
+
+With a per-process cache the token is only dropped in the worker that saved
+the change, so the session value may lag behind elsewhere: it only drives
+display (menus, dashboard). Permission checks and writes use
+``proprietaire_id_verifie``, which reads the link from the database.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Proprietaire
+
+
+SESSION_CLE = "immobilier_proprietaire"
+
+
+def _cle_jeton(user_id):
+    return f"immobilier:proprietaire_lien:{user_id}"
+
+
+def jeton_lien(user_id):
+    cle = _cle_jeton(user_id)
+    jeton = cache.get(cle)
+    if jeton is None:
+        cache.add(cle, uuid.uuid4().hex, None)
+        jeton = cache.get(cle)
+    return jeton
+
+
+def invalider_lien(*user_ids):
+    cache.delete_many([_cle_jeton(user_id) for user_id in user_ids if user_id is not None])
+
+
+def proprietaire_id_courant(request):
+    """Id of the Proprietaire linked to ``request.user``, or None."""
+    if hasattr(request, "_proprietaire_id"):
+        return request._proprietaire_id
+
+    user = getattr(request, "user", None)
+    proprietaire_id = None
+    if user is not None and user.is_authenticated:
+        session = getattr(request, "session", None)
+        jeton = jeton_lien(user.pk)
+        entree = session.get(SESSION_CLE) if session is not None else None
+        if entree and entree["user"] == user.pk and entree["jeton"] == jeton and entree["expire"] > time.time():
+            proprietaire_id = entree["id"]
+        else:
+            proprietaire_id = Proprietaire.objects.filter(user=user).values_list("pk", flat=True).first()
+            if session is not None:
+                session[SESSION_CLE] = {
+                    "user": user.pk,
+                    "id": proprietaire_id,
+                    "jeton": jeton,
+                    "expire": time.time() + getattr(settings, "PROPRIETAIRE_SESSION_TTL", 300),
+                }
+    request._proprietaire_id = proprietaire_id
+    return proprietaire_id
+
+
+def proprietaire_id_verifie(request):
+    """Id of the Proprietaire linked to ``request.user``, read from the database once per request."""
+    if not hasattr(request, "_proprietaire_id_verifie"):
+        user = getattr(request, "user", None)
+        request._proprietaire_id_verifie = (
+            Proprietaire.objects.filter(user=user).values_list("pk", flat=True).first()
+            if user is not None and user.is_authenticated
+            else None
+        )
+    return request._proprietaire_id_verifie
+
+
+def proprietaire_courant(request):
+    """The Proprietaire instance itself, loaded at most once per request."""
+    if not hasattr(request, "_proprietaire"):
+        proprietaire_id = proprietaire_id_courant(request)
+        request._proprietaire = (
+            Proprietaire.objects.filter(pk=proprietaire_id).first() if proprietaire_id is not None else None
+        )
+    return request._proprietaire
+
+
+class ProprietaireMiddleware:
+    """Exposes ``request.proprietaire_id``; must come after AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.proprietaire_id = proprietaire_id_courant(request)
+        return self.get_response(request)
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immobilier', '0005_remove_bienimmobilier_contrat_fichier_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bienimmobilier',
+            index=models.Index(fields=['cree_le', 'id'], name='bien_cree_le_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contratlocation',
+            index=models.Index(fields=['date_debut', 'id'], name='contrat_debut_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proprietaire',
+            index=models.Index(fields=['nom_complet', 'id'], name='proprio_nom_id_idx'),
+        ),
+    ]
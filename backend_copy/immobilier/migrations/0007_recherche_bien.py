@@ -0,0 +1,107 @@
+import unicodedata
+
+from django.db import migrations, transaction
+
+
+# Frozen copy of the search index layout and helpers at the time of this migration.
+TABLE_RECHERCHE = "immobilier_recherche_bien"
+TABLE_BIENS = "immobilier_bienimmobilier"
+
+
+def _normaliser(texte):
+    texte = unicodedata.normalize("NFKD", texte or "")
+    return "".join(c for c in texte if not unicodedata.combining(c)).lower()
+
+
+def _document(bien):
+    villes = dict(bien._meta.get_field("ville").flatchoices)
+    types = dict(bien._meta.get_field("type_bien").flatchoices)
+    return (
+        _normaliser(bien.titre),
+        _normaliser(bien.adresse),
+        _normaliser(str(villes.get(bien.ville, bien.ville))),
+        _normaliser(str(types.get(bien.type_bien, bien.type_bien))),
+    )
+
+
+def _creer_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE_RECHERCHE} USING fts5("
+                "titre, adresse, ville, type_bien, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLE_RECHERCHE} ("
+                f"bien_id bigint PRIMARY KEY REFERENCES {TABLE_BIENS} (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                "texte text NOT NULL, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TABLE_RECHERCHE}_document_idx "
+                f"ON {TABLE_RECHERCHE} USING gin (document)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TABLE_RECHERCHE}_texte_trgm_idx "
+                f"ON {TABLE_RECHERCHE} USING gin (texte gin_trgm_ops)"
+            )
+
+
+def _supprimer_index(connection):
+    if connection.vendor in ("sqlite", "postgresql"):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE_RECHERCHE}")
+
+
+def _indexer(connection, biens):
+    lignes = [(bien.pk, *_document(bien)) for bien in biens]
+    if not lignes:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {TABLE_RECHERCHE} (rowid, titre, adresse, ville, type_bien) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                lignes,
+            )
+        elif connection.vendor == "postgresql":
+            cursor.executemany(
+                f"INSERT INTO {TABLE_RECHERCHE} (bien_id, texte, document) VALUES ("
+                "%s, concat_ws(' ', %s, %s, %s, %s), "
+                "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'D') || "
+                "setweight(to_tsvector('simple', %s), 'B') || setweight(to_tsvector('simple', %s), 'C')) "
+                "ON CONFLICT (bien_id) DO UPDATE SET texte = EXCLUDED.texte, document = EXCLUDED.document",
+                [(pk, *doc, *doc) for pk, *doc in lignes],
+            )
+
+
+def creer_index_recherche(apps, schema_editor):
+    """Batches of 2000 biens, walked by primary key, in one transaction."""
+    BienImmobilier = apps.get_model("immobilier", "BienImmobilier")
+    connection = schema_editor.connection
+    biens = BienImmobilier.objects.using(connection.alias).only("id", "titre", "adresse", "ville", "type_bien")
+    with transaction.atomic(using=connection.alias):
+        _supprimer_index(connection)
+        _creer_index(connection)
+        dernier = 0
+        while lot := list(biens.filter(pk__gt=dernier).order_by("pk")[:2000]):
+            _indexer(connection, lot)
+            dernier = lot[-1].pk
+
+
+def supprimer_index_recherche(apps, schema_editor):
+    _supprimer_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immobilier', '0006_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index_recherche, supprimer_index_recherche),
+    ]
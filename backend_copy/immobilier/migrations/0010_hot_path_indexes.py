@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immobilier', '0009_emailsortant'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bienimmobilier',
+            index=models.Index(condition=models.Q(('disponible', True)), fields=['-cree_le', '-id'], name='bien_dispo_cree_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bienimmobilier',
+            index=models.Index(fields=['proprietaire', 'disponible'], name='bien_proprio_dispo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contratlocation',
+            index=models.Index(fields=['bien', 'actif'], name='contrat_bien_actif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contratlocation',
+            index=models.Index(condition=models.Q(('actif', True)), fields=['date_fin'], name='contrat_actif_fin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contratlocation',
+            index=models.Index(fields=['locataire_email', '-date_debut'], name='contrat_email_debut_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:32
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immobilier', '0011_modifie_le'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='proprietaire',
+            index=models.Index(django.db.models.functions.text.Lower('nom_complet'), models.F('id'), name='proprio_nom_lower_idx'),
+        ),
+    ]
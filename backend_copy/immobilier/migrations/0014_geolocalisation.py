@@ -0,0 +1,111 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:40
+
+import django.core.validators
+from django.db import migrations, models
+
+
+# Frozen copy of data/gazetteer.csv at the time of this migration, names normalised:
+# (ville, lieu, latitude, longitude), "" being the ville centre.
+LIEUX = (
+    ("yaounde", "", 3.8480, 11.5021),
+    ("yaounde", "bastos", 3.8940, 11.5080),
+    ("yaounde", "biyem-assi", 3.8320, 11.4850),
+    ("yaounde", "essos", 3.8700, 11.5350),
+    ("yaounde", "mimboman", 3.8630, 11.5550),
+    ("yaounde", "mvog-ada", 3.8620, 11.5270),
+    ("yaounde", "mvog-mbi", 3.8530, 11.5200),
+    ("yaounde", "nlongkak", 3.8840, 11.5180),
+    ("yaounde", "omnisport", 3.8830, 11.5400),
+    ("yaounde", "tsinga", 3.8850, 11.4980),
+    ("douala", "", 4.0511, 9.7679),
+    ("douala", "akwa", 4.0469, 9.6960),
+    ("douala", "bonaberi", 4.0730, 9.6650),
+    ("douala", "bonamoussadi", 4.0930, 9.7420),
+    ("douala", "bonanjo", 4.0383, 9.6880),
+    ("douala", "bonapriso", 4.0300, 9.6960),
+    ("douala", "deido", 4.0610, 9.7050),
+    ("douala", "logpom", 4.0830, 9.7800),
+    ("douala", "makepe", 4.0780, 9.7520),
+    ("douala", "ndokoti", 4.0450, 9.7350),
+    ("bafoussam", "", 5.4781, 10.4176),
+    ("bamenda", "", 5.9597, 10.1460),
+    ("garoua", "", 9.3014, 13.3977),
+    ("maroua", "", 10.5910, 14.3159),
+    ("ngaoundere", "", 7.3277, 13.5847),
+    ("bertoua", "", 4.5774, 13.6846),
+    ("ebolowa", "", 2.9000, 11.1500),
+    ("kribi", "", 2.9395, 9.9100),
+    ("limbe", "", 4.0186, 9.2043),
+    ("buea", "", 4.1527, 9.2410),
+    ("kumba", "", 4.6363, 9.4469),
+    ("dschang", "", 5.4440, 10.0530),
+    ("nkongsamba", "", 4.9547, 9.9404),
+    ("edea", "", 3.8000, 10.1333),
+    ("mbalmayo", "", 3.5167, 11.5000),
+    ("sangmelima", "", 2.9333, 11.9833),
+    ("meiganga", "", 6.5167, 14.3000),
+    ("kousseri", "", 12.0769, 15.0306),
+)
+
+
+def _etaler(v):
+    # Frozen copy of geo.geocellule and its helpers at the time of this migration.
+    v = (v | (v << 16)) & 0x0000FFFF0000FFFF
+    v = (v | (v << 8)) & 0x00FF00FF00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F0F0F0F0F
+    v = (v | (v << 2)) & 0x3333333333333333
+    return (v | (v << 1)) & 0x5555555555555555
+
+
+def _quantifier(valeur, borne):
+    cellule = int((valeur + borne) / (2 * borne) * (1 << 20))
+    return min(max(cellule, 0), (1 << 20) - 1)
+
+
+def _geocellule(latitude, longitude):
+    return _etaler(_quantifier(longitude, 180)) | (_etaler(_quantifier(latitude, 90)) << 1)
+
+
+def geocoder_biens(apps, schema_editor):
+    """One UPDATE per gazetteer entry: neighbourhoods named in the address first, then ville centres."""
+    BienImmobilier = apps.get_model("immobilier", "BienImmobilier")
+    biens = BienImmobilier.objects.using(schema_editor.connection.alias).filter(latitude__isnull=True)
+    lieux = {}
+    for ville, nom, lat, lon in LIEUX:
+        lieux.setdefault(ville, []).append((nom, lat, lon))
+    for ville, liste in lieux.items():
+        for nom, lat, lon in sorted(liste, key=lambda lieu: -len(lieu[0])):
+            cibles = biens.filter(ville=ville)
+            if nom:
+                cibles = cibles.filter(adresse__icontains=nom)
+            cibles.update(latitude=lat, longitude=lon, geocellule=_geocellule(lat, lon))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immobilier', '0013_contrat_actif_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bienimmobilier',
+            name='geocellule',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='bienimmobilier',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)]),
+        ),
+        migrations.AddField(
+            model_name='bienimmobilier',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)]),
+        ),
+        migrations.AddIndex(
+            model_name='bienimmobilier',
+            index=models.Index(fields=['geocellule', 'latitude', 'longitude'], name='bien_geocellule_idx'),
+        ),
+        migrations.RunPython(geocoder_biens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immobilier', '0014_geolocalisation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bienimmobilier',
+            index=models.Index(fields=['cree_le', 'id', 'ville', 'type_bien', 'disponible', 'loyer_mensuel', 'superficie_m2'], name='bien_cree_facettes_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='bienimmobilier',
+            name='bien_cree_le_id_idx',
+        ),
+    ]
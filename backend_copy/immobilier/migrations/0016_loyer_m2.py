@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:55
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+
+def _loyer_au_m2(loyer, superficie):
+    # Frozen copy of models.loyer_au_m2 at the time of this migration.
+    return (Decimal(loyer) / max(superficie or 0, 1)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def calculer_loyer_m2(apps, schema_editor):
+    """Batches of 2000 biens, walked by primary key, rounded in Decimal like models.loyer_au_m2."""
+    BienImmobilier = apps.get_model("immobilier", "BienImmobilier")
+    biens = BienImmobilier.objects.using(schema_editor.connection.alias).only("id", "loyer_mensuel", "superficie_m2")
+    dernier = 0
+    while lot := list(biens.filter(pk__gt=dernier).order_by("pk")[:2000]):
+        for bien in lot:
+            bien.loyer_m2 = _loyer_au_m2(bien.loyer_mensuel, bien.superficie_m2)
+        biens.bulk_update(lot, ["loyer_m2"])
+        dernier = lot[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immobilier', '0015_facettes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bienimmobilier',
+            name='loyer_m2',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(calculer_loyer_m2, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='bienimmobilier',
+            index=models.Index(fields=['loyer_mensuel', 'id', 'ville', 'type_bien', 'disponible', 'superficie_m2'], name='bien_loyer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bienimmobilier',
+            index=models.Index(fields=['superficie_m2', 'id', 'ville', 'type_bien', 'disponible', 'loyer_mensuel'], name='bien_superficie_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bienimmobilier',
+            index=models.Index(fields=['loyer_m2', 'id', 'ville', 'type_bien', 'disponible', 'loyer_mensuel', 'superficie_m2'], name='bien_loyer_m2_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+import unicodedata
+
+from django.db import migrations, models
+
+
+def _normaliser(texte):
+    # Frozen copy of search.normaliser at the time of this migration.
+    texte = unicodedata.normalize("NFKD", texte or "")
+    return "".join(c for c in texte if not unicodedata.combining(c)).lower()
+
+
+def remplir_nom_normalise(apps, schema_editor):
+    """Batches of 2000 owners, walked by primary key."""
+    Proprietaire = apps.get_model("immobilier", "Proprietaire")
+    proprietaires = Proprietaire.objects.using(schema_editor.connection.alias).only("id", "nom_complet")
+    dernier = 0
+    while lot := list(proprietaires.filter(pk__gt=dernier).order_by("pk")[:2000]):
+        for proprietaire in lot:
+            proprietaire.nom_normalise = _normaliser(proprietaire.nom_complet)
+        proprietaires.bulk_update(lot, ["nom_normalise"])
+        dernier = lot[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immobilier', '0016_loyer_m2'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proprietaire',
+            name='nom_normalise',
+            field=models.CharField(default='', editable=False, max_length=120),
+        ),
+        migrations.RunPython(remplir_nom_normalise, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='proprietaire',
+            index=models.Index(fields=['nom_normalise', 'id'], name='proprio_nom_norm_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='proprietaire',
+            name='proprio_nom_lower_idx',
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:36
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def _normaliser(texte):
+    # Frozen copy of search.normaliser at the time of this migration.
+    texte = unicodedata.normalize("NFKD", texte or "")
+    return "".join(c for c in texte if not unicodedata.combining(c)).lower()
+
+
+def remplir_titre_normalise(apps, schema_editor):
+    """Batches of 2000 biens, walked by primary key."""
+    BienImmobilier = apps.get_model("immobilier", "BienImmobilier")
+    biens = BienImmobilier.objects.using(schema_editor.connection.alias).only("id", "titre")
+    dernier = 0
+    while lot := list(biens.filter(pk__gt=dernier).order_by("pk")[:2000]):
+        for bien in lot:
+            bien.titre_normalise = _normaliser(bien.titre)
+        biens.bulk_update(lot, ["titre_normalise"])
+        dernier = lot[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immobilier', '0017_proprietaire_nom_normalise'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bienimmobilier',
+            name='titre_normalise',
+            field=models.CharField(default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(remplir_titre_normalise, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='bienimmobilier',
+            index=models.Index(condition=models.Q(('disponible', True)), fields=['proprietaire', 'titre_normalise', 'id'], name='bien_proprio_dispo_titre_idx'),
+        ),
+    ]
@@ -1,19 +1,64 @@
+from decimal import ROUND_HALF_UP, Decimal
+
 from django.db import models
 from django.conf import settings
-from django.core.validators import MinValueValidator
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.utils import timezone
+
+from .geo import geocellule, geocoder
+from .search import normaliser
+
 
+class Horodate(models.Model):
+    """``modifie_le`` changes on every save, even ``save(update_fields=...)``.
 
-class Proprietaire(models.Model):
+    It is the version stamp of the cached list rows ({% cache %} in the
+    *_liste.html templates); set-based updates must set it themselves.
+    """
+    modifie_le = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "modifie_le"}
+        super().save(*args, **kwargs)
+
+
+class Proprietaire(Horodate):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
     nom_complet = models.CharField(max_length=120)
+    # nom_complet lowercased and accent-folded by search.normaliser, for the autocomplete
+    nom_normalise = models.CharField(max_length=120, default="", editable=False)
     email = models.EmailField(blank=True)
     telephone = models.CharField(max_length=20, blank=True)
 
+    class Meta:
+        indexes = [
+            # keyset pagination of proprietaires_liste
+            models.Index(fields=["nom_complet", "id"], name="proprio_nom_id_idx"),
+            # case- and accent-insensitive prefix search of the owner autocomplete
+            models.Index(fields=["nom_normalise", "id"], name="proprio_nom_norm_idx"),
+        ]
+
     def __str__(self):
         return self.nom_complet
 
+    def save(self, *args, **kwargs):
+        self.nom_normalise = normaliser(self.nom_complet)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "nom_complet" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "nom_normalise"}
+        super().save(*args, **kwargs)
+
+
+def loyer_au_m2(loyer, superficie):
+    """Monthly rent per m², to the cent; a bien of 0 m² counts as 1 m²."""
+    return (Decimal(loyer) / max(superficie or 0, 1)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
 
-class BienImmobilier(models.Model):
+class BienImmobilier(Horodate):
     APPARTEMENT = "appartement"
     MAISON = "maison"
     TERRAIN = "terrain"
@@ -71,6 +116,8 @@ class BienImmobilier(models.Model):
     ]
 
     titre = models.CharField(max_length=150)
+    # search.normaliser(titre), kept by save(): the autocomplete reads a prefix of it as an index range
+    titre_normalise = models.CharField(max_length=150, default="", editable=False)
     adresse = models.CharField(max_length=255)
     ville = models.CharField(max_length=100, choices=VILLE_CHOICES)
     superficie_m2 = models.PositiveIntegerField()
@@ -81,12 +128,73 @@ class BienImmobilier(models.Model):
     cree_le = models.DateTimeField(auto_now_add=True)
     # Owners can require contract acceptance; the contract will be prefilled from owner/property data.
     exige_validation_contrat = models.BooleanField(default=False)
+    # WGS84; geocoded from adresse and ville when left empty, see immobilier.geo
+    latitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    geocellule = models.BigIntegerField(null=True, editable=False)
+    # loyer_mensuel / superficie_m2, kept by save() so that sorting on it reads an index
+    loyer_m2 = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # radius and map-area searches (immobilier.geo); covering, so the box test reads no rows
+            models.Index(fields=["geocellule", "latitude", "longitude"], name="bien_geocellule_idx"),
+            # keyset pagination of biens_liste; the facet columns let a filtered page be
+            # checked on the index as it is read in order, and cover the facet counts
+            models.Index(
+                fields=["cree_le", "id", "ville", "type_bien", "disponible", "loyer_mensuel", "superficie_m2"],
+                name="bien_cree_facettes_idx",
+            ),
+            # available listings, newest first; partial so SQLite can match a bare "WHERE disponible"
+            models.Index(fields=["-cree_le", "-id"], condition=models.Q(disponible=True), name="bien_dispo_cree_idx"),
+            # sorts of biens_liste: read in order, the facet columns are checked on the
+            # index, and a range on the sort column itself is an index range
+            models.Index(
+                fields=["loyer_mensuel", "id", "ville", "type_bien", "disponible", "superficie_m2"],
+                name="bien_loyer_idx",
+            ),
+            models.Index(
+                fields=["superficie_m2", "id", "ville", "type_bien", "disponible", "loyer_mensuel"],
+                name="bien_superficie_idx",
+            ),
+            models.Index(
+                fields=["loyer_m2", "id", "ville", "type_bien", "disponible", "loyer_mensuel", "superficie_m2"],
+                name="bien_loyer_m2_idx",
+            ),
+            # owner dashboard and per-owner counters
+            models.Index(fields=["proprietaire", "disponible"], name="bien_proprio_dispo_idx"),
+            # autocomplete of one owner's available biens: a titre prefix, read in order;
+            # partial (like bien_dispo_cree_idx) so SQLite can match a bare "WHERE disponible"
+            models.Index(
+                fields=["proprietaire", "titre_normalise", "id"],
+                condition=models.Q(disponible=True),
+                name="bien_proprio_dispo_titre_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.titre
 
+    def save(self, *args, **kwargs):
+        if self.latitude is None or self.longitude is None:
+            self.latitude, self.longitude = geocoder(self.adresse, self.ville) or (None, None)
+        self.geocellule = geocellule(self.latitude, self.longitude)
+        self.loyer_m2 = loyer_au_m2(self.loyer_mensuel, self.superficie_m2)
+        self.titre_normalise = normaliser(self.titre)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"adresse", "ville", "latitude", "longitude"} & set(update_fields):
+            update_fields = kwargs["update_fields"] = {*update_fields, "latitude", "longitude", "geocellule"}
+        if update_fields is not None and {"loyer_mensuel", "superficie_m2"} & set(update_fields):
+            update_fields = kwargs["update_fields"] = {*update_fields, "loyer_m2"}
+        if update_fields is not None and "titre" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "titre_normalise"}
+        super().save(*args, **kwargs)
+
+
+CONTRAT_ACTIF_EXISTANT = "Ce bien a déjà un contrat actif."
 
-class ContratLocation(models.Model):
+
+class ContratLocation(Horodate):
     bien = models.ForeignKey(BienImmobilier, on_delete=models.CASCADE, related_name="contrats")
     locataire_nom = models.CharField(max_length=120)
     locataire_telephone = models.CharField(max_length=20, blank=True)
@@ -97,8 +205,81 @@ class ContratLocation(models.Model):
     caution = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     actif = models.BooleanField(default=True)
 
+    # Fields whose constraints the caller leaves to the database, which
+    # enforces them on save (see forms.ContratLocationForm).
+    contraintes_en_base = frozenset()
+
     class Meta:
         ordering = ["-date_debut"]
+        indexes = [
+            # keyset pagination of contrats_liste
+            models.Index(fields=["date_debut", "id"], name="contrat_debut_id_idx"),
+            # "does this bien have an active contract" (availability updates)
+            models.Index(fields=["bien", "actif"], name="contrat_bien_actif_idx"),
+            # expirer_contrats only looks at active leases
+            models.Index(fields=["date_fin"], condition=models.Q(actif=True), name="contrat_actif_fin_idx"),
+            # tenant dashboard: own contracts, newest first
+            models.Index(fields=["locataire_email", "-date_debut"], name="contrat_email_debut_idx"),
+        ]
+        constraints = [
+            # At most one active lease per bien, whatever the concurrent submissions.
+            models.UniqueConstraint(
+                fields=["bien"],
+                condition=models.Q(actif=True),
+                name="contrat_actif_unique",
+                violation_error_message=CONTRAT_ACTIF_EXISTANT,
+            ),
+        ]
 
     def __str__(self):
         return f"{self.locataire_nom} - {self.bien.titre}"
+
+    def validate_constraints(self, exclude=None):
+        super().validate_constraints(exclude={*(exclude or ()), *self.contraintes_en_base})
+
+
+class DashboardStats(models.Model):
+    # Scope key, see immobilier.stats: "global", "proprietaire:<id>", "ville:<ville>", ...
+    cle = models.CharField(max_length=150, primary_key=True)
+    ville = models.CharField(max_length=100, blank=True, choices=BienImmobilier.VILLE_CHOICES)
+    nb_proprietaires = models.IntegerField(default=0)
+    nb_biens = models.IntegerField(default=0)
+    nb_biens_disponibles = models.IntegerField(default=0)
+    nb_contrats = models.IntegerField(default=0)
+    nb_contrats_actifs = models.IntegerField(default=0)
+
+    def __str__(self):
+        return self.cle
+
+
+class EmailSortant(models.Model):
+    """Outbox row written in the caller's transaction, delivered by ``envoyer_emails``."""
+
+    STATUT_EN_ATTENTE = "en_attente"
+    STATUT_ENVOYE = "envoye"
+    STATUT_ECHEC = "echec"
+    STATUT_CHOICES = [
+        (STATUT_EN_ATTENTE, "En attente"),
+        (STATUT_ENVOYE, "Envoyé"),
+        (STATUT_ECHEC, "Échec"),
+    ]
+
+    sujet = models.CharField(max_length=255)
+    message = models.TextField()
+    expediteur = models.CharField(max_length=255, blank=True)
+    destinataires = models.JSONField(default=list)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default=STATUT_EN_ATTENTE)
+    tentatives = models.PositiveIntegerField(default=0)
+    prochain_essai = models.DateTimeField(default=timezone.now)
+    derniere_erreur = models.TextField(blank=True)
+    cree_le = models.DateTimeField(auto_now_add=True)
+    envoye_le = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the worker polls pending rows that are due
+            models.Index(fields=["statut", "prochain_essai"], name="email_statut_essai_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.sujet} -> {', '.join(self.destinataires)}"
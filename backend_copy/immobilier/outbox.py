@@ -0,0 +1,107 @@
+"""Transactional email outbox.
+
+``mettre_en_file`` stores the message in ``EmailSortant`` using the caller's
+database transaction, so a rolled-back contract never sends mail and a
+committed one always has its notification recorded. ``envoyer_en_attente``
+drains due rows over one reused mail connection; failures are retried with
+exponential backoff until ``OUTBOX_MAX_TENTATIVES``.
+"""
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import EmailSortant
+
+
+logger = logging.getLogger(__name__)
+
+# A claimed row is hidden from other workers for this long; if the worker dies
+# before recording the outcome, the row simply becomes due again.
+BAIL = timedelta(minutes=5)
+
+
+def mettre_en_file(sujet, message, destinataires, expediteur=None, using="default"):
+    return EmailSortant.objects.using(using).create(
+        sujet=sujet[:255],
+        message=message,
+        expediteur=expediteur or settings.DEFAULT_FROM_EMAIL,
+        destinataires=list(destinataires),
+    )
+
+
+def delai_nouvel_essai(tentatives):
+    """60s, 2min, 4min, ... capped at 6h."""
+    base = getattr(settings, "OUTBOX_DELAI_BASE", 60)
+    return timedelta(seconds=min(base * 2 ** (tentatives - 1), 6 * 3600))
+
+
+def _reserver(limite, maintenant, using):
+    dus = EmailSortant.objects.using(using).filter(
+        statut=EmailSortant.STATUT_EN_ATTENTE, prochain_essai__lte=maintenant
+    ).order_by("prochain_essai", "id")
+    with transaction.atomic(using=using):
+        if connections[using].features.has_select_for_update_skip_locked:
+            dus = dus.select_for_update(skip_locked=True)
+        lot = list(dus[:limite])
+        EmailSortant.objects.using(using).filter(pk__in=[e.pk for e in lot]).update(prochain_essai=maintenant + BAIL)
+    return lot
+
+
+def _noter_echec(email, erreur, maintenant):
+    email.tentatives += 1
+    email.derniere_erreur = str(erreur)[:2000]
+    if email.tentatives >= getattr(settings, "OUTBOX_MAX_TENTATIVES", 8):
+        email.statut = EmailSortant.STATUT_ECHEC
+    email.prochain_essai = maintenant + delai_nouvel_essai(email.tentatives)
+
+
+def envoyer_lot(connexion, limite=100, using="default"):
+    """Send one batch of due emails; returns ``(envoyes, echecs)``."""
+    maintenant = timezone.now()
+    lot = _reserver(limite, maintenant, using)
+    envoyes = echecs = 0
+    for email in lot:
+        message = EmailMessage(
+            email.sujet, email.message, email.expediteur or None, email.destinataires, connection=connexion
+        )
+        try:
+            # An already open connection is reused; send_messages would otherwise close it.
+            connexion.open()
+            connexion.send_messages([message])
+        except Exception as exc:
+            echecs += 1
+            _noter_echec(email, exc, maintenant)
+            logger.warning("Échec d'envoi de l'email %s (tentative %s) : %s", email.pk, email.tentatives, exc)
+            if not isinstance(exc, smtplib.SMTPResponseException | smtplib.SMTPRecipientsRefused):
+                # Connection-level problem: reconnect on the next message.
+                connexion.close()
+        else:
+            envoyes += 1
+            email.statut = EmailSortant.STATUT_ENVOYE
+            email.envoye_le = timezone.now()
+            email.derniere_erreur = ""
+    EmailSortant.objects.using(using).bulk_update(
+        lot, ["statut", "tentatives", "prochain_essai", "derniere_erreur", "envoye_le"]
+    )
+    return envoyes, echecs
+
+
+def envoyer_en_attente(limite=100, connexion=None, using="default"):
+    """Drain every due email, batch by batch, over a single connection."""
+    connexion = connexion or get_connection(fail_silently=False)
+    total_envoyes = total_echecs = 0
+    try:
+        while True:
+            envoyes, echecs = envoyer_lot(connexion, limite=limite, using=using)
+            total_envoyes += envoyes
+            total_echecs += echecs
+            if envoyes + echecs < limite:
+                break
+    finally:
+        connexion.close()
+    return total_envoyes, total_echecs
@@ -0,0 +1,144 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.db import connections
+from django.db.models import Q
+
+
+CURSEUR_SALT = "immobilier.pagination.curseur"
+PLAFOND_TOTAL = 1000
+
+
+class _CurseurSerializer:
+    # Keep full microsecond precision: DjangoJSONEncoder truncates datetimes
+    # to milliseconds, which would skip rows sharing the same second.
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(",", ":")).encode("latin-1")
+
+    def loads(self, data):
+        return json.loads(data.decode("latin-1"))
+
+
+def _encoder_valeur(valeur):
+    if isinstance(valeur, (datetime, date)):
+        return valeur.isoformat()
+    if isinstance(valeur, Decimal):
+        return str(valeur)
+    return valeur
+
+
+def encoder_curseur(valeurs, vers_avant=True):
+    payload = {"v": [_encoder_valeur(v) for v in valeurs], "s": "n" if vers_avant else "p"}
+    return signing.dumps(payload, salt=CURSEUR_SALT, serializer=_CurseurSerializer, compress=True)
+
+
+def decoder_curseur(curseur, nb_champs):
+    """Return ``(valeurs, vers_avant)`` or ``None`` if the token is missing or invalid."""
+    if not curseur:
+        return None
+    try:
+        payload = signing.loads(curseur, salt=CURSEUR_SALT, serializer=_CurseurSerializer)
+        valeurs, sens = payload["v"], payload["s"]
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+    if not isinstance(valeurs, list) or len(valeurs) != nb_champs or sens not in ("n", "p"):
+        return None
+    return valeurs, sens == "n"
+
+
+def _condition_keyset(ordre, valeurs, vers_avant):
+    # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y), per column direction.
+    condition = Q()
+    egalites = {}
+    for champ, valeur in zip(ordre, valeurs):
+        nom = champ.lstrip("-")
+        descendant = champ.startswith("-")
+        operateur = "lt" if descendant == vers_avant else "gt"
+        condition |= Q(**egalites, **{f"{nom}__{operateur}": valeur})
+        egalites[nom] = valeur
+    return condition
+
+
+def _inverser(ordre):
+    return [champ[1:] if champ.startswith("-") else f"-{champ}" for champ in ordre]
+
+
+def estimer_total(queryset, plafond=PLAFOND_TOTAL):
+    """Cheap row count: planner estimate on Postgres, bounded COUNT elsewhere.
+
+    Returns ``(total, exact)``.
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"]), False
+
+    total = queryset[: plafond + 1].count()
+    return min(total, plafond), total <= plafond
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor, total=None, total_exact=True):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.total = total
+        self.total_exact = total_exact
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def paginer_keyset(queryset, ordre, curseur=None, per_page=10, avec_total=False):
+    """Seek pagination over ``ordre`` (e.g. ``["-cree_le", "-id"]``).
+
+    The last column must be unique so that every row has a distinct position.
+    Each page costs one index range scan of ``per_page + 1`` rows, whatever its depth.
+    """
+    ordre = list(ordre)
+    position = decoder_curseur(curseur, len(ordre))
+
+    if avec_total:
+        total, total_exact = estimer_total(queryset)
+    else:
+        total, total_exact = None, True
+
+    vers_avant = True
+    if position:
+        valeurs, vers_avant = position
+        queryset = queryset.filter(_condition_keyset(ordre, valeurs, vers_avant))
+
+    queryset = queryset.order_by(*(ordre if vers_avant else _inverser(ordre)))
+    lignes = list(queryset[: per_page + 1])
+    encore = len(lignes) > per_page
+    lignes = lignes[:per_page]
+
+    if vers_avant:
+        has_next, has_previous = encore, position is not None
+    else:
+        lignes.reverse()
+        has_next, has_previous = True, encore
+
+    def _cle(obj):
+        return [getattr(obj, champ.lstrip("-")) for champ in ordre]
+
+    next_cursor = encoder_curseur(_cle(lignes[-1]), vers_avant=True) if has_next and lignes else None
+    previous_cursor = encoder_curseur(_cle(lignes[0]), vers_avant=False) if has_previous and lignes else None
+
+    return KeysetPage(lignes, has_next, has_previous, next_cursor, previous_cursor, total, total_exact)
@@ -0,0 +1,172 @@
+"""Full-text search over BienImmobilier.
+
+SQLite uses an FTS5 virtual table, Postgres a side table holding a weighted
+``tsvector`` plus a trigram index. Both store accent-folded text (titre,
+adresse, ville label, type label) keyed by the bien id, and are kept in sync
+by the signal handlers in ``signals.py``.
+"""
+import re
+import unicodedata
+
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+TABLE_RECHERCHE = "immobilier_recherche_bien"
+TABLE_BIENS = "immobilier_bienimmobilier"
+
+# Only these fields feed the search document; saves touching other fields skip reindexing.
+CHAMPS_INDEXES = {"titre", "adresse", "ville", "type_bien"}
+
+# Column weights: titre, adresse, ville, type_bien.
+_POIDS_FTS5 = "10.0, 2.0, 5.0, 3.0"
+
+
+def normaliser(texte):
+    """Lowercase and strip accents: ``"Yaoundé"`` -> ``"yaounde"``."""
+    texte = unicodedata.normalize("NFKD", texte or "")
+    return "".join(c for c in texte if not unicodedata.combining(c)).lower()
+
+
+def termes(recherche):
+    return re.findall(r"\w+", normaliser(recherche))
+
+
+def _document(bien):
+    villes = dict(bien._meta.get_field("ville").flatchoices)
+    types = dict(bien._meta.get_field("type_bien").flatchoices)
+    return (
+        normaliser(bien.titre),
+        normaliser(bien.adresse),
+        normaliser(str(villes.get(bien.ville, bien.ville))),
+        normaliser(str(types.get(bien.type_bien, bien.type_bien))),
+    )
+
+
+def creer_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE_RECHERCHE} USING fts5("
+                "titre, adresse, ville, type_bien, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLE_RECHERCHE} ("
+                f"bien_id bigint PRIMARY KEY REFERENCES {TABLE_BIENS} (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                "texte text NOT NULL, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TABLE_RECHERCHE}_document_idx "
+                f"ON {TABLE_RECHERCHE} USING gin (document)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TABLE_RECHERCHE}_texte_trgm_idx "
+                f"ON {TABLE_RECHERCHE} USING gin (texte gin_trgm_ops)"
+            )
+
+
+def supprimer_index(connection):
+    if connection.vendor in ("sqlite", "postgresql"):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE_RECHERCHE}")
+
+
+def indexer_biens(biens, using="default"):
+    connection = connections[using]
+    lignes = [(bien.pk, *_document(bien)) for bien in biens]
+    if not lignes:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {TABLE_RECHERCHE} (rowid, titre, adresse, ville, type_bien) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                lignes,
+            )
+        elif connection.vendor == "postgresql":
+            cursor.executemany(
+                f"INSERT INTO {TABLE_RECHERCHE} (bien_id, texte, document) VALUES ("
+                "%s, concat_ws(' ', %s, %s, %s, %s), "
+                "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'D') || "
+                "setweight(to_tsvector('simple', %s), 'B') || setweight(to_tsvector('simple', %s), 'C')) "
+                "ON CONFLICT (bien_id) DO UPDATE SET texte = EXCLUDED.texte, document = EXCLUDED.document",
+                [(pk, *doc, *doc) for pk, *doc in lignes],
+            )
+
+
+def desindexer_biens(pks, using="default"):
+    connection = connections[using]
+    pks = list(pks)
+    if not pks or connection.vendor not in ("sqlite", "postgresql"):
+        return
+    colonne = "rowid" if connection.vendor == "sqlite" else "bien_id"
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {TABLE_RECHERCHE} WHERE {colonne} = %s", [(pk,) for pk in pks])
+
+
+def reconstruire_index(queryset, batch_size=2000):
+    """Rebuild the whole index from ``queryset`` (management command, bulk imports)."""
+    connection = connections[queryset.db]
+    lot = []
+    total = 0
+    # One transaction: in autocommit mode SQLite would commit every row.
+    with transaction.atomic(using=queryset.db):
+        supprimer_index(connection)
+        creer_index(connection)
+        for bien in queryset.only("id", "titre", "adresse", "ville", "type_bien").iterator(chunk_size=batch_size):
+            lot.append(bien)
+            if len(lot) >= batch_size:
+                indexer_biens(lot, using=queryset.db)
+                total += len(lot)
+                lot = []
+        indexer_biens(lot, using=queryset.db)
+    return total + len(lot)
+
+
+def rechercher_biens(queryset, recherche):
+    """Restrict ``queryset`` to biens matching ``recherche``, annotated with ``pertinence``.
+
+    Higher ``pertinence`` is a better match; callers order on ``-pertinence``.
+    """
+    mots = termes(recherche)
+    if not mots:
+        return queryset.annotate(pertinence=RawSQL("0.0", []))
+
+    vendor = connections[queryset.db].vendor
+    if vendor == "sqlite":
+        expression = " ".join(f'"{mot}"*' for mot in mots)
+        return queryset.extra(
+            tables=[TABLE_RECHERCHE],
+            where=[f"{TABLE_RECHERCHE} MATCH %s", f"{TABLE_RECHERCHE}.rowid = {TABLE_BIENS}.id"],
+            params=[expression],
+        ).annotate(pertinence=RawSQL(f"-bm25({TABLE_RECHERCHE}, {_POIDS_FTS5})", []))
+
+    if vendor == "postgresql":
+        expression = " & ".join(f"{mot}:*" for mot in mots)
+        texte = " ".join(mots)
+        return queryset.extra(
+            tables=[TABLE_RECHERCHE],
+            where=[
+                f"{TABLE_RECHERCHE}.bien_id = {TABLE_BIENS}.id",
+                f"({TABLE_RECHERCHE}.document @@ to_tsquery('simple', %s) OR {TABLE_RECHERCHE}.texte %% %s)",
+            ],
+            params=[expression, texte],
+        ).annotate(
+            pertinence=RawSQL(
+                f"ts_rank({TABLE_RECHERCHE}.document, to_tsquery('simple', %s)) "
+                f"+ similarity({TABLE_RECHERCHE}.texte, %s)",
+                [expression, texte],
+            )
+        )
+
+    # Other backends: unindexed fallback, still matching ville labels.
+    villes = [cle for cle, libelle in queryset.model.VILLE_CHOICES if any(m in normaliser(libelle) for m in mots)]
+    condition = Q(ville__in=villes)
+    for mot in mots:
+        condition |= Q(titre__icontains=mot) | Q(adresse__icontains=mot)
+    return queryset.filter(condition).annotate(pertinence=RawSQL("0.0", []))
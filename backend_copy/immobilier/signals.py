@@ -1,9 +1,161 @@
-from django.db.models.signals import post_save
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.conf import settings
 
-from .models import ContratLocation
+from .models import BienImmobilier, ContratLocation, DashboardStats, Proprietaire
+from .cache_pages import invalider_pages
+from .middleware import invalider_lien
+from .outbox import mettre_en_file
+from .search import CHAMPS_INDEXES, desindexer_biens, indexer_biens
+from .stats import (
+    appliquer_deltas,
+    cle_proprietaire,
+    contributions_bien,
+    contributions_contrat,
+    contributions_proprietaire,
+    difference,
+    filtre_prefixe,
+)
+
+
+@receiver(post_save, sender=BienImmobilier)
+def indexer_bien_recherche(sender, instance, using, update_fields=None, **kwargs):
+    # e.g. save(update_fields=["disponible"]) does not change the search document
+    if update_fields is not None and not CHAMPS_INDEXES.intersection(update_fields):
+        return
+    indexer_biens([instance], using=using)
+
+
+@receiver(post_delete, sender=BienImmobilier)
+def desindexer_bien_recherche(sender, instance, using, **kwargs):
+    desindexer_biens([instance.pk], using=using)
+
+
+# --- Anonymous page cache (cache_pages) -------------------------------------
+
+@receiver(post_save, sender=BienImmobilier)
+@receiver(post_delete, sender=BienImmobilier)
+def invalider_pages_bien(sender, instance, using, **kwargs):
+    invalider_pages(instance.pk, using=using)
+
+
+@receiver(post_save, sender=Proprietaire)
+def invalider_pages_proprietaire(sender, instance, created, using, **kwargs):
+    # Owner name and contacts appear on the pages of each of their biens.
+    if not created:
+        invalider_pages(*instance.biens.using(using).values_list("pk", flat=True), using=using)
+
+
+# --- Dashboard statistics -------------------------------------------------
+# pre_save remembers the row as stored, post_save applies the difference.
+
+CHAMPS_STATS_BIEN = ("proprietaire_id", "ville", "disponible")
+CHAMPS_STATS_CONTRAT = ("bien__proprietaire_id", "actif")
+
+
+def _etat_bien(bien):
+    return bien.proprietaire_id, bien.ville, bien.disponible
+
+
+def _proprietaire_du_contrat(contrat, using):
+    if ContratLocation.bien.is_cached(contrat):
+        return contrat.bien.proprietaire_id
+    return BienImmobilier.objects.using(using).filter(pk=contrat.bien_id).values_list("proprietaire_id", flat=True).first()
+
+
+@receiver(pre_save, sender=BienImmobilier)
+def memoriser_etat_bien(sender, instance, using, update_fields=None, **kwargs):
+    if instance._state.adding:
+        instance._etat_stats = None
+    elif update_fields is not None and not {"proprietaire", "proprietaire_id", "ville", "disponible"}.intersection(update_fields):
+        instance._etat_stats = _etat_bien(instance)
+    else:
+        instance._etat_stats = (
+            BienImmobilier.objects.using(using).filter(pk=instance.pk).values_list(*CHAMPS_STATS_BIEN).first()
+        )
+
+
+@receiver(post_save, sender=BienImmobilier)
+def maj_stats_bien(sender, instance, using, **kwargs):
+    ancien = getattr(instance, "_etat_stats", None)
+    nouveau = _etat_bien(instance)
+    avant = [contributions_bien(*ancien)] if ancien else []
+    apres = [contributions_bien(*nouveau)]
+
+    if ancien and ancien[0] != nouveau[0]:
+        # Reassigned: the bien's contracts now count for the new owner.
+        contrats = instance.contrats.aggregate(n=Count("id"), a=Count("id", filter=Q(actif=True)))
+        if contrats["n"]:
+            avant.append(contributions_contrat(ancien[0], True, contrats["n"], contrats["a"]))
+            apres.append(contributions_contrat(nouveau[0], True, contrats["n"], contrats["a"]))
+
+    appliquer_deltas(difference(apres, avant), using=using)
+    instance._etat_stats = nouveau
+
+
+@receiver(post_delete, sender=BienImmobilier)
+def retirer_stats_bien(sender, instance, using, **kwargs):
+    appliquer_deltas(difference(ancien=[contributions_bien(*_etat_bien(instance))]), using=using)
+
+
+@receiver(pre_save, sender=ContratLocation)
+def memoriser_etat_contrat(sender, instance, using, **kwargs):
+    instance._etat_stats = None
+    if not instance._state.adding:
+        instance._etat_stats = (
+            ContratLocation.objects.using(using).filter(pk=instance.pk).values_list(*CHAMPS_STATS_CONTRAT).first()
+        )
+
+
+@receiver(post_save, sender=ContratLocation)
+def maj_stats_contrat(sender, instance, using, **kwargs):
+    ancien = getattr(instance, "_etat_stats", None)
+    nouveau = (_proprietaire_du_contrat(instance, using), instance.actif)
+    avant = [contributions_contrat(*ancien)] if ancien else []
+    appliquer_deltas(difference([contributions_contrat(*nouveau)], avant), using=using)
+    instance._etat_stats = nouveau
+
+
+@receiver(post_delete, sender=ContratLocation)
+def retirer_stats_contrat(sender, instance, using, **kwargs):
+    proprietaire_id = _proprietaire_du_contrat(instance, using)
+    appliquer_deltas(difference(ancien=[contributions_contrat(proprietaire_id, instance.actif)]), using=using)
+
+
+@receiver(post_save, sender=Proprietaire)
+def maj_stats_proprietaire(sender, instance, created, using, **kwargs):
+    if created:
+        appliquer_deltas(contributions_proprietaire(), using=using)
+
+
+@receiver(post_delete, sender=Proprietaire)
+def retirer_stats_proprietaire(sender, instance, using, **kwargs):
+    appliquer_deltas(difference(ancien=[contributions_proprietaire()]), using=using)
+    cle = cle_proprietaire(instance.pk)
+    DashboardStats.objects.using(using).filter(Q(cle=cle) | filtre_prefixe(f"{cle}:")).delete()
+
+
+# --- Session-cached owner link (middleware.ProprietaireMiddleware) ----------
+
+@receiver(pre_save, sender=Proprietaire)
+def memoriser_user_proprietaire(sender, instance, using, **kwargs):
+    instance._ancien_user_id = None
+    if not instance._state.adding:
+        instance._ancien_user_id = (
+            Proprietaire.objects.using(using).filter(pk=instance.pk).values_list('user_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Proprietaire)
+def invalider_lien_proprietaire(sender, instance, created, **kwargs):
+    ancien = getattr(instance, '_ancien_user_id', None)
+    if created or ancien != instance.user_id:
+        invalider_lien(ancien, instance.user_id)
+
+
+@receiver(post_delete, sender=Proprietaire)
+def invalider_lien_proprietaire_supprime(sender, instance, **kwargs):
+    invalider_lien(instance.user_id)
 
 
 @receiver(post_save, sender=ContratLocation)
@@ -40,4 +192,5 @@ def notify_owner_on_contract_created(sender, instance, created, **kwargs):
         "Connectez-vous au tableau de bord pour consulter et gérer la demande.\n"
     )
 
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [owner_email], fail_silently=True)
+    # Queued in the contract's transaction; delivered by the envoyer_emails command.
+    mettre_en_file(subject, message, [owner_email], using=kwargs.get('using', 'default'))
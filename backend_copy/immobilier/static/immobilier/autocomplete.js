@@ -0,0 +1,68 @@
+// Lazy choices for <select data-autocomplete-url> (immobilier.autocomplete.AutocompleteSelect):
+// a search box above the select queries the endpoint as the user types and
+// replaces the options; data-autocomplete-depend names a field of the same
+// form whose value is sent along and whose changes reset the select.
+(function () {
+    function brancher(select) {
+        const form = select.form;
+        const dependance = select.dataset.autocompleteDepend
+            ? form.elements.namedItem(select.dataset.autocompleteDepend)
+            : null;
+        const recherche = document.createElement('input');
+        recherche.type = 'search';
+        recherche.placeholder = 'Rechercher…';
+        recherche.autocomplete = 'off';
+        select.parentNode.insertBefore(recherche, select);
+
+        let minuteur = null;
+        let controleur = null;
+
+        function charger() {
+            const url = new URL(select.dataset.autocompleteUrl, window.location.href);
+            url.searchParams.set('q', recherche.value.trim());
+            if (dependance) {
+                if (!dependance.value) {
+                    remplir([]);
+                    return;
+                }
+                url.searchParams.set(dependance.name, dependance.value);
+            }
+            if (controleur) controleur.abort();
+            controleur = new AbortController();
+            fetch(url, { signal: controleur.signal, headers: { 'Accept': 'application/json' } })
+                .then(function (reponse) { return reponse.json(); })
+                .then(function (donnees) { remplir(donnees.results); })
+                .catch(function () {});
+        }
+
+        function remplir(resultats) {
+            const courante = select.selectedOptions[0];
+            const garder = courante && courante.value ? courante : null;
+            select.replaceChildren(new Option('---------', ''));
+            if (garder) select.add(garder);
+            resultats.forEach(function (r) {
+                if (!garder || String(r.id) !== garder.value) select.add(new Option(r.text, r.id));
+            });
+            if (garder) select.value = garder.value;
+        }
+
+        recherche.addEventListener('input', function () {
+            clearTimeout(minuteur);
+            minuteur = setTimeout(charger, 200);
+        });
+        select.addEventListener('focus', function () {
+            if (select.options.length <= 2) charger();
+        }, { once: true });
+        if (dependance) {
+            dependance.addEventListener('change', function () {
+                select.value = '';
+                recherche.value = '';
+                charger();
+            });
+        }
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('select[data-autocomplete-url]').forEach(brancher);
+    });
+})();
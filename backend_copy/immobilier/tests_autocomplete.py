@@ -0,0 +1,97 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import ContratLocation, Proprietaire
+from .tests_explain import balayages_complets, plan
+from .tests_utils import creer_bien
+
+
+class AutocompleteTest(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        self.awa = Proprietaire.objects.create(nom_complet='Awa Ngono')
+        self.paul = Proprietaire.objects.create(nom_complet='paul Biya')
+        Proprietaire.objects.bulk_create(Proprietaire(nom_complet=f'Zoé {i:03d}') for i in range(60))
+        self.studio = creer_bien(self.awa, 'Studio Bastos')
+        self.villa = creer_bien(self.awa, 'Villa')
+        creer_bien(self.awa, 'Studio loué', disponible=False)
+        creer_bien(self.paul, 'Studio Akwa')
+
+    def _textes(self, url, **params):
+        return [r['text'] for r in self.client.get(url, params).json()['results']]
+
+    def test_owner_prefix_search(self):
+        url = reverse('autocomplete_proprietaires')
+        self.assertEqual(self._textes(url, q='AWA'), ['Awa Ngono'])
+        self.assertEqual(self._textes(url, q='Pa'), ['paul Biya'])
+        self.assertEqual(len(self._textes(url)), 20)
+        self.assertEqual(self._textes(url, q='ngono'), [])
+        # Accents and non-ASCII case fold on both sides.
+        Proprietaire.objects.create(nom_complet='Émile Ékambi')
+        self.assertEqual(self._textes(url, q='ém'), ['Émile Ékambi'])
+        self.assertEqual(self._textes(url, q='EMILE'), ['Émile Ékambi'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, {'q': 'aw'})
+        self.assertEqual(balayages_complets(ctx.captured_queries), [])
+
+    def test_available_biens_of_one_owner(self):
+        url = reverse('autocomplete_biens')
+        self.assertEqual(self._textes(url, proprietaire=self.awa.pk), ['Studio Bastos', 'Villa'])
+        self.assertEqual(self._textes(url, proprietaire=self.awa.pk, q='stu'), ['Studio Bastos'])
+        creer_bien(self.awa, 'Élégant T2')
+        self.assertEqual(self._textes(url, proprietaire=self.awa.pk, q='éL'), ['Élégant T2'])
+        self.assertEqual(self._textes(url, proprietaire='x'), [])
+        # A renamed bien is found under its new title.
+        self.villa.titre = 'Ëden'
+        self.villa.save(update_fields=['titre'])
+        self.assertEqual(self._textes(url, proprietaire=self.awa.pk, q='ed'), ['Ëden'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, {'proprietaire': self.awa.pk, 'q': 'stu'})
+        self.assertEqual(balayages_complets(ctx.captured_queries), [])
+        requete, = [q['sql'] for q in ctx.captured_queries if 'titre_normalise' in q['sql']]
+        self.assertIn('bien_proprio_dispo_titre_idx', ' '.join(plan(requete)))
+
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_forms_render_only_the_selected_choice(self):
+        contrat = ContratLocation.objects.create(
+            bien=self.studio, locataire_nom='L', date_debut='2026-01-01', date_fin='2026-12-31', caution='1'
+        )
+        url = reverse('contrats_modifier', args=[contrat.pk])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            html = self.client.get(url).content.decode()
+        self.assertIn('data-autocomplete-url="/autocomplete/biens/"', html)
+        self.assertIn('<option value="%d" selected>Studio Bastos</option>' % self.studio.pk, html)
+        self.assertNotIn('Villa', html)
+        self.assertNotIn('Zoé', html)
+        self.assertIn('immobilier/autocomplete.js', html)
+        requetes = len(ctx)
+
+        Proprietaire.objects.bulk_create(Proprietaire(nom_complet=f'Yves {i}') for i in range(100))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        self.assertEqual(len(ctx), requetes)
+
+        html = self.client.get(reverse('biens_modifier', args=[self.villa.pk])).content.decode()
+        self.assertIn('<option value="%d" selected>Awa Ngono</option>' % self.awa.pk, html)
+        self.assertNotIn('paul Biya', html)
+
+    def test_submitted_choices_are_still_validated(self):
+        resp = self.client.post(reverse('contrats_ajouter'), {
+            'proprietaire': self.paul.pk,
+            'bien': self.studio.pk,
+            'locataire_nom': 'L',
+            'date_debut': '2026-01-01',
+            'date_fin': '2026-12-31',
+            'caution': '1',
+        })
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('bien', resp.context['form'].errors)
+        self.assertFalse(ContratLocation.objects.exists())
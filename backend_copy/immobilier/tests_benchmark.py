@@ -0,0 +1,41 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .models import BienImmobilier, ContratLocation, DashboardStats, Proprietaire
+from .stats import reconcilier_stats
+
+
+class DonneesSynthetiquesTest(TestCase):
+    def test_seed_then_benchmark(self):
+        call_command(
+            'generer_donnees', '--proprietaires', '20', '--biens', '200', '--contrats', '500',
+            '--utilisateurs', '5', '--batch-size', '50', stdout=StringIO(),
+        )
+        self.assertEqual(Proprietaire.objects.count(), 20)
+        self.assertEqual(BienImmobilier.objects.count(), 200)
+        self.assertEqual(ContratLocation.objects.count(), 500)
+        self.assertGreater(BienImmobilier.objects.values('ville').distinct().count(), 1)
+        # derived tables were rebuilt after the bulk inserts
+        self.assertTrue(DashboardStats.objects.exists())
+        self.assertEqual(reconcilier_stats(dry_run=True), [])
+
+        with tempfile.TemporaryDirectory() as dossier:
+            sortie = os.path.join(dossier, 'resultats.json')
+            call_command(
+                'benchmark_vues', '--iterations', '2', '--route', 'biens_liste', '--route', 'dashboard',
+                '--sortie', sortie, stdout=StringIO(),
+            )
+            with open(sortie, encoding='utf-8') as f:
+                rapport = json.load(f)
+        self.assertEqual(rapport['meta']['volumes']['biens'], 200)
+        routes = {(r['route'], r['role']) for r in rapport['resultats']}
+        self.assertIn(('biens_liste', 'locataire'), routes)
+        self.assertIn(('dashboard', 'proprietaire'), routes)
+        for r in rapport['resultats']:
+            self.assertLessEqual(r['p50_ms'], r['p99_ms'])
+            self.assertIn(r['status'], (200, 302))
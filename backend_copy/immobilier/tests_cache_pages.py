@@ -0,0 +1,100 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .expiration import expirer_contrats
+from .models import ContratLocation, Proprietaire
+from .tests_utils import creer_bien
+
+
+class CachePagesAnonymesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.proprietaire = Proprietaire.objects.create(nom_complet='Owner', telephone='600000000')
+        self.bien = creer_bien(self.proprietaire, 'Villa')
+        self.autre = creer_bien(self.proprietaire, 'Studio')
+
+    def _get(self, url, requetes_max=None):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        if requetes_max is not None:
+            self.assertLessEqual(len(ctx), requetes_max, [q['sql'] for q in ctx.captured_queries])
+        return resp.content.decode()
+
+    def test_second_hit_runs_no_query(self):
+        liste = reverse('biens_liste')
+        detail = reverse('biens_detail', args=[self.bien.pk])
+        self.assertIn('Villa', self._get(liste))
+        self.assertIn('Villa', self._get(detail))
+        self.assertIn('Villa', self._get(liste, requetes_max=0))
+        self.assertIn('Villa', self._get(detail, requetes_max=0))
+        # the query string is part of the key
+        self.assertNotIn('Studio', self._get(liste + '?q=villa'))
+
+    def test_saves_and_deletes_bump_the_versions(self):
+        liste = reverse('biens_liste')
+        detail = reverse('biens_detail', args=[self.bien.pk])
+        detail_autre = reverse('biens_detail', args=[self.autre.pk])
+        for url in (liste, detail, detail_autre):
+            self._get(url)
+
+        self.bien.titre = 'Villa rénovée'
+        self.bien.save()
+        self.assertIn('Villa rénovée', self._get(liste))
+        self.assertIn('Villa rénovée', self._get(detail))
+        # other biens keep their cached detail page
+        self._get(detail_autre, requetes_max=0)
+
+        self.proprietaire.telephone = '699999999'
+        self.proprietaire.save()
+        self.assertIn('699999999', self._get(detail_autre))
+
+        self.autre.delete()
+        self.assertNotIn('Studio', self._get(liste))
+
+    def test_expiration_retires_freed_biens(self):
+        ContratLocation.objects.create(
+            bien=self.bien, locataire_nom='L', date_debut=date(2025, 1, 1), date_fin=date(2025, 12, 31), caution='1'
+        )
+        self.bien.disponible = False
+        self.bien.save()
+        detail = reverse('biens_detail', args=[self.bien.pk])
+        detail_autre = reverse('biens_detail', args=[self.autre.pk])
+        self.assertIn('Non', self._get(detail))
+        self._get(detail_autre)
+
+        expirer_contrats(date(2026, 1, 1))
+        self.assertIn('<strong>Disponible :</strong> Oui', self._get(detail))
+        # A small sweep leaves the other detail pages cached.
+        self._get(detail_autre, requetes_max=0)
+
+    def test_large_expiry_retires_every_detail_page_at_once(self):
+        ContratLocation.objects.create(
+            bien=self.bien, locataire_nom='L', date_debut=date(2025, 1, 1), date_fin=date(2025, 12, 31), caution='1'
+        )
+        self.bien.disponible = False
+        self.bien.save()
+        liste, detail = reverse('biens_liste'), reverse('biens_detail', args=[self.bien.pk])
+        self._get(liste)
+        self._get(detail)
+
+        with CaptureQueriesContext(connection) as ctx:
+            expirer_contrats(date(2026, 1, 1), invalides_max=0)
+        self.assertFalse(any('"id" FROM "immobilier_bienimmobilier"' in q['sql'] for q in ctx.captured_queries))
+        for url in (liste, detail):
+            with CaptureQueriesContext(connection) as ctx:
+                page = self._get(url)
+            self.assertTrue(ctx.captured_queries, url)
+        self.assertIn('<strong>Disponible :</strong> Oui', page)
+
+    def test_authenticated_users_bypass_the_cache(self):
+        url = reverse('biens_detail', args=[self.bien.pk])
+        self._get(url)
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        self.assertIn('Modifier', self._get(url))
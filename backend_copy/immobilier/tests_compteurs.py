@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import BienImmobilier, Proprietaire
+
+
+class CompteursProprietairesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('agent', 'agent@example.com', 'Password123!')
+        self.client.force_login(self.user)
+
+    def _creer_proprietaire(self, nom, disponibles, loues):
+        proprietaire = Proprietaire.objects.create(nom_complet=nom)
+        for i in range(disponibles + loues):
+            BienImmobilier.objects.create(
+                titre=f'{nom} {i}',
+                adresse='Rue',
+                ville='douala',
+                superficie_m2=30,
+                loyer_mensuel='1000.00',
+                type_bien='appartement',
+                proprietaire=proprietaire,
+                disponible=i < disponibles,
+            )
+        return proprietaire
+
+    def _nb_requetes(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('proprietaires_liste'))
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries), resp
+
+    def test_counts_are_annotated(self):
+        self._creer_proprietaire('Alice', 2, 1)
+        self._creer_proprietaire('Bob', 0, 0)
+        _, resp = self._nb_requetes()
+        lignes = {p.nom_complet: (p.nb_biens, p.nb_biens_disponibles, p.nb_biens_loues) for p in resp.context['proprietaires']}
+        self.assertEqual(lignes, {'Alice': (3, 2, 1), 'Bob': (0, 0, 0)})
+
+    def test_query_count_independent_of_rows(self):
+        self._creer_proprietaire('Owner 0', 1, 1)
+        self._nb_requetes()  # first request stores the owner link in the session
+        avant, _ = self._nb_requetes()
+        for i in range(1, 8):
+            self._creer_proprietaire(f'Owner {i}', 1, 1)
+        apres, _ = self._nb_requetes()
+        self.assertEqual(avant, apres)
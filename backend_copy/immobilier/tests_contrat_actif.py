@@ -0,0 +1,74 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import BienImmobilier, ContratLocation, Proprietaire
+from .stats import reconcilier_stats
+from .tests_utils import creer_bien
+
+
+class ContratActifUniqueTest(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        self.proprietaire = Proprietaire.objects.create(nom_complet='Owner')
+        self.bien = creer_bien(self.proprietaire, 'Studio')
+
+    def _poster(self, url, **valeurs):
+        donnees = {
+            'proprietaire': self.proprietaire.pk,
+            'bien': self.bien.pk,
+            'locataire_nom': 'Loc',
+            'date_debut': '2026-01-01',
+            'date_fin': '2026-12-31',
+            'caution': '0',
+            'actif': 'on',
+        }
+        donnees.update(valeurs)
+        return self.client.post(url, {k: v for k, v in donnees.items() if v is not None})
+
+    def test_database_rejects_a_second_active_contract(self):
+        valeurs = {'bien': self.bien, 'locataire_nom': 'A', 'date_debut': date(2026, 1, 1), 'date_fin': date(2026, 12, 31), 'caution': 0}
+        ContratLocation.objects.create(**valeurs)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ContratLocation.objects.create(**valeurs)
+        ContratLocation.objects.create(**valeurs, actif=False)
+
+    def test_write_path_relies_on_the_constraint(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self._poster(reverse('contrats_ajouter'))
+        self.assertEqual(resp.status_code, 302)
+        self.bien.refresh_from_db()
+        self.assertFalse(self.bien.disponible)
+        lectures = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT') and 'contratlocation' in q['sql']]
+        self.assertEqual(lectures, [])
+
+        # A concurrent submission that passed validation before the first commit.
+        BienImmobilier.objects.filter(pk=self.bien.pk).update(disponible=True)
+        resp = self._poster(reverse('contrats_ajouter'), locataire_nom='Concurrent')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['form'].errors['actif'], ['Ce bien a déjà un contrat actif.'])
+        self.assertEqual(ContratLocation.objects.count(), 1)
+
+    def test_availability_follows_the_active_contract(self):
+        self._poster(reverse('contrats_ajouter'))
+        contrat = ContratLocation.objects.get()
+        autre = creer_bien(self.proprietaire, 'Villa')
+
+        self._poster(reverse('contrats_modifier', args=[contrat.pk]), bien=autre.pk)
+        self.bien.refresh_from_db()
+        autre.refresh_from_db()
+        self.assertEqual((self.bien.disponible, autre.disponible), (True, False))
+
+        self._poster(reverse('contrats_modifier', args=[contrat.pk]), bien=autre.pk, actif=None)
+        autre.refresh_from_db()
+        self.assertTrue(autre.disponible)
+
+        self._poster(reverse('contrats_modifier', args=[contrat.pk]), bien=autre.pk)
+        self.client.post(reverse('contrats_supprimer', args=[contrat.pk]))
+        autre.refresh_from_db()
+        self.assertTrue(autre.disponible)
+        self.assertEqual(reconcilier_stats(dry_run=True), [])
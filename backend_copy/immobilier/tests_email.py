@@ -1,44 +1,168 @@
+import socketserver
+import threading
+from datetime import date
+
 from django.test import TestCase, override_settings
 from django.core import mail
+from django.core.mail import get_connection
 from django.contrib.auth.models import User
-from datetime import date
+from django.db import transaction
+
+from .models import BienImmobilier, ContratLocation, EmailSortant, Proprietaire
+from .outbox import envoyer_en_attente, mettre_en_file
+
+
+class _SessionSMTP(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib; recipients at @refuse.local are rejected."""
+
+    def repondre(self, ligne):
+        self.wfile.write(f"{ligne}\r\n".encode())
+
+    def handle(self):
+        serveur = self.server
+        serveur.connexions += 1
+        self.repondre("220 stand-in")
+        destinataires = []
+        while True:
+            ligne = self.rfile.readline().decode().strip()
+            commande = ligne[:4].upper()
+            if not ligne or commande == "QUIT":
+                self.repondre("221 bye")
+                return
+            if commande in ("EHLO", "HELO"):
+                self.repondre("250 stand-in")
+            elif commande == "RCPT":
+                if "@refuse.local" in ligne:
+                    self.repondre("550 no such user")
+                else:
+                    destinataires.append(ligne)
+                    self.repondre("250 ok")
+            elif commande == "DATA":
+                self.repondre("354 go ahead")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                serveur.messages += 1
+                destinataires = []
+                self.repondre("250 queued")
+            else:  # MAIL, RSET, NOOP
+                self.repondre("250 ok")
 
-from .models import Proprietaire, BienImmobilier, ContratLocation
+
+class _ServeurSMTP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SessionSMTP)
+        self.connexions = 0
+        self.messages = 0
+
+
+def _creer_bien(email='owner@test.local'):
+    user = User.objects.create(username=f'owner_{email}', email=email)
+    p = Proprietaire.objects.create(user=user, nom_complet='Owner Test', email=email)
+    return BienImmobilier.objects.create(
+        titre='Test Bien',
+        adresse='Rue Test',
+        ville='yaounde',
+        superficie_m2=30,
+        loyer_mensuel='200.00',
+        type_bien='appartement',
+        proprietaire=p,
+        exige_validation_contrat=True,
+    )
+
+
+def _creer_contrat(bien):
+    return ContratLocation.objects.create(
+        bien=bien,
+        locataire_nom='Test Loc',
+        locataire_telephone='000',
+        locataire_email='loc@test.local',
+        locataire_info='Info',
+        date_debut=date(2026, 3, 1),
+        date_fin=date(2026, 3, 10),
+        caution='100.00',
+    )
 
 
 @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
 class EmailNotificationTest(TestCase):
-    def test_email_sent_on_contrat_creation(self):
-        user = User.objects.create(username='owner_test', email='owner@test.local')
-        p = Proprietaire.objects.create(user=user, nom_complet='Owner Test', email='owner@test.local')
-
-        b = BienImmobilier.objects.create(
-            titre='Test Bien',
-            adresse='Rue Test',
-            ville='yaounde',
-            superficie_m2=30,
-            loyer_mensuel='200.00',
-            type_bien='appartement',
-            proprietaire=p,
-            exige_validation_contrat=True,
-        )
-
-        # Ensure outbox is empty
+    def test_email_queued_on_contrat_creation_then_sent(self):
+        b = _creer_bien()
         mail.outbox.clear()
 
-        ContratLocation.objects.create(
-            bien=b,
-            locataire_nom='Test Loc',
-            locataire_telephone='000',
-            locataire_email='loc@test.local',
-            locataire_info='Info',
-            date_debut=date(2026, 3, 1),
-            date_fin=date(2026, 3, 10),
-            caution='100.00',
-        )
+        _creer_contrat(b)
 
-        # The signal should have sent an email
+        # Nothing is sent inside the request; the notification waits in the outbox
+        self.assertEqual(len(mail.outbox), 0)
+        queued = EmailSortant.objects.get()
+        self.assertEqual(queued.destinataires, ['owner@test.local'])
+
+        self.assertEqual(envoyer_en_attente(), (1, 0))
         self.assertEqual(len(mail.outbox), 1)
         sent = mail.outbox[0]
         self.assertIn("Nouvelle demande de location", sent.subject)
-        self.assertIn('Test Loc', sent.body)
\ No newline at end of file
+        self.assertIn('Test Loc', sent.body)
+        queued.refresh_from_db()
+        self.assertEqual(queued.statut, EmailSortant.STATUT_ENVOYE)
+        self.assertIsNotNone(queued.envoye_le)
+
+    def test_rolled_back_contract_leaves_no_email(self):
+        b = _creer_bien()
+        try:
+            with transaction.atomic():
+                _creer_contrat(b)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(EmailSortant.objects.exists())
+
+
+class SMTPOutboxTest(TestCase):
+    def setUp(self):
+        self.serveur = _ServeurSMTP()
+        threading.Thread(target=self.serveur.serve_forever, daemon=True).start()
+        self.addCleanup(self.serveur.server_close)
+        self.addCleanup(self.serveur.shutdown)
+
+    def _connexion(self):
+        return get_connection(
+            'django.core.mail.backends.smtp.EmailBackend',
+            host='127.0.0.1',
+            port=self.serveur.server_address[1],
+            use_tls=False,
+            use_ssl=False,
+            username='',
+            password='',
+            timeout=5,
+        )
+
+    def test_batch_uses_a_single_connection(self):
+        for i in range(5):
+            mettre_en_file(f'Sujet {i}', 'Corps', [f'dest{i}@test.local'])
+
+        self.assertEqual(envoyer_en_attente(limite=2, connexion=self._connexion()), (5, 0))
+        self.assertEqual(self.serveur.messages, 5)
+        self.assertEqual(self.serveur.connexions, 1)
+        self.assertEqual(EmailSortant.objects.filter(statut=EmailSortant.STATUT_ENVOYE).count(), 5)
+
+    @override_settings(OUTBOX_MAX_TENTATIVES=2)
+    def test_refused_recipient_is_retried_with_backoff_then_failed(self):
+        email = mettre_en_file('Sujet', 'Corps', ['x@refuse.local'])
+        mettre_en_file('Sujet', 'Corps', ['ok@test.local'])
+
+        self.assertEqual(envoyer_en_attente(connexion=self._connexion()), (1, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.statut, EmailSortant.STATUT_EN_ATTENTE)
+        self.assertEqual(email.tentatives, 1)
+        self.assertGreater(email.prochain_essai, email.cree_le)
+        self.assertTrue(email.derniere_erreur)
+
+        # Not due yet: the next pass leaves it alone
+        self.assertEqual(envoyer_en_attente(connexion=self._connexion()), (0, 0))
+
+        EmailSortant.objects.filter(pk=email.pk).update(prochain_essai=email.cree_le)
+        self.assertEqual(envoyer_en_attente(connexion=self._connexion()), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.statut, EmailSortant.STATUT_ECHEC)
@@ -0,0 +1,48 @@
+from datetime import date
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .expiration import expirer_contrats
+from .models import BienImmobilier, ContratLocation, Proprietaire
+from .stats import cle_ville, lire_stats, reconcilier_stats
+from .tests_utils import creer_bien
+
+
+class ExpirationContratsTest(TestCase):
+    def setUp(self):
+        self.proprietaire = Proprietaire.objects.create(nom_complet='Owner')
+        self.expire = self._bien_loue(date(2025, 12, 31))
+        self.en_cours = self._bien_loue(date(2026, 12, 31))
+        # an old lease, already closed, and a running one: stays unavailable
+        self.mixte = self._bien_loue(date(2026, 12, 31))
+        self._contrat(self.mixte, date(2024, 12, 31), actif=False)
+
+    def _bien_loue(self, date_fin):
+        bien = creer_bien(self.proprietaire, disponible=False)
+        self._contrat(bien, date_fin)
+        return bien
+
+    def _contrat(self, bien, date_fin, actif=True):
+        return ContratLocation.objects.create(
+            bien=bien, locataire_nom='Loc', date_debut=date(2025, 1, 1), date_fin=date_fin, caution='0', actif=actif
+        )
+
+    def test_expired_contracts_are_deactivated_in_bulk(self):
+        self.assertEqual(expirer_contrats(date(2026, 3, 1)), (1, 1))
+
+        self.assertEqual(ContratLocation.objects.filter(actif=True).count(), 2)
+        disponibles = set(BienImmobilier.objects.filter(disponible=True).values_list('pk', flat=True))
+        self.assertEqual(disponibles, {self.expire.pk})
+        self.assertEqual(reconcilier_stats(dry_run=True), [])
+        self.assertEqual(lire_stats(cle_ville('douala')).nb_biens_disponibles, 1)
+
+        self.assertEqual(expirer_contrats(date(2026, 3, 1)), (0, 0))
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command('expirer_contrats', '--date', '2026-03-01', '--dry-run', stdout=out)
+        self.assertIn('1 contrat(s)', out.getvalue())
+        self.assertEqual(ContratLocation.objects.filter(actif=True).count(), 3)
+        self.assertFalse(BienImmobilier.objects.filter(disponible=True).exists())
@@ -0,0 +1,94 @@
+import re
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import BienImmobilier, ContratLocation, Proprietaire
+
+
+# A table read without any index: "SCAN t" on SQLite (not "SCAN t USING INDEX"),
+# "Seq Scan on t" on Postgres (planned with enable_seqscan off, so it only
+# remains when no index can serve the query at all).
+_SCAN_SQLITE = re.compile(r'^SCAN (immobilier_\w+)$')
+_SCAN_POSTGRES = re.compile(r'Seq Scan on (immobilier_\w+)')
+
+
+def plan(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            with transaction.atomic():
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql)
+                return [row[0] for row in cursor.fetchall()]
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def balayages_complets(queries):
+    """(table, sql) for every captured SELECT whose plan reads a whole app table."""
+    motif = _SCAN_POSTGRES if connection.vendor == 'postgresql' else _SCAN_SQLITE
+    trouves = []
+    for query in queries:
+        sql = query['sql']
+        if not sql.startswith('SELECT'):
+            continue
+        for ligne in plan(sql):
+            m = motif.search(ligne.strip())
+            if m:
+                trouves.append((m.group(1), sql))
+    return trouves
+
+
+class ExplainPlansTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', password='x', email='owner@test.local')
+        self.tenant = User.objects.create_user('tenant', password='x', email='tenant@test.local')
+        self.proprietaire = Proprietaire.objects.create(user=self.owner, nom_complet='Owner')
+        self.bien = BienImmobilier.objects.create(
+            titre='Bien',
+            adresse='Rue',
+            ville='douala',
+            superficie_m2=40,
+            loyer_mensuel='1000.00',
+            type_bien='appartement',
+            proprietaire=self.proprietaire,
+        )
+        self.contrat = ContratLocation.objects.create(
+            bien=self.bien,
+            locataire_nom='Tenant',
+            locataire_email='tenant@test.local',
+            date_debut=date(2026, 1, 1),
+            date_fin=date(2026, 12, 31),
+            caution='0',
+        )
+
+    def _verifier(self, user, urls):
+        self.client.force_login(user)
+        for url in urls:
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200, url)
+            self.assertEqual(balayages_complets(ctx.captured_queries), [], url)
+
+    def test_owner_pages_use_indexes(self):
+        self._verifier(self.owner, [
+            reverse('dashboard'),
+            reverse('biens_liste'),
+            reverse('biens_liste') + '?q=bien',
+            reverse('biens_detail', args=[self.bien.pk]),
+            reverse('biens_ajouter'),
+            reverse('biens_modifier', args=[self.bien.pk]),
+            reverse('proprietaires_liste'),
+            reverse('proprietaires_ajouter'),
+            reverse('proprietaire_demandes'),
+            reverse('contrats_liste'),
+            reverse('contrats_ajouter') + f'?proprietaire={self.proprietaire.pk}',
+            reverse('contrats_modifier', args=[self.contrat.pk]),
+        ])
+
+    def test_tenant_pages_use_indexes(self):
+        self._verifier(self.tenant, [reverse('dashboard'), reverse('biens_liste')])
@@ -0,0 +1,97 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import facettes
+from .models import BienImmobilier, Proprietaire
+from .tests_utils import creer_bien
+
+
+class FacettesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('tenant', password='x')
+        self.client.login(username='tenant', password='x')
+        self.proprietaire = Proprietaire.objects.create(nom_complet='Owner')
+        creer_bien(self.proprietaire, 'Studio Akwa', superficie_m2=30, loyer_mensuel='45000.00')
+        creer_bien(self.proprietaire, 'T3 Bonapriso', superficie_m2=80, loyer_mensuel='150000.00')
+        creer_bien(
+            self.proprietaire, 'Villa Bonapriso', type_bien='maison', superficie_m2=250, loyer_mensuel='600000.00',
+            disponible=False,
+        )
+        creer_bien(self.proprietaire, 'T2 Bastos', ville='yaounde', superficie_m2=55, loyer_mensuel='90000.00')
+        creer_bien(
+            self.proprietaire, 'Terrain Kribi', ville='kribi', type_bien='terrain', superficie_m2=800,
+            loyer_mensuel='80000.00',
+        )
+
+    def _get(self, params):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('biens_liste'), params)
+        self.assertEqual(resp.status_code, 200)
+        agregats = [q['sql'] for q in ctx.captured_queries if 'GROUP BY' in q['sql']]
+        comptes = {
+            nom: {code: nombre for code, _, nombre, _ in valeurs}
+            for nom, _, valeurs in resp.context['facettes']
+        }
+        return resp, comptes, agregats
+
+    def test_selection_is_normalised(self):
+        params = QueryDict('ville=yaounde&ville=douala&ville=paris&loyer=1-2&disponible=1&type_bien=')
+        self.assertEqual(facettes.selection(params), {'ville': ('douala', 'yaounde'), 'disponible': ('1',)})
+
+    def test_counts_follow_the_other_facets(self):
+        resp, comptes, _ = self._get({'ville': 'douala'})
+        self.assertEqual(resp.context['biens'].total, 3)
+        # Its own facet still offers the other villes...
+        self.assertEqual(comptes['ville'], {'douala': 3, 'yaounde': 1, 'kribi': 1})
+        # ...the others only count biens of Douala.
+        self.assertEqual(comptes['type_bien'], {'appartement': 2, 'maison': 1})
+        self.assertEqual(comptes['loyer'], {'0-50000': 1, '100000-200000': 1, '500000-': 1})
+        self.assertEqual(comptes['surface'], {'0-50': 1, '50-100': 1, '200-500': 1})
+        self.assertEqual(comptes['disponible'], {'1': 2, '0': 1})
+
+        resp, comptes, _ = self._get({'ville': ['douala', 'yaounde'], 'type_bien': 'appartement', 'disponible': '1'})
+        titres = {bien.titre for bien in resp.context['biens']}
+        self.assertEqual(titres, {'Studio Akwa', 'T3 Bonapriso', 'T2 Bastos'})
+        self.assertEqual(resp.context['biens'].total, 3)
+        self.assertEqual(comptes['ville'], {'douala': 2, 'yaounde': 1})
+        self.assertEqual(comptes['type_bien'], {'appartement': 3})
+        self.assertEqual(comptes['disponible'], {'1': 3})
+
+    def test_bands(self):
+        resp, comptes, _ = self._get({'loyer': ['50000-100000', '500000-'], 'surface': '500-'})
+        self.assertEqual([bien.titre for bien in resp.context['biens']], ['Terrain Kribi'])
+        # Ticked values stay listed, even when nothing matches them any more.
+        self.assertEqual(comptes['loyer'], {'50000-100000': 1, '500000-': 0})
+        self.assertEqual(comptes['surface'], {'50-100': 1, '200-500': 1, '500-': 1})
+
+    def test_empty_selection_skips_the_page_query(self):
+        self._get({})
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('biens_liste'), {'ville': 'kribi', 'type_bien': 'maison'})
+        self.assertEqual(resp.context['biens'].total, 0)
+        self.assertContains(resp, 'Aucun bien trouvé.')
+        self.assertFalse([q for q in ctx.captured_queries if 'immobilier_bienimmobilier' in q['sql']])
+
+    def test_one_aggregate_per_search_then_cached(self):
+        _, _, agregats = self._get({})
+        self.assertEqual(len(agregats), 1)
+        # Ticking facets of the same search reuses the cached cube.
+        for params in ({'ville': 'douala'}, {'ville': 'douala', 'type_bien': 'maison'}, {'loyer': '0-50000'}):
+            _, _, agregats = self._get(params)
+            self.assertEqual(agregats, [], params)
+        # A new search has its own.
+        _, comptes, agregats = self._get({'q': 'bonapriso'})
+        self.assertEqual(len(agregats), 1)
+        self.assertEqual(comptes['ville'], {'douala': 2})
+
+        # Changing a bien retires the cached counts.
+        BienImmobilier.objects.get(titre='Studio Akwa').delete()
+        _, comptes, agregats = self._get({'ville': 'douala'})
+        self.assertEqual(len(agregats), 1)
+        self.assertEqual(comptes['ville']['douala'], 2)
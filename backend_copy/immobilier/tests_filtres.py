@@ -0,0 +1,92 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import BienImmobilier, Proprietaire, loyer_au_m2
+from .tests_explain import balayages_complets, plan
+from .tests_utils import creer_bien
+
+
+class FiltresBiensTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('tenant', password='x')
+        self.client.login(username='tenant', password='x')
+        self.proprietaire = Proprietaire.objects.create(nom_complet='Owner')
+        creer_bien(self.proprietaire, 'Studio', superficie_m2=20, loyer_mensuel='60000.00')  # 3000 / m²
+        creer_bien(self.proprietaire, 'T2', superficie_m2=50, loyer_mensuel='100000.00')  # 2000 / m²
+        creer_bien(self.proprietaire, 'T3', superficie_m2=80, loyer_mensuel='140000.00')  # 1750 / m²
+        creer_bien(self.proprietaire, 'T4', superficie_m2=100, loyer_mensuel='175000.00')  # 1750 / m²
+        creer_bien(self.proprietaire, 'Penthouse', superficie_m2=150, loyer_mensuel='450000.00')  # 3000 / m²
+        creer_bien(self.proprietaire, 'Maison', type_bien='maison', superficie_m2=120, loyer_mensuel='120000.00')  # 1000 / m²
+
+    def _titres(self, params):
+        resp = self.client.get(reverse('biens_liste'), params)
+        self.assertEqual(resp.status_code, 200)
+        return [bien.titre for bien in resp.context['biens']], resp
+
+    def test_loyer_m2_is_maintained(self):
+        self.assertEqual(loyer_au_m2(Decimal('100000'), 30), Decimal('3333.33'))
+        self.assertEqual(loyer_au_m2(Decimal('5000'), 0), Decimal('5000.00'))
+
+        bien = BienImmobilier.objects.get(titre='T2')
+        self.assertEqual(bien.loyer_m2, Decimal('2000.00'))
+        bien.loyer_mensuel = Decimal('125000')
+        bien.save(update_fields=['loyer_mensuel'])
+        bien.refresh_from_db()
+        self.assertEqual(bien.loyer_m2, Decimal('2500.00'))
+
+    def test_ranges_and_sorts(self):
+        titres, resp = self._titres({'loyer_max': '150000', 'tri': 'loyer_m2'})
+        self.assertEqual(titres, ['Maison', 'T3', 'T2', 'Studio'])
+        self.assertEqual(resp.context['biens'].total, 4)
+
+        titres, _ = self._titres({'loyer_min': '100000', 'surface_max': 100, 'tri': '-loyer'})
+        self.assertEqual(titres, ['T4', 'T3', 'T2'])
+        titres, _ = self._titres({'surface_min': 100, 'tri': 'surface'})
+        self.assertEqual(titres, ['T4', 'Maison', 'Penthouse'])
+        # Invalid values are ignored rather than failing the page.
+        titres, _ = self._titres({'loyer_max': 'beaucoup', 'tri': 'prix', 'surface_min': 100})
+        self.assertEqual(titres, ['Maison', 'Penthouse', 'T4'])
+
+    def test_ranges_feed_the_facet_counts(self):
+        _, resp = self._titres({'loyer_max': '150000'})
+        comptes = {nom: {code: n for code, _, n, _ in valeurs} for nom, _, valeurs in resp.context['facettes']}
+        self.assertEqual(comptes['type_bien'], {'appartement': 3, 'maison': 1})
+        _, resp = self._titres({'loyer_min': '150000'})
+        comptes = {nom: {code: n for code, _, n, _ in valeurs} for nom, _, valeurs in resp.context['facettes']}
+        self.assertEqual(comptes['type_bien'], {'appartement': 2})
+
+    def test_pages_follow_the_sort_across_ties(self):
+        for n in range(8):
+            creer_bien(self.proprietaire, f'T2 bis {n}', superficie_m2=50, loyer_mensuel='100000.00')
+        params = {'tri': 'loyer_m2', 'type_bien': 'appartement'}
+        biens = []
+        page = self.client.get(reverse('biens_liste'), params).context['biens']
+        biens += list(page)
+        while page.has_next:
+            page = self.client.get(reverse('biens_liste'), {**params, 'curseur': page.next_cursor}).context['biens']
+            biens += list(page)
+        self.assertEqual(len({bien.pk for bien in biens}), 13)
+        self.assertEqual(len(biens), 13)
+        self.assertEqual([b.loyer_m2 for b in biens], sorted(b.loyer_m2 for b in biens))
+
+    def test_cheapest_per_m2_reads_an_index_in_order(self):
+        url = reverse('biens_liste') + (
+            '?ville=douala&type_bien=appartement&disponible=1&loyer_max=150000&tri=loyer_m2'
+        )
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        self.assertEqual(balayages_complets(ctx.captured_queries), [])
+        if connection.vendor == 'sqlite':
+            page = [q['sql'] for q in ctx.captured_queries if 'ORDER BY' in q['sql']]
+            self.assertEqual(len(page), 1)
+            etapes = plan(page[0])
+            self.assertTrue(any('bien_loyer_m2_idx' in etape for etape in etapes), etapes)
+            self.assertFalse(any('TEMP B-TREE' in etape for etape in etapes), etapes)
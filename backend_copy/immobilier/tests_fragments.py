@@ -0,0 +1,72 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.test import TestCase
+from django.urls import reverse
+
+from .models import ContratLocation, Proprietaire
+from .tests_utils import creer_bien
+
+
+class FragmentsListesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner', password='x')
+        self.proprietaire = Proprietaire.objects.create(user=self.owner, nom_complet='Owner')
+        self.autre_proprietaire = Proprietaire.objects.create(nom_complet='Autre')
+        self.bien = creer_bien(self.proprietaire, 'Villa')
+        self.autre = creer_bien(self.autre_proprietaire, 'Studio')
+        self.contrat = ContratLocation.objects.create(
+            bien=self.bien, locataire_nom='Loc', date_debut=date(2026, 1, 1), date_fin=date(2026, 12, 31), caution='1'
+        )
+        self.staff = User.objects.create_user('staff', password='x', is_staff=True)
+
+    def _cle_bien(self, bien):
+        bien.refresh_from_db()
+        return make_template_fragment_key('ligne_bien', [bien.pk, bien.modifie_le, bien.proprietaire.modifie_le])
+
+    def test_rows_are_served_from_the_cache(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse('biens_liste'))
+        cle = self._cle_bien(self.autre)
+        self.assertIsNotNone(cache.get(cle))
+
+        cache.set(cle, '<td>depuis le cache</td>')
+        self.assertContains(self.client.get(reverse('biens_liste')), 'depuis le cache')
+
+        for url in (reverse('contrats_liste'), reverse('proprietaires_liste')):
+            self.assertContains(self.client.get(url), 'Owner')
+
+    def test_saves_change_the_stamp(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse('biens_liste'))
+        self.client.get(reverse('contrats_liste'))
+        cle_autre = self._cle_bien(self.autre)
+
+        self.bien.disponible = False
+        self.bien.save(update_fields=['disponible'])
+        self.proprietaire.nom_complet = 'Owner renommé'
+        self.proprietaire.save()
+
+        resp = self.client.get(reverse('biens_liste'))
+        self.assertContains(resp, 'Owner renommé')
+        self.assertContains(resp, '<td>Non</td>', html=True)
+        self.assertContains(self.client.get(reverse('contrats_liste')), 'Owner renommé')
+        # untouched rows keep their fragment
+        self.assertEqual(self._cle_bien(self.autre), cle_autre)
+
+    def test_action_buttons_follow_the_user(self):
+        def modifier(bien):
+            return reverse('biens_modifier', args=[bien.pk])
+
+        self.client.force_login(self.staff)
+        resp = self.client.get(reverse('biens_liste'))
+        self.assertContains(resp, modifier(self.bien))
+        self.assertContains(resp, modifier(self.autre))
+
+        self.client.force_login(self.owner)
+        resp = self.client.get(reverse('biens_liste'))
+        self.assertContains(resp, modifier(self.bien))
+        self.assertNotContains(resp, modifier(self.autre))
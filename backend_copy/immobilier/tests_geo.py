@@ -0,0 +1,118 @@
+import random
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .forms import BienImmobilierForm
+from .geo import PLAGES_MAX, centre_ville, geocellule, geocoder, plages
+from .models import BienImmobilier, Proprietaire
+from .tests_explain import balayages_complets
+from .tests_utils import creer_bien
+
+
+class GeocodageTest(TestCase):
+    def test_gazetteer(self):
+        self.assertEqual(geocoder('12 rue Njo-Njo, Bonapriso', 'douala'), (4.03, 9.696))
+        self.assertEqual(geocoder('Quartier Bonapriso', 'yaounde'), centre_ville('yaounde'))
+        self.assertEqual(geocoder('Rue 1', 'inconnue'), None)
+        for ville, _ in BienImmobilier.VILLE_CHOICES:
+            self.assertIsNotNone(centre_ville(ville), ville)
+
+    def test_ranges_cover_the_box(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            lat, lon = rng.uniform(2, 12), rng.uniform(9, 15)
+            hauteur = rng.choice([0.001, 0.05, 2])
+            largeur = hauteur * rng.uniform(0.5, 2)
+            couverture = plages(lat, lon, lat + hauteur, lon + largeur)
+            self.assertLessEqual(len(couverture), PLAGES_MAX)
+            for _ in range(20):
+                code = geocellule(rng.uniform(lat, lat + hauteur), rng.uniform(lon, lon + largeur))
+                self.assertTrue(any(debut <= code <= fin for debut, fin in couverture))
+
+
+class RechercheGeoTest(TestCase):
+    def setUp(self):
+        self.proprietaire = Proprietaire.objects.create(nom_complet='Owner')
+        self.akwa = creer_bien(self.proprietaire, 'Akwa', latitude=4.0469, longitude=9.6960)
+        self.bonanjo = creer_bien(self.proprietaire, 'Bonanjo', latitude=4.0383, longitude=9.6880)
+        self.deido = creer_bien(self.proprietaire, 'Deido', latitude=4.0610, longitude=9.7050)
+        self.yaounde = creer_bien(self.proprietaire, 'Bastos', latitude=3.8940, longitude=11.5080, ville='yaounde')
+
+    def test_coordinates_default_to_the_gazetteer(self):
+        bien = creer_bien(self.proprietaire, 'Sans position', latitude=None, longitude=None)
+        self.assertEqual((bien.latitude, bien.longitude), centre_ville('douala'))
+        self.assertEqual(bien.geocellule, geocellule(*centre_ville('douala')))
+
+        self.akwa.latitude = 4.05
+        self.akwa.save(update_fields=['latitude'])
+        self.akwa.refresh_from_db()
+        self.assertEqual(self.akwa.geocellule, geocellule(4.05, 9.6960))
+
+    def test_new_address_is_geocoded_unless_coordinates_are_given(self):
+        donnees = {
+            'titre': 'Akwa',
+            'adresse': 'Rue, Bonapriso',
+            'ville': 'douala',
+            'superficie_m2': 30,
+            'loyer_mensuel': '1000.00',
+            'type_bien': 'maison',
+            'proprietaire': self.proprietaire.pk,
+            'latitude': '4.0469',
+            'longitude': '9.6960',
+        }
+        BienImmobilierForm(donnees, instance=self.akwa).save()
+        self.assertEqual((self.akwa.latitude, self.akwa.longitude), (4.03, 9.696))
+
+        BienImmobilierForm({**donnees, 'latitude': '4.05'}, instance=self.akwa).save()
+        self.assertEqual(self.akwa.latitude, 4.05)
+
+    def test_radius_search_orders_by_distance(self):
+        resp = self.client.get(reverse('biens_liste'), {'lat': 4.0469, 'lon': 9.6960, 'rayon': 2})
+        self.assertEqual([b.titre for b in resp.context['biens']], ['Akwa', 'Bonanjo', 'Deido'])
+        self.assertContains(resp, '1,3 km')
+
+        resp = self.client.get(reverse('biens_liste'), {'lat': 4.0469, 'lon': 9.6960, 'rayon': 1.5})
+        self.assertEqual([b.titre for b in resp.context['biens']], ['Akwa', 'Bonanjo'])
+
+        resp = self.client.get(reverse('biens_liste'), {'autour': 'yaounde', 'rayon': 10})
+        self.assertEqual([b.titre for b in resp.context['biens']], ['Bastos'])
+
+    def test_radius_search_paginates(self):
+        for i in range(12):
+            creer_bien(self.proprietaire, f'Proche {i:02d}', latitude=4.0469 + i * 0.001, longitude=9.6960)
+        params = {'lat': 4.0469, 'lon': 9.6960, 'rayon': 2}
+        resp = self.client.get(reverse('biens_liste'), params)
+        page = resp.context['biens']
+        # The link to the next page keeps the search.
+        self.assertContains(resp, f'href="?lat=4.0469&amp;lon=9.696&amp;rayon=2&amp;curseur={page.next_cursor}"')
+        suivante = self.client.get(reverse('biens_liste'), {**params, 'curseur': page.next_cursor}).context['biens']
+        self.assertEqual(
+            [b.titre for b in page] + [b.titre for b in suivante],
+            ['Akwa'] + [f'Proche {i:02d}' for i in range(12)] + ['Bonanjo', 'Deido'],
+        )
+        self.assertFalse(suivante.has_next)
+
+    def test_map_area(self):
+        resp = self.client.get(reverse('biens_carte'), {'bbox': '9.68,4.03,9.70,4.05'})
+        self.assertEqual(resp.status_code, 200)
+        donnees = resp.json()
+        self.assertEqual(sorted(b['titre'] for b in donnees['results']), ['Akwa', 'Bonanjo'])
+        self.assertFalse(donnees['tronque'])
+        self.assertEqual(donnees['results'][0]['url'], reverse('biens_detail', args=[donnees['results'][0]['id']]))
+
+        self.assertEqual(self.client.get(reverse('biens_carte'), {'bbox': '9.7,4.05,9.6,4.03'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('biens_carte')).status_code, 400)
+
+    def test_searches_use_the_grid_index(self):
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        for url in (
+            reverse('biens_carte') + '?bbox=9.68,4.03,9.70,4.05',
+            reverse('biens_liste') + '?autour=douala&rayon=3',
+        ):
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(url)
+            self.assertEqual(balayages_complets(ctx.captured_queries), [], url)
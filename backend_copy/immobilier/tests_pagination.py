@@ -0,0 +1,59 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from .models import BienImmobilier, Proprietaire
+from .pagination import paginer_keyset
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.proprietaire = Proprietaire.objects.create(nom_complet='Owner Pages')
+        for i in range(25):
+            BienImmobilier.objects.create(
+                titre=f'Bien {i:02d}',
+                adresse='Rue Page',
+                ville='douala',
+                superficie_m2=40,
+                loyer_mensuel='1000.00',
+                type_bien='appartement',
+                proprietaire=self.proprietaire,
+            )
+        self.ordre = ['-cree_le', '-id']
+        self.attendus = list(BienImmobilier.objects.order_by(*self.ordre).values_list('pk', flat=True))
+
+    def test_walk_forward_then_back(self):
+        vus = []
+        curseur = None
+        pages = []
+        while True:
+            page = paginer_keyset(BienImmobilier.objects.all(), self.ordre, curseur=curseur, per_page=10)
+            pages.append([b.pk for b in page])
+            vus.extend(b.pk for b in page)
+            if not page.has_next:
+                break
+            curseur = page.next_cursor
+        self.assertEqual(vus, self.attendus)
+        self.assertEqual([len(p) for p in pages], [10, 10, 5])
+
+        page = paginer_keyset(BienImmobilier.objects.all(), self.ordre, curseur=curseur, per_page=10)
+        precedente = paginer_keyset(BienImmobilier.objects.all(), self.ordre, curseur=page.previous_cursor, per_page=10)
+        self.assertEqual([b.pk for b in precedente], pages[1])
+        self.assertTrue(precedente.has_previous)
+        self.assertTrue(precedente.has_next)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        page = paginer_keyset(BienImmobilier.objects.all(), self.ordre, curseur='not-a-cursor', per_page=10)
+        self.assertEqual([b.pk for b in page], self.attendus[:10])
+        self.assertFalse(page.has_previous)
+
+    def test_approximate_total(self):
+        page = paginer_keyset(BienImmobilier.objects.all(), self.ordre, per_page=10, avec_total=True)
+        self.assertEqual(page.total, 25)
+        self.assertTrue(page.total_exact)
+
+    def test_list_view_follows_cursor(self):
+        resp = self.client.get(reverse('biens_liste'))
+        self.assertEqual(resp.status_code, 200)
+        curseur = resp.context['biens'].next_cursor
+        resp = self.client.get(reverse('biens_liste'), {'curseur': curseur})
+        self.assertEqual([b.pk for b in resp.context['biens']], self.attendus[10:20])
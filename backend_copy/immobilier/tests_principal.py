@@ -0,0 +1,77 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import BienImmobilier, Proprietaire
+
+
+def _requetes_lien(queries):
+    """Queries resolving the user -> Proprietaire link."""
+    return [q['sql'] for q in queries if 'FROM "immobilier_proprietaire"' in q['sql'] and '"user_id" =' in q['sql']]
+
+
+class ProprietaireMiddlewareTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='x')
+        self.proprietaire = Proprietaire.objects.create(user=self.user, nom_complet='Owner')
+        self.bien = BienImmobilier.objects.create(
+            titre='Bien',
+            adresse='Rue',
+            ville='douala',
+            superficie_m2=40,
+            loyer_mensuel='1000.00',
+            type_bien='appartement',
+            proprietaire=self.proprietaire,
+        )
+        self.client.force_login(self.user)
+
+    def test_link_is_resolved_once_then_served_from_session(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('dashboard'))
+        self.assertTrue(resp.context['user_is_proprietaire'])
+        self.assertEqual(len(_requetes_lien(ctx.captured_queries)), 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('dashboard'))
+            self.client.get(reverse('contrats_liste'))
+        self.assertEqual(_requetes_lien(ctx.captured_queries), [])
+
+        # Permission checks read the link from the database, once per request.
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(reverse('biens_modifier', args=[self.bien.pk])).status_code, 200)
+        self.assertEqual(len(_requetes_lien(ctx.captured_queries)), 1)
+
+    def test_permissions_do_not_trust_a_stale_session_entry(self):
+        self.assertTrue(self.client.get(reverse('dashboard')).context['user_is_proprietaire'])
+        # An unlink saved by another worker: its per-process cache dropped the
+        # token there, not in this process.
+        Proprietaire.objects.filter(pk=self.proprietaire.pk).update(user=None)
+
+        self.assertEqual(self.client.get(reverse('biens_modifier', args=[self.bien.pk])).status_code, 403)
+        self.assertEqual(self.client.post(reverse('biens_supprimer', args=[self.bien.pk])).status_code, 403)
+        self.assertRedirects(
+            self.client.get(reverse('biens_ajouter')), reverse('devenir_proprietaire'), fetch_redirect_response=False
+        )
+        self.assertTrue(BienImmobilier.objects.filter(pk=self.bien.pk).exists())
+
+    def test_unlinking_invalidates_the_session_entry(self):
+        self.assertEqual(self.client.get(reverse('biens_modifier', args=[self.bien.pk])).status_code, 200)
+
+        self.proprietaire.user = None
+        self.proprietaire.save()
+
+        self.assertEqual(self.client.get(reverse('biens_modifier', args=[self.bien.pk])).status_code, 403)
+        self.assertRedirects(
+            self.client.get(reverse('biens_ajouter')), reverse('devenir_proprietaire'), fetch_redirect_response=False
+        )
+
+    def test_becoming_owner_is_seen_on_next_request(self):
+        other = User.objects.create_user('tenant', password='x')
+        self.client.force_login(other)
+        self.assertFalse(self.client.get(reverse('dashboard')).context['user_is_proprietaire'])
+
+        self.client.post(reverse('devenir_proprietaire'))
+        self.assertTrue(self.client.get(reverse('dashboard')).context['user_is_proprietaire'])
+        self.assertEqual(self.client.get(reverse('biens_modifier', args=[self.bien.pk])).status_code, 403)
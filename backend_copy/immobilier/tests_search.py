@@ -0,0 +1,47 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from .models import BienImmobilier, Proprietaire
+from .search import rechercher_biens
+from .tests_utils import creer_bien
+
+
+class RechercheBiensTest(TestCase):
+    def setUp(self):
+        self.proprietaire = Proprietaire.objects.create(nom_complet='Owner Search')
+        self.studio = creer_bien(
+            self.proprietaire, 'Studio meublé', adresse='Rue de la Joie', ville='yaounde', type_bien='appartement'
+        )
+        self.villa = creer_bien(
+            self.proprietaire, 'Grande villa', adresse='Quartier Bonapriso', ville='douala', type_bien='maison'
+        )
+        self.local = creer_bien(
+            self.proprietaire, 'Boutique', adresse='Avenue Kennedy, Yaoundé', ville='bafoussam',
+            type_bien='local_commercial',
+        )
+
+    def _pks(self, recherche):
+        qs = rechercher_biens(BienImmobilier.objects.all(), recherche).order_by('-pertinence', '-id')
+        return [b.pk for b in qs]
+
+    def test_accent_insensitive_ville_label(self):
+        self.assertEqual(self._pks('Yaoundé')[0], self.studio.pk)
+        self.assertEqual(set(self._pks('yaounde')), {self.studio.pk, self.local.pk})
+
+    def test_prefix_and_type_label(self):
+        self.assertEqual(self._pks('meub'), [self.studio.pk])
+        self.assertEqual(self._pks('local commercial'), [self.local.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.villa.titre = 'Duplex neuf'
+        self.villa.save()
+        self.assertEqual(self._pks('villa'), [])
+        self.assertEqual(self._pks('duplex'), [self.villa.pk])
+
+        self.villa.delete()
+        self.assertEqual(self._pks('duplex'), [])
+
+    def test_list_view_uses_search(self):
+        resp = self.client.get(reverse('biens_liste'), {'q': 'bonapriso'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([b.pk for b in resp.context['biens']], [self.villa.pk])
@@ -0,0 +1,74 @@
+from datetime import date
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .models import BienImmobilier, ContratLocation, DashboardStats, Proprietaire
+from .stats import CLE_GLOBALE, calculer_stats, cle_proprietaire, lire_stats, reconcilier_stats
+from .tests_utils import creer_bien
+
+
+class DashboardStatsTest(TestCase):
+    def setUp(self):
+        self.alice = Proprietaire.objects.create(nom_complet='Alice')
+        self.bob = Proprietaire.objects.create(nom_complet='Bob')
+
+    def _contrat(self, bien, actif=True):
+        return ContratLocation.objects.create(
+            bien=bien,
+            locataire_nom='Loc',
+            date_debut=date(2026, 1, 1),
+            date_fin=date(2026, 12, 31),
+            caution='100.00',
+            actif=actif,
+        )
+
+    def assertSnapshotMatchesSource(self):
+        self.assertEqual(reconcilier_stats(dry_run=True), [])
+        for cle, valeurs in calculer_stats().items():
+            row = lire_stats(cle)
+            self.assertEqual({c: getattr(row, c) for c in valeurs}, valeurs, cle)
+
+    def test_incremental_updates(self):
+        b1 = creer_bien(self.alice, ville='yaounde')
+        b2 = creer_bien(self.alice, disponible=False)
+        contrat = self._contrat(b1)
+        self.assertSnapshotMatchesSource()
+
+        global_stats = lire_stats(CLE_GLOBALE)
+        self.assertEqual(global_stats.nb_proprietaires, 2)
+        self.assertEqual(global_stats.nb_biens, 2)
+        self.assertEqual(global_stats.nb_biens_disponibles, 1)
+        self.assertEqual(global_stats.nb_contrats_actifs, 1)
+
+        b1.disponible = False
+        b1.save(update_fields=['disponible'])
+        contrat.actif = False
+        contrat.save()
+        self.assertSnapshotMatchesSource()
+
+        # reassignment moves the bien and its contract to Bob
+        b1.proprietaire = self.bob
+        b1.save()
+        self.assertEqual(lire_stats(cle_proprietaire(self.bob.pk)).nb_contrats, 1)
+        self.assertEqual(lire_stats(cle_proprietaire(self.alice.pk)).nb_contrats, 0)
+        self.assertSnapshotMatchesSource()
+
+        b1.delete()
+        b2.delete()
+        self.assertSnapshotMatchesSource()
+
+        self.bob.delete()
+        self.assertSnapshotMatchesSource()
+        self.assertFalse(DashboardStats.objects.filter(cle__startswith=cle_proprietaire(self.bob.pk)).exists())
+
+    def test_reconcile_repairs_drift(self):
+        creer_bien(self.alice)
+        # queryset.update() bypasses the signal handlers
+        BienImmobilier.objects.update(disponible=False)
+        self.assertIn(CLE_GLOBALE, reconcilier_stats(dry_run=True))
+
+        call_command('reconcilier_stats', stdout=StringIO())
+        self.assertEqual(lire_stats(CLE_GLOBALE).nb_biens_disponibles, 0)
+        self.assertSnapshotMatchesSource()
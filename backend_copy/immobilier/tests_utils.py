@@ -0,0 +1,14 @@
+from .models import BienImmobilier
+
+
+def creer_bien(proprietaire, titre='Bien', **champs):
+    """A BienImmobilier with defaults for every field the test does not care about."""
+    champs = {
+        'adresse': 'Rue',
+        'ville': 'douala',
+        'superficie_m2': 40,
+        'loyer_mensuel': '1000.00',
+        'type_bien': 'appartement',
+        **champs,
+    }
+    return BienImmobilier.objects.create(titre=titre, proprietaire=proprietaire, **champs)
@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import autocomplete, views
 
 urlpatterns = [
     path("", views.dashboard, name="dashboard"),
@@ -13,6 +13,7 @@ urlpatterns = [
     path("deconnexion/", auth_views.LogoutView.as_view(), name="deconnexion"),
 
     path("biens/", views.biens_liste, name="biens_liste"),
+    path("biens/carte/", views.biens_carte, name="biens_carte"),
     path("biens/nouveau/", views.biens_create, name="biens_ajouter"),
     path("biens/<int:pk>/modifier/", views.biens_update, name="biens_modifier"),
     path("biens/<int:pk>/supprimer/", views.biens_delete, name="biens_supprimer"),
@@ -27,6 +28,8 @@ urlpatterns = [
     path("contrats/nouveau/", views.contrats_create, name="contrats_ajouter"),
     path("contrats/<int:pk>/modifier/", views.contrats_update, name="contrats_modifier"),
     path("contrats/<int:pk>/supprimer/", views.contrats_delete, name="contrats_supprimer"),
+    path("autocomplete/proprietaires/", autocomplete.proprietaires, name="autocomplete_proprietaires"),
+    path("autocomplete/biens/", autocomplete.biens_disponibles, name="autocomplete_biens"),
     path("proprietaire/demandes/", views.proprietaire_demandes, name="proprietaire_demandes"),
     path("devenir-proprietaire/", views.devenir_proprietaire, name="devenir_proprietaire"),
 ]
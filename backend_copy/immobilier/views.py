@@ -1,34 +1,56 @@
-from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Now
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login
 from django.shortcuts import get_object_or_404, redirect, render
 from django.core.exceptions import PermissionDenied
-from .forms import BienImmobilierForm, ContratLocationForm, ProprietaireForm, UserRegistrationForm
-from .models import BienImmobilier, ContratLocation, Proprietaire
+from . import facettes
+from .cache_pages import cache_page_anonyme, invalider_pages
+from .forms import (
+    BienImmobilierForm,
+    ContratLocationForm,
+    FiltresBiensForm,
+    ProprietaireForm,
+    RechercheGeoForm,
+    UserRegistrationForm,
+)
+from .geo import autour, dans_zone
+from .middleware import proprietaire_courant, proprietaire_id_verifie
+from .models import CONTRAT_ACTIF_EXISTANT, BienImmobilier, ContratLocation, Proprietaire
+from .pagination import KeysetPage, paginer_keyset
+from .search import rechercher_biens
+from .stats import (
+    CLE_GLOBALE,
+    appliquer_deltas,
+    cle_proprietaire,
+    contributions_bien,
+    difference,
+    lire_stats,
+    lire_stats_villes,
+)
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, JsonResponse
+from django.urls import reverse
+
+
+LIMITE_CARTE = 500
 
 
 @login_required
 def dashboard(request):
     # If the logged-in user is a proprietor, show owner dashboard with their biens and demandes
-    try:
-        proprietaire = Proprietaire.objects.get(user=request.user)
-    except Proprietaire.DoesNotExist:
-        proprietaire = None
+    proprietaire = proprietaire_courant(request)
 
     if proprietaire:
         biens = BienImmobilier.objects.filter(proprietaire=proprietaire).order_by('-cree_le')
         demandes = ContratLocation.objects.select_related('bien').filter(bien__proprietaire=proprietaire).order_by('-date_debut')
-        total_biens = biens.count()
-        disponibles = biens.filter(disponible=True).count()
-        indisponibles = total_biens - disponibles
-        demandes_count = demandes.count()
-        # breakdown by city
-        villes_qs = biens.values('ville').annotate(count=Count('id')).order_by('-count')
-        villes = [v['ville'] for v in villes_qs]
-        villes_counts = [v['count'] for v in villes_qs]
+        # counters come from the DashboardStats snapshot maintained by signals
+        cle = cle_proprietaire(proprietaire.pk)
+        stats = lire_stats(cle)
+        villes_qs = lire_stats_villes(prefixe=f"{cle}:").filter(nb_biens__gt=0).order_by('-nb_biens')
+        villes = [v.ville for v in villes_qs]
+        villes_counts = [v.nb_biens for v in villes_qs]
 
         context = {
             'title': 'Espace propriétaire',
@@ -36,10 +58,10 @@ def dashboard(request):
             'biens': biens,
             'demandes': demandes,
             'stats': {
-                'total_biens': total_biens,
-                'disponibles': disponibles,
-                'indisponibles': indisponibles,
-                'demandes': demandes_count,
+                'total_biens': stats.nb_biens,
+                'disponibles': stats.nb_biens_disponibles,
+                'indisponibles': stats.nb_biens - stats.nb_biens_disponibles,
+                'demandes': stats.nb_contrats,
             },
             'villes': villes,
             'villes_counts': villes_counts,
@@ -49,12 +71,11 @@ def dashboard(request):
     # Otherwise show a simple user (locataire) dashboard with recent biens and user's contrats
     recent_biens = BienImmobilier.objects.filter(disponible=True).order_by('-cree_le')[:10]
     user_contrats = ContratLocation.objects.filter(locataire_email=request.user.email).order_by('-date_debut')
-    # stats for tenant
-    total_available = BienImmobilier.objects.filter(disponible=True).count()
-    # compute city breakdown from the full available set (not from sliced queryset)
-    villes_qs = BienImmobilier.objects.filter(disponible=True).values('ville').annotate(count=Count('id')).order_by('-count')[:5]
-    villes = [v['ville'] for v in villes_qs]
-    villes_counts = [v['count'] for v in villes_qs]
+    # stats for tenant, from the global and per-ville DashboardStats rows
+    total_available = lire_stats(CLE_GLOBALE).nb_biens_disponibles
+    villes_qs = lire_stats_villes().filter(nb_biens_disponibles__gt=0).order_by('-nb_biens_disponibles')[:5]
+    villes = [v.ville for v in villes_qs]
+    villes_counts = [v.nb_biens_disponibles for v in villes_qs]
     context = {
         'title': 'Espace locataire',
         'recent_biens': recent_biens,
@@ -99,39 +120,110 @@ def page_placeholder(request, title, description, pk=None):
     return render(request, "immobilier/page_placeholder.html", context)
 
 
-def _paginate_queryset(request, queryset, per_page=10):
-    paginator = Paginator(queryset, per_page)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+def _paginate_queryset(request, queryset, ordre, per_page=10, avec_total=True):
+    page = paginer_keyset(
+        queryset,
+        ordre,
+        curseur=request.GET.get("curseur"),
+        per_page=per_page,
+        avec_total=avec_total,
+    )
+    # Active filters, carried over by the pagination links.
+    filtres = request.GET.copy()
+    filtres.pop("curseur", None)
+    page.filtres = filtres.urlencode()
+    return page
 
 
+@cache_page_anonyme()
 def biens_liste(request):
     recherche = request.GET.get("q", "").strip()
-    biens = BienImmobilier.objects.select_related("proprietaire").order_by("-cree_le")
+    filtres = FiltresBiensForm(request.GET)
+    biens = filtres.filtrer(BienImmobilier.objects.select_related("proprietaire"))
+    ordre = ["-cree_le", "-id"]
+    tri = filtres.ordre()
 
     if recherche:
-        biens = biens.filter(Q(titre__icontains=recherche) | Q(ville__icontains=recherche))
-
-    page_obj = _paginate_queryset(request, biens)
+        biens = rechercher_biens(biens, recherche)
+        ordre = ["-pertinence", "-id"]
+
+    geo = RechercheGeoForm(request.GET)
+    centre = geo.centre()
+    if centre:
+        colonnes_tri = [champ.lstrip("-") for champ in tri or ()]
+        proches = autour(biens.select_related(None).only("id", "latitude", "longitude", *colonnes_tri), *centre)
+        ordre = ["distance_km", "id"]
+    else:
+        proches = biens
+    ordre = tri or ordre
+
+    # The facet counts also give the exact total: the page needs no COUNT, nor
+    # any query at all when nothing matches.
+    choisies = facettes.selection(request.GET)
+    cube = facettes.cube_en_cache(proches, recherche, centre, filtres.bornes())
+    liste_facettes, total = facettes.compter(cube, choisies)
+    proches = facettes.filtrer(proches, choisies)
+
+    if not total:
+        page_obj = KeysetPage([], False, False, None, None)
+    elif centre:
+        # Rank on the covering grid index alone (every row in the radius is
+        # sorted), then load the rows of the page.
+        page_obj = _paginate_queryset(request, proches, ordre, avec_total=False)
+        complets = biens.in_bulk([bien.pk for bien in page_obj])
+        for bien in page_obj:
+            complets[bien.pk].distance_km = bien.distance_km
+        page_obj.object_list = [complets[bien.pk] for bien in page_obj]
+    else:
+        page_obj = _paginate_queryset(request, proches, ordre, avec_total=False)
+    page_obj.total = total
 
     context = {
         "title": "Liste des biens",
         "biens": page_obj,
         "q": recherche,
+        "geo": geo,
+        "centre": centre,
+        "filtres": filtres,
+        "facettes": liste_facettes,
     }
     return render(request, "immobilier/biens_liste.html", context)
 
 
+def _bbox(valeur):
+    """``lon_min,lat_min,lon_max,lat_max`` -> ``(lat_min, lon_min, lat_max, lon_max)``, or None."""
+    try:
+        lon_min, lat_min, lon_max, lat_max = (float(v) for v in valeur.split(","))
+    except ValueError:
+        return None
+    if not (-90 <= lat_min <= lat_max <= 90 and -180 <= lon_min <= lon_max <= 180):
+        return None
+    return lat_min, lon_min, lat_max, lon_max
+
+
+@cache_page_anonyme()
+def biens_carte(request):
+    """``?bbox=lon_min,lat_min,lon_max,lat_max``: the biens of a map area, as JSON.
+
+    At most LIMITE_CARTE points, in no particular order (``tronque`` tells the
+    map to zoom in): without ORDER BY the scan stops as soon as it has them.
+    """
+    zone = _bbox(request.GET.get("bbox", ""))
+    if zone is None:
+        return JsonResponse({"erreur": "bbox attendu : lon_min,lat_min,lon_max,lat_max"}, status=400)
+    lignes = list(
+        dans_zone(BienImmobilier.objects.order_by(), *zone)
+        .values("id", "titre", "latitude", "longitude", "loyer_mensuel", "disponible")[: LIMITE_CARTE + 1]
+    )
+    for ligne in lignes:
+        ligne["url"] = reverse("biens_detail", args=[ligne["id"]])
+    return JsonResponse({"results": lignes[:LIMITE_CARTE], "tronque": len(lignes) > LIMITE_CARTE})
+
+
 @login_required
 def biens_create(request):
     # Only allow creation for staff or users already linked to a Proprietaire
-    from .models import Proprietaire as _Proprietaire
-
-    try:
-        is_prop = _Proprietaire.objects.filter(user=request.user).exists()
-    except Exception:
-        is_prop = False
+    is_prop = proprietaire_id_verifie(request) is not None
 
     if not request.user.is_staff and not is_prop:
         return redirect('devenir_proprietaire')
@@ -143,14 +235,17 @@ def biens_create(request):
 
         if form.is_valid():
             bien = form.save(commit=False)
-            proprietaire, _ = Proprietaire.objects.get_or_create(
-                user=request.user,
-                defaults={
-                    "nom_complet": f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username,
-                    "email": request.user.email,
-                },
-            )
-            bien.proprietaire = proprietaire
+            proprietaire_id = proprietaire_id_verifie(request)
+            if proprietaire_id is None:
+                # staff without an owner record
+                proprietaire_id = Proprietaire.objects.get_or_create(
+                    user=request.user,
+                    defaults={
+                        "nom_complet": f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username,
+                        "email": request.user.email,
+                    },
+                )[0].pk
+            bien.proprietaire_id = proprietaire_id
             bien.save()
             return redirect("biens_liste")
     else:
@@ -170,7 +265,7 @@ def biens_update(request, pk):
     bien = get_object_or_404(BienImmobilier, pk=pk)
 
     # Only staff or owner may edit
-    if not request.user.is_staff and (not bien.proprietaire or bien.proprietaire.user_id != request.user.id):
+    if not request.user.is_staff and (bien.proprietaire_id is None or bien.proprietaire_id != proprietaire_id_verifie(request)):
         raise PermissionDenied()
 
     if request.method == "POST":
@@ -198,7 +293,7 @@ def biens_delete(request, pk):
     bien = get_object_or_404(BienImmobilier, pk=pk)
 
     # Only staff or owner may delete
-    if not request.user.is_staff and (not bien.proprietaire or bien.proprietaire.user_id != request.user.id):
+    if not request.user.is_staff and (bien.proprietaire_id is None or bien.proprietaire_id != proprietaire_id_verifie(request)):
         raise PermissionDenied()
 
     if request.method == "POST":
@@ -212,6 +307,7 @@ def biens_delete(request, pk):
     return render(request, "immobilier/biens_confirm_delete.html", context)
 
 
+@cache_page_anonyme(par_bien=True)
 def biens_detail(request, pk):
     bien = get_object_or_404(BienImmobilier.objects.select_related("proprietaire"), pk=pk)
     context = {
@@ -221,10 +317,25 @@ def biens_detail(request, pk):
     return render(request, "immobilier/biens_detail.html", context)
 
 
+def _annoter_compteurs_biens(proprietaires):
+    # Correlated subqueries are only evaluated for the rows of the page,
+    # each one an index lookup on proprietaire_id.
+    biens = BienImmobilier.objects.filter(proprietaire=OuterRef("pk")).order_by().values("proprietaire")
+
+    def _compter(qs):
+        return Coalesce(Subquery(qs.annotate(n=Count("pk")).values("n")), 0)
+
+    return proprietaires.annotate(
+        nb_biens=_compter(biens),
+        nb_biens_disponibles=_compter(biens.filter(disponible=True)),
+        nb_biens_loues=_compter(biens.filter(disponible=False)),
+    )
+
+
 @login_required
 def proprietaires_liste(request):
     recherche = request.GET.get("q", "").strip()
-    proprietaires = Proprietaire.objects.all().order_by("nom_complet")
+    proprietaires = _annoter_compteurs_biens(Proprietaire.objects.all())
 
     if recherche:
         proprietaires = proprietaires.filter(
@@ -233,7 +344,7 @@ def proprietaires_liste(request):
             | Q(telephone__icontains=recherche)
         )
 
-    page_obj = _paginate_queryset(request, proprietaires)
+    page_obj = _paginate_queryset(request, proprietaires, ["nom_complet", "id"])
 
     context = {
         "title": "Liste des propriétaires",
@@ -295,16 +406,54 @@ def proprietaires_delete(request, pk):
     return render(request, "immobilier/proprietaires_confirm_delete.html", context)
 
 
-def _mettre_a_jour_disponibilite_bien(bien):
-    a_contrat_actif = bien.contrats.filter(actif=True).exists()
-    bien.disponible = not a_contrat_actif
-    bien.save(update_fields=["disponible"])
+def _basculer_disponibilite(bien, disponible):
+    """Set ``bien.disponible`` with one conditional UPDATE, a no-op if it already holds.
+
+    A bien is only freed if it has no active contract left. QuerySet.update
+    skips the signals, so the stats delta and the page cache invalidation
+    happen here when the row changed.
+    """
+    biens = BienImmobilier.objects.filter(pk=bien.pk, disponible=not disponible)
+    if disponible:
+        biens = biens.filter(~Exists(ContratLocation.objects.filter(bien=OuterRef("pk"), actif=True)))
+    if biens.update(disponible=disponible, modifie_le=Now()):
+        appliquer_deltas(difference(
+            [contributions_bien(bien.proprietaire_id, bien.ville, disponible)],
+            [contributions_bien(bien.proprietaire_id, bien.ville, not disponible)],
+        ))
+        invalider_pages(bien.pk)
+        bien.disponible = disponible
+
+
+def _enregistrer_contrat(form, ancien_bien=None, ancien_actif=False):
+    """Save the contract and the availability of the biens it touches in one transaction.
+
+    The contrat_actif_unique constraint settles concurrent submissions: the
+    losing one gets the form error back and None is returned.
+    """
+    try:
+        # The contract, its outbox notification and the availability flag commit together.
+        with transaction.atomic():
+            contrat = form.save()
+            meme_bien = ancien_bien is not None and ancien_bien.pk == contrat.bien_id
+            if contrat.actif and not (ancien_actif and meme_bien):
+                _basculer_disponibilite(contrat.bien, False)
+            if ancien_actif and not (contrat.actif and meme_bien):
+                _basculer_disponibilite(ancien_bien, True)
+    except IntegrityError:
+        instance = form.instance
+        autres_actifs = ContratLocation.objects.filter(bien_id=instance.bien_id, actif=True).exclude(pk=instance.pk)
+        if not autres_actifs.exists():
+            raise
+        form.add_error("actif", CONTRAT_ACTIF_EXISTANT)
+        return None
+    return contrat
 
 
 @login_required
 def contrats_liste(request):
     recherche = request.GET.get("q", "").strip()
-    contrats = ContratLocation.objects.select_related("bien", "bien__proprietaire").order_by("-date_debut")
+    contrats = ContratLocation.objects.select_related("bien", "bien__proprietaire")
 
     if recherche:
         contrats = contrats.filter(
@@ -313,7 +462,7 @@ def contrats_liste(request):
             | Q(bien__proprietaire__nom_complet__icontains=recherche)
         )
 
-    page_obj = _paginate_queryset(request, contrats)
+    page_obj = _paginate_queryset(request, contrats, ["-date_debut", "-id"])
 
     context = {
         "title": "Liste des contrats",
@@ -326,12 +475,11 @@ def contrats_liste(request):
 @login_required
 def proprietaire_demandes(request):
     # get Proprietaire linked to logged in user
-    try:
-        proprietaire = Proprietaire.objects.get(user=request.user)
-    except Proprietaire.DoesNotExist:
+    proprietaire_id = proprietaire_id_verifie(request)
+    if proprietaire_id is None:
         return HttpResponseForbidden("Vous n'êtes pas associé à un propriétaire.")
 
-    demandes = ContratLocation.objects.select_related('bien').filter(bien__proprietaire=proprietaire).order_by('-date_debut')
+    demandes = ContratLocation.objects.select_related('bien').filter(bien__proprietaire_id=proprietaire_id).order_by('-date_debut')
     context = {
         'title': 'Demandes reçues',
         'demandes': demandes,
@@ -361,9 +509,7 @@ def devenir_proprietaire(request):
 def contrats_create(request):
     if request.method == "POST":
         form = ContratLocationForm(request.POST)
-        if form.is_valid():
-            contrat = form.save()
-            _mettre_a_jour_disponibilite_bien(contrat.bien)
+        if form.is_valid() and _enregistrer_contrat(form):
             return redirect("contrats_liste")
     else:
         proprietaire_id = request.GET.get("proprietaire")
@@ -379,15 +525,12 @@ def contrats_create(request):
 
 @login_required
 def contrats_update(request, pk):
-    contrat = get_object_or_404(ContratLocation, pk=pk)
-    ancien_bien = contrat.bien
+    contrat = get_object_or_404(ContratLocation.objects.select_related("bien"), pk=pk)
+    ancien_bien, ancien_actif = contrat.bien, contrat.actif
 
     if request.method == "POST":
         form = ContratLocationForm(request.POST, instance=contrat)
-        if form.is_valid():
-            contrat = form.save()
-            _mettre_a_jour_disponibilite_bien(ancien_bien)
-            _mettre_a_jour_disponibilite_bien(contrat.bien)
+        if form.is_valid() and _enregistrer_contrat(form, ancien_bien, ancien_actif):
             return redirect("contrats_liste")
     else:
         form = ContratLocationForm(instance=contrat)
@@ -406,8 +549,10 @@ def contrats_delete(request, pk):
     bien = contrat.bien
 
     if request.method == "POST":
-        contrat.delete()
-        _mettre_a_jour_disponibilite_bien(bien)
+        with transaction.atomic():
+            contrat.delete()
+            if contrat.actif:
+                _basculer_disponibilite(bien, True)
         return redirect("contrats_liste")
 
     context = {
@@ -12,6 +12,7 @@ django.setup()
 
 from django.contrib.auth.models import User
 from immobilier.models import Proprietaire, BienImmobilier, ContratLocation
+from immobilier.outbox import envoyer_en_attente
 from datetime import date
 
 u, created = User.objects.get_or_create(
@@ -52,4 +53,6 @@ c = ContratLocation.objects.create(
 )
 
 print('Created contract:', c)
+envoyes, echecs = envoyer_en_attente()
+print(f'Outbox drained: {envoyes} sent, {echecs} failed.')
 print('If EMAIL_BACKEND is console, the email content should have been printed above.')